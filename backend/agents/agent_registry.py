@@ -1,17 +1,31 @@
 from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+import json
 import logging
+import os
+import threading
 
 from backend.agents.requirements_agent import RequirementsAgent
 from backend.agents.coding_agent import CodingAgent
 from backend.agents.debugging_agent import DebuggingAgent
 from backend.agents.optimization_agent import OptimizationAgent
 from backend.agents.documentation_agent import DocumentationAgent
+from backend.agents.review_agent import ReviewAgent
 from backend.config import get_settings
-from backend.services.rag import RAGService
+from backend.services.collection_manager import DEFAULT_COLLECTION, CollectionManager
+from backend.services.llm_gateway import LLMGateway
+from backend.services.metadata_filters import language_filter
+
+if TYPE_CHECKING:
+    from backend.services.semantic_cache import SemanticCache
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Request options whose stage contexts are pre-resolved during warm-up
+OPTIMIZATION_TARGETS = ("performance", "memory", "readability")
+DOCUMENTATION_STYLES = ("standard", "docstring", "javadoc")
+
 class AgentRegistry:
     """Registry for managing all agent instances."""
     
@@ -21,42 +35,129 @@ class AgentRegistry:
         
         # Initialize services
         self.settings = get_settings()
-        self.rag_service = RAGService(vector_db_path=self.settings.vector_db_path)
+        self.llm_gateway = LLMGateway(self.settings)
+        self.collections = CollectionManager(self.settings, openai_client=self.llm_gateway.client)
+        self.rag_service = self.collections.get(DEFAULT_COLLECTION)
+        self.prompt_cache = self._create_prompt_cache()
         
         # Initialize agents
         self.requirements_agent = RequirementsAgent(
-            openai_api_key=self.settings.openai_api_key,
-            openai_model=self.settings.openai_model,
-            rag_service=self.rag_service
+            llm_gateway=self.llm_gateway,
+            rag_service=self.collections.get(self.settings.requirements_agent_collection, create=True)
         )
         
         self.coding_agent = CodingAgent(
-            openai_api_key=self.settings.openai_api_key,
-            openai_model=self.settings.openai_model,
-            rag_service=self.rag_service
+            llm_gateway=self.llm_gateway,
+            rag_service=self.collections.get(self.settings.coding_agent_collection, create=True)
         )
         
         self.debugging_agent = DebuggingAgent(
-            openai_api_key=self.settings.openai_api_key,
-            openai_model=self.settings.openai_model,
-            rag_service=self.rag_service
+            llm_gateway=self.llm_gateway,
+            rag_service=self.collections.get(self.settings.debugging_agent_collection, create=True)
         )
         
         self.optimization_agent = OptimizationAgent(
-            openai_api_key=self.settings.openai_api_key,
-            openai_model=self.settings.openai_model,
-            rag_service=self.rag_service
+            llm_gateway=self.llm_gateway,
+            rag_service=self.collections.get(self.settings.optimization_agent_collection, create=True)
         )
         
         self.documentation_agent = DocumentationAgent(
-            openai_api_key=self.settings.openai_api_key,
-            openai_model=self.settings.openai_model,
-            rag_service=self.rag_service
+            llm_gateway=self.llm_gateway,
+            rag_service=self.collections.get(self.settings.documentation_agent_collection, create=True)
+        )
+        
+        # Folds the three post-processing stages into one completion, with their contexts
+        self.review_agent = ReviewAgent(
+            llm_gateway=self.llm_gateway,
+            rag_service=self.rag_service,
+            debugging_agent=self.debugging_agent,
+            optimization_agent=self.optimization_agent,
+            documentation_agent=self.documentation_agent
         )
         
         logger.info("Agent Registry initialized successfully")
+    
+    def _create_prompt_cache(self) -> Optional["SemanticCache"]:
+        """Open the semantic cache of generate-code results, embedding prompts like the default collection."""
+        if not self.settings.prompt_cache_enabled:
+            return None
+        # Loads faiss, like the collections opened above
+        from backend.services.semantic_cache import SemanticCache
+        
+        return SemanticCache(
+            self.settings.prompt_cache_path or os.path.join(self.settings.vector_db_path, "prompt_cache.db"),
+            self.rag_service.embedding_provider,
+            threshold=self.settings.prompt_cache_threshold,
+            max_entries=self.settings.prompt_cache_max_entries,
+            ttl=self.settings.prompt_cache_ttl
+        )
+    
+    def agent_collections(self) -> Dict[str, str]:
+        """Return the name of the collection queried by each agent."""
+        return {
+            "requirements": self.settings.requirements_agent_collection,
+            "coding": self.settings.coding_agent_collection,
+            "debugging": self.settings.debugging_agent_collection,
+            "optimization": self.settings.optimization_agent_collection,
+            "documentation": self.settings.documentation_agent_collection
+        }
+    
+    def knowledge_version(self) -> str:
+        """
+        Return the version of the knowledge base the agents retrieve from.
+        
+        It lists the log sequence number of each agent collection, which
+        changes with every ingest, update and delete and, unlike the
+        generation keying the retrieval cache, is kept across restarts, so it
+        can tag the results persisted by the prompt cache.
+        """
+        names = sorted(set(self.agent_collections().values()))
+        return json.dumps({name: self.collections.get(name).view.sequence for name in names})
+    
+    def warm_up(self, languages: List[str]) -> Dict[str, Any]:
+        """
+        Pre-resolve the templated stage contexts for the given languages.
+        
+        The debugging, optimization and documentation queries depend only on
+        the language and the requested target or style, so retrieving them once
+        fills the embedding and retrieval caches for the first real requests.
+        
+        Args:
+            languages: Languages to warm up
+            
+        Returns:
+            Number of contexts resolved and failed
+        """
+        queries = []
+        for language in languages:
+            queries.append((self.debugging_agent, self.debugging_agent.context_query(language), language))
+            for target in OPTIMIZATION_TARGETS:
+                queries.append((self.optimization_agent,
+                                self.optimization_agent.context_query(language, target), language))
+            for style in DOCUMENTATION_STYLES:
+                queries.append((self.documentation_agent,
+                                self.documentation_agent.context_query(language, style), language))
+        
+        resolved, failed = 0, 0
+        for agent, query, language in dict.fromkeys(queries):
+            try:
+                agent.rag_service.retrieve(query, filters=language_filter(language))
+                resolved += 1
+            except Exception as e:
+                logger.error(f"Error warming up context '{query}': {str(e)}")
+                failed += 1
+        
+        logger.info(f"Warmed up {resolved} stage contexts for {', '.join(languages)}")
+        return {"resolved": resolved, "failed": failed}
+
+# Serializes the first construction between the startup warm-up and early requests
+_registry_lock = threading.Lock()
 
 @lru_cache
+def _create_agent_registry() -> AgentRegistry:
+    return AgentRegistry()
+
 def get_agent_registry() -> AgentRegistry:
     """Create and cache the agent registry."""
-    return AgentRegistry()
\ No newline at end of file
+    with _registry_lock:
+        return _create_agent_registry()
\ No newline at end of file
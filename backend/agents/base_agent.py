@@ -0,0 +1,125 @@
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from backend.services.llm_gateway import LLMGateway
+    from backend.services.rag import RAGService
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class BaseAgent:
+    """Common setup and LLM calls of the agents.
+
+    Subclasses set agent_name and system_message, which configure their
+    AutoGen agent, and build the prompts of their task; all of them send
+    their requests through the shared LLM gateway. The AutoGen agent is only
+    needed for conversation-style use, so it (and the autogen package) is
+    loaded on first access of the agent property rather than at startup.
+    """
+
+    agent_name: str = ""
+    system_message: str = ""
+
+    def __init__(self, llm_gateway: "LLMGateway", rag_service: "RAGService"):
+        """
+        Initialize the agent.
+
+        Args:
+            llm_gateway: Shared gateway to the OpenAI API
+            rag_service: RAG service for retrieving relevant context
+        """
+        self.llm_gateway = llm_gateway
+        self.openai_api_key = llm_gateway.settings.openai_api_key
+        self.openai_model = llm_gateway.model
+        self.rag_service = rag_service
+
+        # The AutoGen agent is built on first use
+        self._agent = None
+        self._agent_lock = threading.Lock()
+
+        logger.info(f"{type(self).__name__} initialized")
+
+    @property
+    def agent(self) -> Any:
+        """AutoGen agent of this agent's role, built on first access."""
+        if self._agent is None:
+            with self._agent_lock:
+                if self._agent is None:
+                    self._agent = self._setup_agent()
+        return self._agent
+
+    def _setup_agent(self) -> Any:
+        """Set up the AutoGen agent of this agent's role."""
+        import autogen
+
+        config_list = [
+            {
+                "model": self.openai_model,
+                "api_key": self.openai_api_key,
+            }
+        ]
+
+        return autogen.AssistantAgent(
+            name=self.agent_name,
+            llm_config={"config_list": config_list},
+            system_message=self.system_message
+        )
+
+    @staticmethod
+    def extract_code(response: str, language: str) -> str:
+        """
+        Extract the first fenced code block of a response.
+
+        Args:
+            response: Model response
+            language: Programming language, dropped from the fence's info string
+
+        Returns:
+            The code of the first block, or the whole response if it has none
+        """
+        if "```" not in response:
+            return response
+        code_blocks = response.split("```")
+        for i, block in enumerate(code_blocks):
+            if i % 2 == 1:  # Odd-indexed blocks are code
+                if block.startswith(language):
+                    return block[len(language):].strip()
+                return block.strip()
+        return response
+
+    def _complete(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.1,
+        max_tokens: int = 4000,
+        language: Optional[str] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        use_cache: bool = True,
+        response_format: Optional[Dict[str, Any]] = None,
+        validate: Optional[Callable[[str], Any]] = None
+    ) -> str:
+        """
+        Send a chat request through the gateway.
+
+        Args:
+            messages: Chat messages
+            temperature: Sampling temperature
+            max_tokens: Maximum number of tokens to generate
+            language: Programming language of expected code, whose block is then extracted
+            on_token: Called with each piece of the raw response as it is generated
+            use_cache: Allow the response to come from the gateway's response cache
+            response_format: Output format of the completion, e.g. {"type": "json_object"}
+            validate: Raises ValueError if the raw response breaks the expected contract, which keeps it out of the cache
+
+        Returns:
+            The response, or the code it contains if a language is given
+        """
+        response = self.llm_gateway.chat(
+            messages, temperature=temperature, max_tokens=max_tokens, on_token=on_token, use_cache=use_cache,
+            response_format=response_format, validate=validate
+        )
+        if language is not None:
+            response = self.extract_code(response, language)
+        return response
@@ -9,70 +9,43 @@
 #         return f"Generated code for: {prompt}"
 
 import logging
-from typing import Dict, Any, List
-import autogen
-from openai import OpenAI
+from typing import Dict, Any, List, Callable, Optional
 
-from backend.services.rag import RAGService
+from backend.agents.base_agent import BaseAgent
+from backend.services.metadata_filters import language_filter
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-class CodingAgent:
+class CodingAgent(BaseAgent):
     """Agent for generating code based on requirements."""
     
-    def __init__(self, openai_api_key: str, openai_model: str, rag_service: RAGService):
+    agent_name = "coding_agent"
+    system_message = """
+        You are an expert programmer who specializes in writing clean, efficient, and well-structured code.
+        Your job is to:
+        1. Write code that implements the specified requirements
+        2. Follow best practices for the specific programming language
+        3. Ensure the code is maintainable and readable
+        4. Include appropriate error handling
+        5. Document your code with comments explaining complex logic
         """
-        Initialize the Coding Agent.
-        
-        Args:
-            openai_api_key: API key for OpenAI
-            openai_model: OpenAI model to use
-            rag_service: RAG service for retrieving relevant context
-        """
-        self.openai_api_key = openai_api_key
-        self.openai_model = openai_model
-        self.rag_service = rag_service
-        self.client = OpenAI(api_key=openai_api_key)
-        
-        # Configure the AutoGen agent
-        self.agent = self._setup_agent()
-        
-        logger.info("Coding Agent initialized")
     
-    def _setup_agent(self):
-        """Set up the AutoGen agent for code generation."""
-        config_list = [
-            {
-                "model": self.openai_model,
-                "api_key": self.openai_api_key,
-            }
-        ]
-        
-        # Create the AutoGen agent
-        coding_agent = autogen.AssistantAgent(
-            name="coding_agent",
-            llm_config={"config_list": config_list},
-            system_message="""
-            You are an expert programmer who specializes in writing clean, efficient, and well-structured code.
-            Your job is to:
-            1. Write code that implements the specified requirements
-            2. Follow best practices for the specific programming language
-            3. Ensure the code is maintainable and readable
-            4. Include appropriate error handling
-            5. Document your code with comments explaining complex logic
-            """
-        )
-        
-        return coding_agent
-    
-    def generate_code(self, requirements: str, language: str) -> str:
+    def generate_code(
+        self,
+        requirements: str,
+        language: str,
+        on_token: Optional[Callable[[str], None]] = None,
+        use_cache: bool = True
+    ) -> str:
         """
         Generate code based on the provided requirements.
         
         Args:
             requirements: Structured requirements specification
             language: Target programming language
+            on_token: Called with each piece of the response as it is generated
+            use_cache: Allow a cached response to an identical earlier request
             
         Returns:
             Generated code
@@ -80,7 +53,10 @@ class CodingAgent:
         logger.info(f"Generating {language} code based on requirements...")
         
         # Use RAG to retrieve relevant code patterns or libraries
-        context = self.rag_service.retrieve(f"{language} code patterns for {requirements[:100]}")
+        context = self.rag_service.retrieve(
+            f"{language} code patterns for {requirements[:100]}",
+            filters=language_filter(language)
+        )
         
         # Format requirements and context for the LLM
         messages = [
@@ -108,27 +84,11 @@ class CodingAgent:
             }
         ]
         
-        # Call the OpenAI API
-        response = self.client.chat.completions.create(
-            model=self.openai_model,
-            messages=messages,
-            temperature=0.2,
-            max_tokens=4000
+        # Call the LLM and extract the code if it is wrapped in a markdown code block
+        generated_code = self._complete(
+            messages, temperature=0.2, max_tokens=4000, language=language, on_token=on_token, use_cache=use_cache
         )
         
-        generated_code = response.choices[0].message.content
-        
-        # Extract code if it's wrapped in markdown code blocks
-        if "```" in generated_code:
-            code_blocks = generated_code.split("```")
-            for i, block in enumerate(code_blocks):
-                if i % 2 == 1:  # Odd-indexed blocks are code
-                    if block.startswith(language):
-                        generated_code = block[len(language):].strip()
-                    else:
-                        generated_code = block.strip()
-                    break
-        
         logger.info(f"Generated code: {generated_code[:100]}...")
         
         return generated_code
\ No newline at end of file
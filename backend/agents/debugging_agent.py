@@ -9,65 +9,41 @@
 #         return f"Debugged code: {code}"
 
 import logging
-from typing import Dict, Any, List, Optional
-import autogen
-from openai import OpenAI
+from typing import Dict, Any, List, Optional, Callable
 
-from backend.services.rag import RAGService
+from backend.agents.base_agent import BaseAgent
+from backend.services.metadata_filters import language_filter
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-class DebuggingAgent:
+class DebuggingAgent(BaseAgent):
     """Agent for debugging code."""
     
-    def __init__(self, openai_api_key: str, openai_model: str, rag_service: RAGService):
-        """
-        Initialize the Debugging Agent.
+    agent_name = "debugging_agent"
+    system_message = """
+        You are an expert code debugger. You analyze code to:
+        1. Identify bugs and logical errors
+        2. Fix security vulnerabilities
+        3. Check for edge cases that might cause failures
+        4. Ensure proper error handling
+        5. Verify that the code meets the intended functionality
         
-        Args:
-            openai_api_key: API key for OpenAI
-            openai_model: OpenAI model to use
-            rag_service: RAG service for retrieving relevant context
+        When you find issues, you fix them directly in the code.
         """
-        self.openai_api_key = openai_api_key
-        self.openai_model = openai_model
-        self.rag_service = rag_service
-        self.client = OpenAI(api_key=openai_api_key)
-        
-        # Configure the AutoGen agent
-        self.agent = self._setup_agent()
-        
-        logger.info("Debugging Agent initialized")
     
-    def _setup_agent(self):
-        """Set up the AutoGen agent for debugging."""
-        config_list = [
-            {
-                "model": self.openai_model,
-                "api_key": self.openai_api_key,
-            }
-        ]
-        
-        # Create the AutoGen agent
-        debugging_agent = autogen.AssistantAgent(
-            name="debugging_agent",
-            llm_config={"config_list": config_list},
-            system_message="""
-            You are an expert code debugger. You analyze code to:
-            1. Identify bugs and logical errors
-            2. Fix security vulnerabilities
-            3. Check for edge cases that might cause failures
-            4. Ensure proper error handling
-            5. Verify that the code meets the intended functionality
-            
-            When you find issues, you fix them directly in the code.
-            """
-        )
-        
-        return debugging_agent
+    def context_query(self, language: str) -> str:
+        """Build the knowledge base query used to retrieve debugging patterns."""
+        return f"debugging {language} code common errors"
     
-    def debug_code(self, code: str, language: str, error_messages: Optional[List[str]] = None) -> str:
+    def debug_code(
+        self,
+        code: str,
+        language: str,
+        error_messages: Optional[List[str]] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        use_cache: bool = True
+    ) -> str:
         """
         Debug the provided code.
         
@@ -75,6 +51,8 @@ class DebuggingAgent:
             code: Code to debug
             language: Programming language of the code
             error_messages: Optional list of error messages
+            on_token: Called with each piece of the response as it is generated
+            use_cache: Allow a cached response to an identical earlier request
             
         Returns:
             Debugged code
@@ -82,7 +60,10 @@ class DebuggingAgent:
         logger.info(f"Debugging {language} code: {code[:50]}...")
         
         # Use RAG to retrieve relevant debugging patterns
-        context = self.rag_service.retrieve(f"debugging {language} code common errors")
+        context = self.rag_service.retrieve(self.context_query(language), filters=language_filter(language))
+        
+        # Backslashes are not allowed inside f-string expressions before Python 3.12
+        errors = "ERROR MESSAGES:\n" + "\n".join(error_messages) if error_messages else ""
         
         # Format code and context for the LLM
         messages = [
@@ -102,7 +83,7 @@ class DebuggingAgent:
                 {code}
                 ```
                 
-                {f'ERROR MESSAGES:\n' + '\n'.join(error_messages) if error_messages else ''}
+                {errors}
                 
                 {f'RELEVANT DEBUGGING PATTERNS: {context}' if context else ''}
                 
@@ -113,27 +94,11 @@ class DebuggingAgent:
             }
         ]
         
-        # Call the OpenAI API
-        response = self.client.chat.completions.create(
-            model=self.openai_model,
-            messages=messages,
-            temperature=0.1,
-            max_tokens=4000
+        # Call the LLM and extract the code if it is wrapped in a markdown code block
+        debugged_code = self._complete(
+            messages, temperature=0.1, max_tokens=4000, language=language, on_token=on_token, use_cache=use_cache
         )
         
-        debugged_code = response.choices[0].message.content
-        
-        # Extract code if it's wrapped in markdown code blocks
-        if "```" in debugged_code:
-            code_blocks = debugged_code.split("```")
-            for i, block in enumerate(code_blocks):
-                if i % 2 == 1:  # Odd-indexed blocks are code
-                    if block.startswith(language):
-                        debugged_code = block[len(language):].strip()
-                    else:
-                        debugged_code = block.strip()
-                    break
-        
         logger.info(f"Debugged code: {debugged_code[:100]}...")
         
         return debugged_code
\ No newline at end of file
@@ -9,65 +9,74 @@
 #         return f"Documented code: {code}"
 
 import logging
-from typing import Dict, Any, List, Optional
-import autogen
-from openai import OpenAI
+from typing import Dict, Any, List, Optional, Callable
 
-from backend.services.rag import RAGService
+from backend.agents.base_agent import BaseAgent
+from backend.services.metadata_filters import language_filter
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-class DocumentationAgent:
+# Map documentation style to language-specific conventions
+STYLE_MAPPING = {
+    "python": {
+        "standard": "Google docstring style",
+        "docstring": "NumPy/SciPy docstring style",
+        "javadoc": "reStructuredText (Sphinx) style"
+    },
+    "javascript": {
+        "standard": "JSDoc style",
+        "docstring": "YUIDoc style",
+        "javadoc": "JSDoc style"
+    },
+    "java": {
+        "standard": "Javadoc style",
+        "docstring": "Javadoc style",
+        "javadoc": "Javadoc style"
+    },
+    # Add more language mappings as needed
+}
+
+class DocumentationAgent(BaseAgent):
     """Agent for documenting code."""
     
-    def __init__(self, openai_api_key: str, openai_model: str, rag_service: RAGService):
+    agent_name = "documentation_agent"
+    system_message = """
+        You are an expert code documenter. Your job is to:
+        1. Add clear and concise comments explaining complex logic
+        2. Create function and class docstrings following language conventions
+        3. Document parameters, return values, and exceptions
+        4. Explain the purpose of modules, classes, and functions
+        5. Ensure documentation follows the specified style guide
+        
+        You maintain the functionality of the code while adding appropriate documentation.
+        """
+    
+    def resolve_doc_style(self, language: str, documentation_style: str = "standard") -> str:
         """
-        Initialize the Documentation Agent.
+        Map a documentation style to the language-specific convention.
         
         Args:
-            openai_api_key: API key for OpenAI
-            openai_model: OpenAI model to use
-            rag_service: RAG service for retrieving relevant context
+            language: Programming language of the code
+            documentation_style: Style of documentation (standard, javadoc, docstring)
+            
+        Returns:
+            Name of the documentation convention
         """
-        self.openai_api_key = openai_api_key
-        self.openai_model = openai_model
-        self.rag_service = rag_service
-        self.client = OpenAI(api_key=openai_api_key)
-        
-        # Configure the AutoGen agent
-        self.agent = self._setup_agent()
-        
-        logger.info("Documentation Agent initialized")
+        return STYLE_MAPPING.get(language.lower(), {}).get(documentation_style.lower(), "standard style")
     
-    def _setup_agent(self):
-        """Set up the AutoGen agent for code documentation."""
-        config_list = [
-            {
-                "model": self.openai_model,
-                "api_key": self.openai_api_key,
-            }
-        ]
-        
-        # Create the AutoGen agent
-        documentation_agent = autogen.AssistantAgent(
-            name="documentation_agent",
-            llm_config={"config_list": config_list},
-            system_message="""
-            You are an expert code documenter. Your job is to:
-            1. Add clear and concise comments explaining complex logic
-            2. Create function and class docstrings following language conventions
-            3. Document parameters, return values, and exceptions
-            4. Explain the purpose of modules, classes, and functions
-            5. Ensure documentation follows the specified style guide
-            
-            You maintain the functionality of the code while adding appropriate documentation.
-            """
-        )
-        
-        return documentation_agent
+    def context_query(self, language: str, documentation_style: str = "standard") -> str:
+        """Build the knowledge base query used to retrieve documentation examples."""
+        return f"{language} {self.resolve_doc_style(language, documentation_style)} documentation examples"
     
-    def document_code(self, code: str, language: str, documentation_style: str = "standard") -> str:
+    def document_code(
+        self,
+        code: str,
+        language: str,
+        documentation_style: str = "standard",
+        on_token: Optional[Callable[[str], None]] = None,
+        use_cache: bool = True
+    ) -> str:
         """
         Document the provided code.
         
@@ -75,37 +84,22 @@ class DocumentationAgent:
             code: Code to document
             language: Programming language of the code
             documentation_style: Style of documentation (standard, javadoc, docstring)
+            on_token: Called with each piece of the response as it is generated
+            use_cache: Allow a cached response to an identical earlier request
             
         Returns:
             Documented code
         """
         logger.info(f"Documenting {language} code in {documentation_style} style: {code[:50]}...")
         
-        # Map documentation style to language-specific conventions
-        style_mapping = {
-            "python": {
-                "standard": "Google docstring style",
-                "docstring": "NumPy/SciPy docstring style",
-                "javadoc": "reStructuredText (Sphinx) style"
-            },
-            "javascript": {
-                "standard": "JSDoc style",
-                "docstring": "YUIDoc style",
-                "javadoc": "JSDoc style"
-            },
-            "java": {
-                "standard": "Javadoc style",
-                "docstring": "Javadoc style",
-                "javadoc": "Javadoc style"
-            },
-            # Add more language mappings as needed
-        }
-        
         # Get the appropriate documentation style for the language
-        doc_style = style_mapping.get(language.lower(), {}).get(documentation_style.lower(), "standard style")
+        doc_style = self.resolve_doc_style(language, documentation_style)
         
         # Use RAG to retrieve relevant documentation patterns
-        context = self.rag_service.retrieve(f"{language} {doc_style} documentation examples")
+        context = self.rag_service.retrieve(
+            self.context_query(language, documentation_style),
+            filters=language_filter(language)
+        )
         
         # Format code and context for the LLM
         messages = [
@@ -139,27 +133,11 @@ class DocumentationAgent:
             }
         ]
         
-        # Call the OpenAI API
-        response = self.client.chat.completions.create(
-            model=self.openai_model,
-            messages=messages,
-            temperature=0.1,
-            max_tokens=4000
+        # Call the LLM and extract the code if it is wrapped in a markdown code block
+        documented_code = self._complete(
+            messages, temperature=0.1, max_tokens=4000, language=language, on_token=on_token, use_cache=use_cache
         )
         
-        documented_code = response.choices[0].message.content
-        
-        # Extract code if it's wrapped in markdown code blocks
-        if "```" in documented_code:
-            code_blocks = documented_code.split("```")
-            for i, block in enumerate(code_blocks):
-                if i % 2 == 1:  # Odd-indexed blocks are code
-                    if block.startswith(language):
-                        documented_code = block[len(language):].strip()
-                    else:
-                        documented_code = block.strip()
-                    break
-        
         logger.info(f"Documented code: {documented_code[:100]}...")
         
         return documented_code
\ No newline at end of file
@@ -9,65 +9,41 @@
 #         return f"Optimized code: {code}"
 
 import logging
-from typing import Dict, Any, List, Optional
-import autogen
-from openai import OpenAI
+from typing import Dict, Any, List, Optional, Callable
 
-from backend.services.rag import RAGService
+from backend.agents.base_agent import BaseAgent
+from backend.services.metadata_filters import language_filter
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-class OptimizationAgent:
+class OptimizationAgent(BaseAgent):
     """Agent for optimizing code."""
     
-    def __init__(self, openai_api_key: str, openai_model: str, rag_service: RAGService):
-        """
-        Initialize the Optimization Agent.
+    agent_name = "optimization_agent"
+    system_message = """
+        You are an expert code optimizer. You analyze code to:
+        1. Improve time complexity and performance
+        2. Reduce space complexity and memory usage
+        3. Enhance code readability and maintainability
+        4. Apply language-specific optimizations and best practices
+        5. Refactor to make the code more efficient
         
-        Args:
-            openai_api_key: API key for OpenAI
-            openai_model: OpenAI model to use
-            rag_service: RAG service for retrieving relevant context
+        You maintain the functionality of the code while making it more efficient.
         """
-        self.openai_api_key = openai_api_key
-        self.openai_model = openai_model
-        self.rag_service = rag_service
-        self.client = OpenAI(api_key=openai_api_key)
-        
-        # Configure the AutoGen agent
-        self.agent = self._setup_agent()
-        
-        logger.info("Optimization Agent initialized")
     
-    def _setup_agent(self):
-        """Set up the AutoGen agent for code optimization."""
-        config_list = [
-            {
-                "model": self.openai_model,
-                "api_key": self.openai_api_key,
-            }
-        ]
-        
-        # Create the AutoGen agent
-        optimization_agent = autogen.AssistantAgent(
-            name="optimization_agent",
-            llm_config={"config_list": config_list},
-            system_message="""
-            You are an expert code optimizer. You analyze code to:
-            1. Improve time complexity and performance
-            2. Reduce space complexity and memory usage
-            3. Enhance code readability and maintainability
-            4. Apply language-specific optimizations and best practices
-            5. Refactor to make the code more efficient
-            
-            You maintain the functionality of the code while making it more efficient.
-            """
-        )
-        
-        return optimization_agent
+    def context_query(self, language: str, optimization_target: str = "performance") -> str:
+        """Build the knowledge base query used to retrieve optimization patterns."""
+        return f"{language} code optimization for {optimization_target}"
     
-    def optimize_code(self, code: str, language: str, optimization_target: str = "performance") -> str:
+    def optimize_code(
+        self,
+        code: str,
+        language: str,
+        optimization_target: str = "performance",
+        on_token: Optional[Callable[[str], None]] = None,
+        use_cache: bool = True
+    ) -> str:
         """
         Optimize the provided code.
         
@@ -75,6 +51,8 @@ class OptimizationAgent:
             code: Code to optimize
             language: Programming language of the code
             optimization_target: Target of optimization (performance, memory, readability)
+            on_token: Called with each piece of the response as it is generated
+            use_cache: Allow a cached response to an identical earlier request
             
         Returns:
             Optimized code
@@ -82,7 +60,10 @@ class OptimizationAgent:
         logger.info(f"Optimizing {language} code for {optimization_target}: {code[:50]}...")
         
         # Use RAG to retrieve relevant optimization patterns
-        context = self.rag_service.retrieve(f"{language} code optimization for {optimization_target}")
+        context = self.rag_service.retrieve(
+            self.context_query(language, optimization_target),
+            filters=language_filter(language)
+        )
         
         # Format code and context for the LLM
         messages = [
@@ -116,27 +97,11 @@ class OptimizationAgent:
             }
         ]
         
-        # Call the OpenAI API
-        response = self.client.chat.completions.create(
-            model=self.openai_model,
-            messages=messages,
-            temperature=0.1,
-            max_tokens=4000
+        # Call the LLM and extract the code if it is wrapped in a markdown code block
+        optimized_code = self._complete(
+            messages, temperature=0.1, max_tokens=4000, language=language, on_token=on_token, use_cache=use_cache
         )
         
-        optimized_code = response.choices[0].message.content
-        
-        # Extract code if it's wrapped in markdown code blocks
-        if "```" in optimized_code:
-            code_blocks = optimized_code.split("```")
-            for i, block in enumerate(code_blocks):
-                if i % 2 == 1:  # Odd-indexed blocks are code
-                    if block.startswith(language):
-                        optimized_code = block[len(language):].strip()
-                    else:
-                        optimized_code = block.strip()
-                    break
-        
         logger.info(f"Optimized code: {optimized_code[:100]}...")
         
         return optimized_code
\ No newline at end of file
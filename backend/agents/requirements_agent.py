@@ -9,67 +9,38 @@
 #         return f"Generated requirements for: {prompt}"
 
 import logging
-from typing import Dict, Any, List
-import autogen
-from openai import OpenAI
-from backend.services.rag import RAGService
+from typing import Dict, Any, List, Callable, Optional
+from backend.agents.base_agent import BaseAgent
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-class RequirementsAgent:
+class RequirementsAgent(BaseAgent):
     """Agent for processing requirements and breaking tasks into coding subtasks."""
     
-    def __init__(self, openai_api_key: str, openai_model: str, rag_service: RAGService):
+    agent_name = "requirements_agent"
+    system_message = """
+        You are a requirements analyst who specializes in breaking down coding tasks.
+        Your job is to:
+        1. Understand user requirements for coding tasks
+        2. Break down complex requirements into clear, specific coding subtasks
+        3. Identify potential edge cases and requirements that need clarification
+        4. Format the output as a structured requirements specification
         """
-        Initialize the Requirements Agent.
-        
-        Args:
-            openai_api_key: API key for OpenAI
-            openai_model: OpenAI model to use
-            rag_service: RAG service for retrieving relevant context
-        """
-        self.openai_api_key = openai_api_key
-        self.openai_model = openai_model
-        self.rag_service = rag_service
-        self.client = OpenAI(api_key=openai_api_key)
-        
-        # Configure the AutoGen agent
-        self.agent = self._setup_agent()
-        
-        logger.info("Requirements Agent initialized")
     
-    def _setup_agent(self):
-        """Set up the AutoGen agent for requirements processing."""
-        config_list = [
-            {
-                "model": self.openai_model,
-                "api_key": self.openai_api_key,
-            }
-        ]
-        
-        # Create the AutoGen agent
-        requirements_agent = autogen.AssistantAgent(
-            name="requirements_agent",
-            llm_config={"config_list": config_list},
-            system_message="""
-            You are a requirements analyst who specializes in breaking down coding tasks.
-            Your job is to:
-            1. Understand user requirements for coding tasks
-            2. Break down complex requirements into clear, specific coding subtasks
-            3. Identify potential edge cases and requirements that need clarification
-            4. Format the output as a structured requirements specification
-            """
-        )
-        
-        return requirements_agent
-    
-    def process_requirements(self, prompt: str) -> str:
+    def process_requirements(
+        self,
+        prompt: str,
+        on_token: Optional[Callable[[str], None]] = None,
+        use_cache: bool = True
+    ) -> str:
         """
         Process user prompt into structured requirements.
         
         Args:
             prompt: User prompt describing the coding task
+            on_token: Called with each piece of the response as it is generated
+            use_cache: Allow a cached response to an identical earlier request
             
         Returns:
             Structured requirements specification
@@ -112,15 +83,10 @@ class RequirementsAgent:
             }
         ]
         
-        # Call the OpenAI API
-        response = self.client.chat.completions.create(
-            model=self.openai_model,
-            messages=messages,
-            temperature=0.1,
-            max_tokens=2000
+        # Call the LLM
+        requirements = self._complete(
+            messages, temperature=0.1, max_tokens=2000, on_token=on_token, use_cache=use_cache
         )
-        
-        requirements = response.choices[0].message.content
         logger.info(f"Generated requirements: {requirements[:100]}...")
         
         return requirements
\ No newline at end of file
@@ -0,0 +1,200 @@
+import json
+import logging
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from backend.agents.base_agent import BaseAgent
+from backend.agents.debugging_agent import DebuggingAgent
+from backend.agents.documentation_agent import DocumentationAgent
+from backend.agents.optimization_agent import OptimizationAgent
+from backend.services.metadata_filters import language_filter
+
+if TYPE_CHECKING:
+    from backend.services.llm_gateway import LLMGateway
+    from backend.services.rag import RAGService
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Keys of the review response listing the changes of each post-processing step
+NOTE_KEYS = {"debug": "fixes", "optimize": "optimizations", "document": "documentation"}
+
+def parse_review(response: str) -> Dict[str, Any]:
+    """
+    Parse a review response into its JSON object.
+
+    Args:
+        response: Raw response of the review completion
+
+    Returns:
+        The review object, holding at least a non-empty "code" string
+
+    Raises:
+        ValueError: If the response does not follow the JSON contract
+    """
+    try:
+        review = json.loads(response)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Review response is not valid JSON: {str(e)}")
+    if not isinstance(review, dict) or not isinstance(review.get("code"), str) or not review["code"].strip():
+        raise ValueError("Review response has no code")
+    return review
+
+class ReviewAgent(BaseAgent):
+    """Agent applying debugging, optimization and documentation in a single completion.
+
+    The stage-by-stage pipeline sends the whole file to each post-processing
+    agent and regenerates it every time. This agent folds the enabled steps
+    into one request, with the knowledge base context each stage agent would
+    retrieve from its own collection, and asks for a JSON object holding the
+    final code and short notes per step, so the file is generated once.
+    """
+
+    agent_name = "review_agent"
+    system_message = """
+        You are an expert code reviewer. In a single pass over the code you:
+        1. Fix bugs, security vulnerabilities, unhandled edge cases and error handling
+        2. Optimize the code for the requested target without changing its functionality
+        3. Document the code following the requested conventions
+
+        You only apply the steps you are asked for, and you answer with the requested JSON object.
+        """
+
+    def __init__(
+        self,
+        llm_gateway: "LLMGateway",
+        rag_service: "RAGService",
+        debugging_agent: DebuggingAgent,
+        optimization_agent: OptimizationAgent,
+        documentation_agent: DocumentationAgent
+    ):
+        """
+        Initialize the agent.
+
+        Args:
+            llm_gateway: Shared gateway to the OpenAI API
+            rag_service: RAG service for retrieving relevant context
+            debugging_agent: Agent whose debugging context is used
+            optimization_agent: Agent whose optimization context is used
+            documentation_agent: Agent whose documentation context and conventions are used
+        """
+        super().__init__(llm_gateway, rag_service)
+        self.debugging_agent = debugging_agent
+        self.optimization_agent = optimization_agent
+        self.documentation_agent = documentation_agent
+
+    def review_code(
+        self,
+        code: str,
+        language: str,
+        debug: bool = True,
+        optimize: bool = True,
+        document: bool = True,
+        optimization_target: str = "performance",
+        documentation_style: str = "standard",
+        on_token: Optional[Callable[[str], None]] = None,
+        use_cache: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Debug, optimize and document code in one completion.
+
+        Args:
+            code: Code to review
+            language: Programming language of the code
+            debug: Whether to fix bugs
+            optimize: Whether to optimize the code
+            document: Whether to document the code
+            optimization_target: Target of optimization (performance, memory, readability)
+            documentation_style: Style of documentation (standard, javadoc, docstring)
+            on_token: Called with each piece of the response as it is generated
+            use_cache: Allow a cached response to an identical earlier request
+
+        Returns:
+            The reviewed code and the notes of each applied step
+
+        Raises:
+            ValueError: If the response does not follow the JSON contract
+        """
+        steps = [step for step, enabled in (("debug", debug), ("optimize", optimize), ("document", document)) if enabled]
+        logger.info(f"Reviewing {language} code ({', '.join(steps)}): {code[:50]}...")
+
+        # Retrieve the context each stage agent would use, from its own collection
+        filters = language_filter(language)
+        doc_style = self.documentation_agent.resolve_doc_style(language, documentation_style)
+        instructions: List[str] = []
+        contexts: List[str] = []
+        if debug:
+            instructions.append("Identify and fix bugs, logical errors, security vulnerabilities and edge cases, "
+                                "and improve error handling. Add comments for significant changes.")
+            context = self.debugging_agent.rag_service.retrieve(
+                self.debugging_agent.context_query(language), filters=filters
+            )
+            if context:
+                contexts.append(f"RELEVANT DEBUGGING PATTERNS: {context}")
+        if optimize:
+            instructions.append(f"Optimize the code for {optimization_target} without changing its core "
+                                f"functionality. Add comments explaining significant optimizations.")
+            context = self.optimization_agent.rag_service.retrieve(
+                self.optimization_agent.context_query(language, optimization_target), filters=filters
+            )
+            if context:
+                contexts.append(f"RELEVANT OPTIMIZATION PATTERNS: {context}")
+        if document:
+            instructions.append(f"Document the code using {doc_style}: module/file-level documentation, class and "
+                                f"function docstrings with parameters, return values and exceptions, and inline "
+                                f"comments for complex logic.")
+            context = self.documentation_agent.rag_service.retrieve(
+                self.documentation_agent.context_query(language, documentation_style), filters=filters
+            )
+            if context:
+                contexts.append(f"RELEVANT DOCUMENTATION EXAMPLES: {context}")
+
+        numbered = "\n".join(f"{i}. {instruction}" for i, instruction in enumerate(instructions, 1))
+        note_keys = ", ".join(f'"{NOTE_KEYS[step]}"' for step in steps)
+        context_text = "\n\n".join(contexts)
+
+        # Format code, steps and context for the LLM
+        messages = [
+            {
+                "role": "system",
+                "content": f"""
+                You are an expert {language} code reviewer. Your task is to apply the requested
+                improvements to the given code in a single pass and return the final version.
+                """
+            },
+            {
+                "role": "user",
+                "content": f"""
+                I need you to review the following {language} code:
+
+                ```{language}
+                {code}
+                ```
+
+                {context_text}
+
+                Apply these steps, in order, to produce one final version of the code:
+                {numbered}
+
+                Respond with a JSON object with the key "code", holding the complete final code as a string
+                without markdown fences, and the keys {note_keys}, each holding a list of short descriptions
+                of the changes made by that step.
+                """
+            }
+        ]
+
+        # Call the LLM with the JSON output contract, caching only responses that keep it
+        response = self._complete(
+            messages, temperature=0.1, max_tokens=4000, on_token=on_token, use_cache=use_cache,
+            response_format={"type": "json_object"}, validate=parse_review
+        )
+        review = parse_review(response)
+
+        reviewed_code = self.extract_code(review["code"], language)
+        notes = {}
+        for step in steps:
+            value = review.get(NOTE_KEYS[step]) or []
+            notes[NOTE_KEYS[step]] = [str(note) for note in value] if isinstance(value, list) else [str(value)]
+
+        logger.info(f"Reviewed code: {reviewed_code[:100]}...")
+
+        return {"code": reviewed_code, "notes": notes}
@@ -8,12 +8,23 @@ class TaskStatus(str, Enum):
     COMPLETED = "completed"
     FAILED = "failed"
 
+class PipelineMode(str, Enum):
+    STAGED = "staged"
+    FUSED = "fused"
+
 class GenerateCodeRequest(BaseModel):
     prompt: str = Field(..., description="User prompt describing the coding task")
     language: str = Field("python", description="Target programming language")
     debug: bool = Field(True, description="Whether to debug the generated code")
     optimize: bool = Field(True, description="Whether to optimize the generated code")
     document: bool = Field(True, description="Whether to document the generated code")
+    pipeline_mode: PipelineMode = Field(
+        PipelineMode.STAGED,
+        description="staged runs debugging, optimization and documentation as separate completions; "
+                    "fused applies them in one completion"
+    )
+    stream: bool = Field(False, description="Stream each stage's tokens into the task's partial output")
+    bypass_cache: bool = Field(False, description="Request new completions instead of cached responses")
 
 class GenerateCodeResponse(BaseModel):
     code: str = Field(..., description="Generated code")
@@ -23,16 +34,19 @@ class DebugCodeRequest(BaseModel):
     code: str = Field(..., description="Code to debug")
     language: str = Field(..., description="Programming language of the code")
     error_messages: Optional[List[str]] = Field(None, description="Error messages if available")
+    bypass_cache: bool = Field(False, description="Request new completions instead of cached responses")
 
 class OptimizeCodeRequest(BaseModel):
     code: str = Field(..., description="Code to optimize")
     language: str = Field(..., description="Programming language of the code")
     optimization_target: Optional[str] = Field("performance", description="Target of optimization (performance, memory, readability)")
+    bypass_cache: bool = Field(False, description="Request new completions instead of cached responses")
 
 class DocumentCodeRequest(BaseModel):
     code: str = Field(..., description="Code to document")
     language: str = Field(..., description="Programming language of the code")
     documentation_style: Optional[str] = Field("standard", description="Style of documentation (standard, javadoc, docstring)")
+    bypass_cache: bool = Field(False, description="Request new completions instead of cached responses")
 
 class GithubIntegrationRequest(BaseModel):
     code: str = Field(..., description="Code to push to GitHub")
@@ -40,6 +54,35 @@ class GithubIntegrationRequest(BaseModel):
     commit_message: str = Field(..., description="Commit message")
     branch: str = Field("main", description="Branch to push to")
 
+class DocumentInput(BaseModel):
+    content: str = Field(..., description="Document content")
+    metadata: Optional[Dict[str, Any]] = Field(None, description="Optional document metadata")
+    language: Optional[str] = Field(None, description="Programming language, if the document is source code")
+    chunk: bool = Field(False, description="Split the document into function- and class-level chunks")
+
+class IngestDocumentsRequest(BaseModel):
+    documents: List[DocumentInput] = Field(..., description="Documents to add to the knowledge base")
+    collection: str = Field("default", description="Collection receiving the documents")
+    batch_size: Optional[int] = Field(None, gt=0, description="Number of documents embedded per request")
+    checkpoint_interval: Optional[int] = Field(None, gt=0, description="Persist the vector store every N documents")
+
+class UpdateDocumentRequest(BaseModel):
+    content: str = Field(..., description="New document content")
+    metadata: Optional[Dict[str, Any]] = Field(None, description="New document metadata, replacing the old metadata")
+    language: Optional[str] = Field(None, description="Programming language, if the document is source code")
+
+class IngestCodebaseRequest(BaseModel):
+    path: str = Field(..., description="Local source tree to index")
+    extensions: Optional[List[str]] = Field(None, description="File extensions to include, e.g. ['.py', '.js']")
+    workers: Optional[int] = Field(None, gt=0, description="Number of worker processes used for chunking")
+    collection: str = Field("default", description="Collection receiving the chunks")
+
+class CreateCollectionRequest(BaseModel):
+    name: str = Field(..., description="Collection name: lowercase letters, digits, '-' and '_'")
+    settings: Optional[Dict[str, Any]] = Field(
+        None, description="Settings overriding the application settings, e.g. {'rag_index_type': 'ivf_flat'}"
+    )
+
 class TaskResponse(BaseModel):
     task_id: str = Field(..., description="Unique identifier for the task")
     status: TaskStatus = Field(..., description="Current status of the task")
\ No newline at end of file
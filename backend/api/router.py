@@ -1,19 +1,44 @@
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
-from typing import List, Dict, Any, Optional
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import TYPE_CHECKING, Callable, List, Dict, Any, Optional
+import asyncio
+import json
 import logging
+import os
 
 from backend.api.models import (
     GenerateCodeRequest, 
     GenerateCodeResponse,
+    PipelineMode,
     DebugCodeRequest,
     OptimizeCodeRequest,
     DocumentCodeRequest,
     TaskStatus,
     TaskResponse,
-    GithubIntegrationRequest
+    GithubIntegrationRequest,
+    IngestDocumentsRequest,
+    IngestCodebaseRequest,
+    UpdateDocumentRequest,
+    CreateCollectionRequest
+)
+from backend.api.task_events import (
+    SNAPSHOT_EVENT,
+    STAGE_EVENT,
+    STATUS_EVENT,
+    TOKEN_EVENT,
+    TaskEventBroker,
+    format_event
 )
 from backend.agents.agent_registry import get_agent_registry
+from backend.config import get_settings
+from backend.services.chunking import chunk_document
+from backend.services.collection_manager import DEFAULT_COLLECTION
 from backend.services.github import GitHubService
+from backend.services.ingestion import CodebaseIngestor
+from backend.services.metadata_filters import normalize_language
+
+if TYPE_CHECKING:
+    from backend.services.rag import RAGService
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -24,6 +49,85 @@ router = APIRouter(tags=["coding-assistant"])
 # Task storage (in-memory for simplicity, would use a database in production)
 tasks = {}
 
+# Progress of pipeline tasks: the current stage and the pieces each stage has streamed
+partial_outputs = {}
+
+# Pushes task progress to the event stream subscribers
+task_events = TaskEventBroker()
+
+# Seconds between keep-alive comments on an idle event stream
+EVENT_STREAM_KEEPALIVE = 15
+
+# Warm-up state reported by the readiness endpoint, updated by the application lifespan
+readiness = {"ready": False, "warmup": None, "error": None}
+
+@router.get("/ready", response_model=Dict[str, Any])
+async def get_readiness():
+    """Report whether startup warm-up has finished."""
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, content=readiness)
+    return readiness
+
+def set_task_status(task_id: str, status: TaskStatus) -> None:
+    """Change the status of a running task and notify its subscribers."""
+    def update():
+        tasks[task_id]["status"] = status
+    task_events.publish(task_id, STATUS_EVENT, {"status": status.value}, update)
+
+def set_task_result(task_id: str, status: TaskStatus, result: Dict[str, Any]) -> None:
+    """Record the outcome of a task and notify its subscribers."""
+    def update():
+        tasks[task_id] = {"status": status, "result": result}
+    task_events.publish(task_id, STATUS_EVENT, {"status": status.value, "result": result}, update)
+
+def start_stage(task_id: str, stage: str, stream: bool) -> Optional[Callable[[str], None]]:
+    """
+    Start a stage of a pipeline task.
+
+    Args:
+        task_id: Task ID
+        stage: Name of the stage
+        stream: Whether the stage's tokens are streamed into the task's partial output
+
+    Returns:
+        Callback publishing the generated pieces of the stage, or None if it does not stream
+    """
+    partial = partial_outputs[task_id]
+    pieces = []
+
+    def update():
+        partial["stage"] = stage
+        partial["stages"][stage] = pieces
+    task_events.publish(task_id, STAGE_EVENT, {"stage": stage}, update)
+    if not stream:
+        return None
+
+    def on_token(piece: str) -> None:
+        task_events.publish(task_id, TOKEN_EVENT, {"stage": stage, "text": piece}, lambda: pieces.append(piece))
+    return on_token
+
+def task_snapshot(task_id: str) -> Dict[str, Any]:
+    """Return the status, result and partial output of a task."""
+    task = tasks[task_id]
+    partial = partial_outputs.get(task_id, {"stage": None, "stages": {}})
+    return {
+        "status": task["status"],
+        "result": task["result"],
+        "stage": partial["stage"],
+        "stages": {name: "".join(pieces[:]) for name, pieces in list(partial["stages"].items())}
+    }
+
+def prompt_cache_scope(request: GenerateCodeRequest, model: str) -> str:
+    """Build the prompt cache scope of the options that change a generate-code result."""
+    return json.dumps({
+        "language": request.language.strip().lower(),
+        "debug": request.debug,
+        "optimize": request.optimize,
+        "document": request.document,
+        "pipeline_mode": request.pipeline_mode.value,
+        "model": model
+    }, sort_keys=True)
+
 @router.post("/generate-code", response_model=TaskResponse)
 async def generate_code(
     request: GenerateCodeRequest,
@@ -33,43 +137,100 @@ async def generate_code(
     task_id = f"task_{len(tasks) + 1}"
     tasks[task_id] = {"status": TaskStatus.PENDING, "result": None}
     
+    partial_outputs[task_id] = {"stage": None, "stages": {}}
+    
+    def on_token(stage: str) -> Optional[Callable[[str], None]]:
+        """Start a stage, returning its streaming callback when the task streams."""
+        return start_stage(task_id, stage, request.stream)
+    
     def process_code_generation():
         try:
             registry = get_agent_registry()
+            set_task_status(task_id, TaskStatus.PROCESSING)
+            
+            use_cache = not request.bypass_cache
+            
+            # Reuse the result of a near-duplicate prompt with the same options and knowledge base
+            prompt_cache = registry.prompt_cache
+            scope = prompt_cache_scope(request, registry.settings.openai_model)
+            vector = None
+            if prompt_cache is not None:
+                # Taken before any retrieval, so a result is never tagged newer than its context
+                version = registry.knowledge_version()
+                try:
+                    vector = prompt_cache.embed(request.prompt)
+                    cached = prompt_cache.lookup(vector, scope, version) if use_cache else None
+                except Exception as e:
+                    logger.warning(f"Prompt cache lookup failed: {str(e)}")
+                    cached = None
+                if cached is not None:
+                    logger.info(f"Answered from the prompt cache (similarity {cached['similarity']:.3f})")
+                    set_task_result(task_id, TaskStatus.COMPLETED, {
+                        **cached["result"],
+                        "cache": {"prompt": cached["prompt"], "similarity": cached["similarity"]}
+                    })
+                    return
             
             # Step 1: Process requirements
-            requirements = registry.requirements_agent.process_requirements(request.prompt)
+            requirements = registry.requirements_agent.process_requirements(
+                request.prompt, on_token=on_token("requirements"), use_cache=use_cache
+            )
             logger.info(f"Processed requirements: {requirements[:100]}...")
             
             # Step 2: Generate code
-            code = registry.coding_agent.generate_code(requirements, request.language)
+            code = registry.coding_agent.generate_code(
+                requirements, request.language, on_token=on_token("coding"), use_cache=use_cache
+            )
             logger.info(f"Generated code: {code[:100]}...")
             
-            # Step 3: Debug code if requested
-            if request.debug:
-                code = registry.debugging_agent.debug_code(code, request.language)
-                logger.info("Code debugged")
-            
-            # Step 4: Optimize code if requested
-            if request.optimize:
-                code = registry.optimization_agent.optimize_code(code, request.language)
-                logger.info("Code optimized")
+            # Steps 3-5: Debug, optimize and document in one completion in fused mode
+            review_notes = None
+            fused = request.pipeline_mode == PipelineMode.FUSED and (
+                request.debug or request.optimize or request.document
+            )
+            if fused:
+                try:
+                    review = registry.review_agent.review_code(
+                        code, request.language, debug=request.debug, optimize=request.optimize,
+                        document=request.document, on_token=on_token("review"), use_cache=use_cache
+                    )
+                    code, review_notes = review["code"], review["notes"]
+                    logger.info("Code reviewed")
+                except ValueError as e:
+                    logger.warning(f"Fused review failed ({str(e)}), post-processing stage by stage")
+                    fused = False
             
-            # Step 5: Document code if requested
-            if request.document:
-                code = registry.documentation_agent.document_code(code, request.language)
-                logger.info("Code documented")
+            if not fused:
+                # Step 3: Debug code if requested
+                if request.debug:
+                    code = registry.debugging_agent.debug_code(
+                        code, request.language, on_token=on_token("debugging"), use_cache=use_cache
+                    )
+                    logger.info("Code debugged")
+                
+                # Step 4: Optimize code if requested
+                if request.optimize:
+                    code = registry.optimization_agent.optimize_code(
+                        code, request.language, on_token=on_token("optimization"), use_cache=use_cache
+                    )
+                    logger.info("Code optimized")
+                
+                # Step 5: Document code if requested
+                if request.document:
+                    code = registry.documentation_agent.document_code(
+                        code, request.language, on_token=on_token("documentation"), use_cache=use_cache
+                    )
+                    logger.info("Code documented")
             
-            tasks[task_id] = {
-                "status": TaskStatus.COMPLETED,
-                "result": {"code": code, "language": request.language}
-            }
+            result = {"code": code, "language": request.language}
+            if review_notes is not None:
+                result["review"] = review_notes
+            if vector is not None:
+                prompt_cache.store(request.prompt, vector, scope, result, version)
+            set_task_result(task_id, TaskStatus.COMPLETED, result)
         except Exception as e:
             logger.error(f"Error in code generation: {str(e)}")
-            tasks[task_id] = {
-                "status": TaskStatus.FAILED,
-                "result": {"error": str(e)}
-            }
+            set_task_result(task_id, TaskStatus.FAILED, {"error": str(e)})
     
     background_tasks.add_task(process_code_generation)
     return {"task_id": task_id, "status": TaskStatus.PENDING}
@@ -81,6 +242,304 @@ async def get_task_status(task_id: str):
         raise HTTPException(status_code=404, detail="Task not found")
     return tasks[task_id]
 
+@router.get("/task/{task_id}/partial", response_model=Dict[str, Any])
+async def get_task_partial_output(task_id: str, stage: Optional[str] = None, offset: int = 0):
+    """
+    Get the output a pipeline task has generated so far.
+
+    Each stage's output is the raw model response, before its code block is
+    extracted, and stays empty unless the task was started with streaming.
+    Clients can poll with the length they already hold as offset to receive
+    only the new text of a stage.
+    """
+    if task_id not in tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if task_id not in partial_outputs:
+        raise HTTPException(status_code=400, detail="Task does not report partial output")
+    snapshot = task_snapshot(task_id)
+    stages = snapshot["stages"]
+    if stage is not None:
+        if stage not in stages:
+            raise HTTPException(status_code=404, detail=f"Stage '{stage}' has not started")
+        stages = {stage: stages[stage][offset:]}
+    return {
+        "status": snapshot["status"],
+        "stage": snapshot["stage"],
+        "stages": stages
+    }
+
+@router.get("/task/{task_id}/events")
+async def stream_task_events(task_id: str):
+    """
+    Push the progress of a task as Server-Sent Events.
+
+    The stream opens with a snapshot event holding the task's status,
+    result, current stage and partial output, then sends status, stage and
+    token events as they happen, and ends after the completed or failed
+    status. A client that reconnects receives a fresh snapshot, so it can
+    replace rather than merge its state.
+    """
+    if task_id not in tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    snapshot, queue = task_events.subscribe(task_id, lambda: task_snapshot(task_id))
+
+    async def events():
+        try:
+            yield format_event(SNAPSHOT_EVENT, snapshot)
+            status = snapshot["status"]
+            while status not in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=EVENT_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(event, data)
+                if event == STATUS_EVENT:
+                    status = data["status"]
+        finally:
+            task_events.unsubscribe(task_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/llm/stats", response_model=Dict[str, Any])
+def get_llm_stats():
+    """Get request, token usage and response cache statistics of the LLM gateway, and prompt cache statistics."""
+    registry = get_agent_registry()
+    stats = registry.llm_gateway.stats()
+    stats["prompt_cache"] = registry.prompt_cache.stats() if registry.prompt_cache is not None else None
+    return stats
+
+@router.delete("/llm/prompt-cache", response_model=Dict[str, Any])
+def clear_prompt_cache():
+    """Remove every cached generate-code result, e.g. after the prompts changed; knowledge base changes drop them automatically."""
+    registry = get_agent_registry()
+    if registry.prompt_cache is None:
+        raise HTTPException(status_code=400, detail="The prompt cache is disabled (see PROMPT_CACHE_ENABLED)")
+    return {"removed": registry.prompt_cache.invalidate()}
+
+def invalidate_prompt_cache() -> None:
+    """Drop the cached generate-code results of an earlier version of the knowledge base."""
+    try:
+        registry = get_agent_registry()
+        if registry.prompt_cache is not None:
+            registry.prompt_cache.invalidate_stale(registry.knowledge_version())
+    except Exception as e:
+        logger.warning(f"Prompt cache invalidation failed: {str(e)}")
+
+def get_collection(name: str) -> "RAGService":
+    """
+    Open a collection of the knowledge base, answering 404 if it does not exist.
+    
+    This waits for warm-up to build the registry and may load a snapshot, so
+    handlers calling it are plain functions, run in the thread pool rather
+    than on the event loop.
+    """
+    registry = get_agent_registry()
+    try:
+        return registry.collections.get(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Collection '{name}' not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def get_writable_collection(name: str) -> "RAGService":
+    """
+    Open a collection to change it, answering 409 if this worker only follows it.
+    
+    Each collection is written by the one worker process holding its lock;
+    the other workers serve it read-only.
+    """
+    rag_service = get_collection(name)
+    if rag_service.read_only:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Collection '{name}' is written by another process; retry, or run a single writer worker"
+        )
+    return rag_service
+
+@router.get("/rag/stats", response_model=Dict[str, Any])
+def get_rag_stats(collection: str = DEFAULT_COLLECTION):
+    """Get vector store and embedding cache statistics."""
+    return get_collection(collection).stats()
+
+@router.get("/rag/collections", response_model=List[Dict[str, Any]])
+def list_collections():
+    """List the collections of the knowledge base."""
+    registry = get_agent_registry()
+    return registry.collections.list()
+
+@router.post("/rag/collections", response_model=Dict[str, Any])
+def create_collection(request: CreateCollectionRequest):
+    """Create an empty collection, optionally with its own index and retrieval settings."""
+    registry = get_agent_registry()
+    try:
+        return registry.collections.create(request.name, request.settings)
+    except FileExistsError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/rag/collections/{name}", response_model=Dict[str, Any])
+def get_collection_info(name: str):
+    """Get the settings and statistics of a collection."""
+    get_collection(name)
+    registry = get_agent_registry()
+    return registry.collections.describe(name)
+
+@router.delete("/rag/collections/{name}", response_model=Dict[str, Any])
+def delete_collection(name: str):
+    """Delete a collection and all of its documents."""
+    registry = get_agent_registry()
+    agents = [agent for agent, collection in registry.agent_collections().items() if collection == name]
+    if agents:
+        raise HTTPException(status_code=409, detail=f"Collection '{name}' is queried by the agents: {', '.join(agents)}")
+    get_writable_collection(name)
+    try:
+        registry.collections.delete(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Collection '{name}' not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"name": name, "deleted": True}
+
+@router.post("/rag/ingest", response_model=TaskResponse)
+def ingest_documents(
+    request: IngestDocumentsRequest,
+    background_tasks: BackgroundTasks
+):
+    """Add documents to the knowledge base in bulk."""
+    rag_service = get_writable_collection(request.collection)
+    task_id = f"task_{len(tasks) + 1}"
+    tasks[task_id] = {"status": TaskStatus.PENDING, "result": None}
+    
+    def process_ingestion():
+        try:
+            settings = rag_service.settings
+            documents = []
+            for document in request.documents:
+                language = normalize_language(document.language)
+                if document.chunk:
+                    documents.extend(chunk_document(
+                        document.content,
+                        language=language,
+                        metadata=document.metadata,
+                        max_tokens=settings.ingest_chunk_tokens,
+                        max_lines=settings.ingest_chunk_lines
+                    ))
+                else:
+                    metadata = dict(document.metadata or {})
+                    if language:
+                        metadata["language"] = language
+                    documents.append({"content": document.content, "metadata": metadata})
+            doc_ids = rag_service.add_documents(
+                documents,
+                batch_size=request.batch_size,
+                checkpoint_interval=request.checkpoint_interval
+            )
+            set_task_result(task_id, TaskStatus.COMPLETED, {
+                "added": len(doc_ids),
+                "first_id": doc_ids[0] if doc_ids else None,
+                "last_id": doc_ids[-1] if doc_ids else None
+            })
+        except Exception as e:
+            logger.error(f"Error in document ingestion: {str(e)}")
+            set_task_result(task_id, TaskStatus.FAILED, {"error": str(e)})
+        finally:
+            invalidate_prompt_cache()
+    
+    background_tasks.add_task(process_ingestion)
+    return {"task_id": task_id, "status": TaskStatus.PENDING}
+
+@router.get("/rag/documents/{doc_id}", response_model=Dict[str, Any])
+def get_document(doc_id: int, collection: str = DEFAULT_COLLECTION):
+    """Get a document of the knowledge base by ID."""
+    document = get_collection(collection).get_document(doc_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return document
+
+@router.put("/rag/documents/{doc_id}", response_model=TaskResponse)
+def update_document(
+    doc_id: int,
+    request: UpdateDocumentRequest,
+    background_tasks: BackgroundTasks,
+    collection: str = DEFAULT_COLLECTION
+):
+    """Replace the content and metadata of a document, keeping its ID."""
+    rag_service = get_writable_collection(collection)
+    if rag_service.get_document(doc_id) is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    task_id = f"task_{len(tasks) + 1}"
+    tasks[task_id] = {"status": TaskStatus.PENDING, "result": None}
+    
+    def process_update():
+        try:
+            metadata = dict(request.metadata or {})
+            if request.language:
+                metadata["language"] = normalize_language(request.language)
+            updated = rag_service.update_document(doc_id, request.content, metadata)
+            set_task_result(task_id, TaskStatus.COMPLETED if updated else TaskStatus.FAILED, {"id": doc_id, "updated": updated})
+        except Exception as e:
+            logger.error(f"Error in document update: {str(e)}")
+            set_task_result(task_id, TaskStatus.FAILED, {"error": str(e)})
+        finally:
+            invalidate_prompt_cache()
+    
+    background_tasks.add_task(process_update)
+    return {"task_id": task_id, "status": TaskStatus.PENDING}
+
+@router.delete("/rag/documents/{doc_id}", response_model=Dict[str, Any])
+def delete_document(doc_id: int, collection: str = DEFAULT_COLLECTION):
+    """Delete a document from the knowledge base."""
+    if not get_writable_collection(collection).delete_document(doc_id):
+        raise HTTPException(status_code=404, detail="Document not found")
+    invalidate_prompt_cache()
+    return {"id": doc_id, "deleted": True}
+
+@router.post("/rag/ingest-codebase", response_model=TaskResponse)
+def ingest_codebase(
+    request: IngestCodebaseRequest,
+    background_tasks: BackgroundTasks
+):
+    """
+    Incrementally index a local source tree into the knowledge base.
+    
+    Indexed files can be read back through the document and retrieval
+    endpoints, so only trees under INGEST_ALLOWED_ROOTS are accepted; the
+    endpoint is disabled until it is set.
+    """
+    settings = get_settings()
+    allowed_roots = [os.path.realpath(root.strip()) for root in settings.ingest_allowed_roots.split(",") if root.strip()]
+    if not allowed_roots:
+        raise HTTPException(status_code=403, detail="Codebase ingestion is disabled, set INGEST_ALLOWED_ROOTS to enable it")
+    # Resolve symlinks so a link inside an allowed root cannot point outside it
+    path = os.path.realpath(request.path)
+    if not any(os.path.commonpath([path, root]) == root for root in allowed_roots):
+        raise HTTPException(status_code=403, detail="Path is outside the allowed ingestion roots")
+    rag_service = get_writable_collection(request.collection)
+    
+    task_id = f"task_{len(tasks) + 1}"
+    tasks[task_id] = {"status": TaskStatus.PENDING, "result": None}
+    
+    def process_codebase_ingestion():
+        try:
+            ingestor = CodebaseIngestor(rag_service, workers=request.workers)
+            result = ingestor.ingest(path, extensions=request.extensions)
+            set_task_result(task_id, TaskStatus.COMPLETED, result)
+        except Exception as e:
+            logger.error(f"Error in codebase ingestion: {str(e)}")
+            set_task_result(task_id, TaskStatus.FAILED, {"error": str(e)})
+        finally:
+            invalidate_prompt_cache()
+    
+    background_tasks.add_task(process_codebase_ingestion)
+    return {"task_id": task_id, "status": TaskStatus.PENDING}
+
 @router.post("/debug-code", response_model=TaskResponse)
 async def debug_code(
     request: DebugCodeRequest,
@@ -95,18 +554,14 @@ async def debug_code(
             registry = get_agent_registry()
             debugged_code = registry.debugging_agent.debug_code(
                 request.code, 
-                request.language
+                request.language,
+                request.error_messages,
+                use_cache=not request.bypass_cache
             )
-            tasks[task_id] = {
-                "status": TaskStatus.COMPLETED,
-                "result": {"code": debugged_code, "language": request.language}
-            }
+            set_task_result(task_id, TaskStatus.COMPLETED, {"code": debugged_code, "language": request.language})
         except Exception as e:
             logger.error(f"Error in debugging: {str(e)}")
-            tasks[task_id] = {
-                "status": TaskStatus.FAILED,
-                "result": {"error": str(e)}
-            }
+            set_task_result(task_id, TaskStatus.FAILED, {"error": str(e)})
     
     background_tasks.add_task(process_debugging)
     return {"task_id": task_id, "status": TaskStatus.PENDING}
@@ -126,18 +581,13 @@ async def optimize_code(
             optimized_code = registry.optimization_agent.optimize_code(
                 request.code, 
                 request.language,
-                request.optimization_target
+                request.optimization_target,
+                use_cache=not request.bypass_cache
             )
-            tasks[task_id] = {
-                "status": TaskStatus.COMPLETED,
-                "result": {"code": optimized_code, "language": request.language}
-            }
+            set_task_result(task_id, TaskStatus.COMPLETED, {"code": optimized_code, "language": request.language})
         except Exception as e:
             logger.error(f"Error in optimization: {str(e)}")
-            tasks[task_id] = {
-                "status": TaskStatus.FAILED,
-                "result": {"error": str(e)}
-            }
+            set_task_result(task_id, TaskStatus.FAILED, {"error": str(e)})
     
     background_tasks.add_task(process_optimization)
     return {"task_id": task_id, "status": TaskStatus.PENDING}
@@ -157,18 +607,13 @@ async def document_code(
             documented_code = registry.documentation_agent.document_code(
                 request.code, 
                 request.language,
-                request.documentation_style
+                request.documentation_style,
+                use_cache=not request.bypass_cache
             )
-            tasks[task_id] = {
-                "status": TaskStatus.COMPLETED,
-                "result": {"code": documented_code, "language": request.language}
-            }
+            set_task_result(task_id, TaskStatus.COMPLETED, {"code": documented_code, "language": request.language})
         except Exception as e:
             logger.error(f"Error in documentation: {str(e)}")
-            tasks[task_id] = {
-                "status": TaskStatus.FAILED,
-                "result": {"error": str(e)}
-            }
+            set_task_result(task_id, TaskStatus.FAILED, {"error": str(e)})
     
     background_tasks.add_task(process_documentation)
     return {"task_id": task_id, "status": TaskStatus.PENDING}
@@ -191,16 +636,10 @@ async def github_integration(
                 commit_message=request.commit_message,
                 branch=request.branch
             )
-            tasks[task_id] = {
-                "status": TaskStatus.COMPLETED,
-                "result": result
-            }
+            set_task_result(task_id, TaskStatus.COMPLETED, result)
         except Exception as e:
             logger.error(f"Error in GitHub integration: {str(e)}")
-            tasks[task_id] = {
-                "status": TaskStatus.FAILED,
-                "result": {"error": str(e)}
-            }
+            set_task_result(task_id, TaskStatus.FAILED, {"error": str(e)})
     
     background_tasks.add_task(process_github_integration)
     return {"task_id": task_id, "status": TaskStatus.PENDING}
\ No newline at end of file
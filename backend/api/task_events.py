@@ -0,0 +1,86 @@
+import asyncio
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Event types of a task stream
+SNAPSHOT_EVENT = "snapshot"
+STATUS_EVENT = "status"
+STAGE_EVENT = "stage"
+TOKEN_EVENT = "token"
+
+class TaskEventBroker:
+    """Fans out task events from the worker threads to the event stream subscribers.
+
+    Tasks run in the thread pool of the background tasks while subscribers
+    wait on the event loop, so each subscriber gets an asyncio queue that
+    publishers fill through call_soon_threadsafe. Publishing applies its
+    state update under the same lock that subscribing takes its snapshot
+    under, so a subscriber sees every event exactly once: either folded into
+    the snapshot or delivered after it.
+    """
+
+    def __init__(self):
+        """Initialize the broker."""
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+    def publish(
+        self,
+        task_id: str,
+        event: str,
+        data: Dict[str, Any],
+        update: Optional[Callable[[], None]] = None
+    ) -> None:
+        """
+        Apply a state update and send an event to the subscribers of a task.
+
+        Args:
+            task_id: Task ID
+            event: Event type
+            data: Event data, serializable to JSON
+            update: Change to the task state that the event reports
+        """
+        with self._lock:
+            if update is not None:
+                update()
+            for loop, queue in self._subscribers.get(task_id, ()):
+                try:
+                    loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+                except RuntimeError:
+                    # The subscriber's event loop is closed; it is removed when its stream ends
+                    pass
+
+    def subscribe(self, task_id: str, snapshot: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], asyncio.Queue]:
+        """
+        Subscribe to the events of a task. Must be called from the event loop.
+
+        Args:
+            task_id: Task ID
+            snapshot: Returns the current state of the task
+
+        Returns:
+            The state of the task and the queue receiving its later events
+        """
+        queue = asyncio.Queue()
+        with self._lock:
+            state = snapshot()
+            self._subscribers.setdefault(task_id, []).append((asyncio.get_running_loop(), queue))
+        return state, queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue) -> None:
+        """Stop sending the events of a task to a queue."""
+        with self._lock:
+            subscribers = [entry for entry in self._subscribers.get(task_id, []) if entry[1] is not queue]
+            if subscribers:
+                self._subscribers[task_id] = subscribers
+            else:
+                self._subscribers.pop(task_id, None)
+
+def format_event(event: str, data: Dict[str, Any]) -> str:
+    """Format an event as a Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
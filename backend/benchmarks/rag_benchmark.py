@@ -0,0 +1,471 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Peak RSS is not reported where resource is unavailable
+    resource = None
+
+from backend.config import get_settings
+from backend.services.embeddings import EmbeddingProvider
+from backend.services.rag import RETRIEVAL_MODES, RAGService
+from backend.services.vector_index import COMPRESSIONS, INDEX_TYPES
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Files of a benchmark dataset directory
+VECTORS_FILE = "vectors.npy"
+QUERIES_FILE = "queries.npy"
+DATASET_META_FILE = "meta.json"
+
+# Rows generated or compared per step
+CHUNK_SIZE = 65536
+
+# Words the synthetic document texts are made of, so lexical and hybrid retrieval have something to match
+VOCABULARY = (
+    "parser", "socket", "cache", "thread", "index", "buffer", "token", "schema", "router", "query",
+    "stream", "worker", "config", "logger", "client", "server", "record", "session", "matrix", "vector",
+    "encoder", "batch", "queue", "lock", "handler", "model", "report", "widget", "graph", "tensor",
+    "filter", "digest",
+)
+
+def document_text(number: int) -> str:
+    """Return the text of the synthetic document at a dataset row."""
+    first = VOCABULARY[number % len(VOCABULARY)]
+    second = VOCABULARY[(number // len(VOCABULARY)) % len(VOCABULARY)]
+    return f"doc-{number} Synthetic document about the {first} {second}"
+
+def query_text(number: int) -> str:
+    """Return the text of the synthetic query at a dataset row."""
+    return f"query-{number} Find code about the {VOCABULARY[number % len(VOCABULARY)]}"
+
+class LookupEmbeddingProvider(EmbeddingProvider):
+    """Embeddings looked up from the rows of a benchmark dataset.
+
+    The texts produced by document_text and query_text name their dataset
+    row, so embedding them is a lookup: the benchmark measures the store
+    rather than an embedding model, and runs offline.
+    """
+
+    cacheable = False
+
+    def __init__(self, name: str, vectors: np.ndarray, queries: np.ndarray):
+        """
+        Initialize the provider.
+
+        Args:
+            name: Name of the embedding space, stored in the snapshot metadata
+            vectors: Document vectors by dataset row
+            queries: Query vectors by dataset row
+        """
+        self.name = name
+        self.dimension = vectors.shape[1]
+        self.vectors = vectors
+        self.queries = queries
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Look up the vectors of a batch of texts."""
+        rows = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            kind, number = text.split(" ", 1)[0].split("-")
+            rows[row] = (self.queries if kind == "query" else self.vectors)[int(number)]
+        return rows
+
+def generate_dataset(
+    directory: str,
+    num_vectors: int,
+    num_queries: int,
+    dimension: int,
+    clusters: int,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Generate a synthetic dataset of clustered unit vectors.
+
+    Vectors are drawn around random cluster centers and normalized like
+    embeddings; queries are drawn the same way, so they are near but not
+    in the corpus. Vectors are written chunk by chunk into a memory-mapped
+    file, so corpora larger than memory can be generated.
+
+    Args:
+        directory: Directory to write the dataset to
+        num_vectors: Number of document vectors
+        num_queries: Number of query vectors
+        dimension: Vector dimension
+        clusters: Number of clusters
+        seed: Random seed
+
+    Returns:
+        Dataset metadata
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype(np.float32)
+
+    def sample(count: int) -> np.ndarray:
+        points = centers[rng.integers(clusters, size=count)] + rng.normal(size=(count, dimension)).astype(np.float32)
+        return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+    logger.info(f"Generating {num_vectors} {dimension}-dimensional vectors in {clusters} clusters")
+    vectors = np.lib.format.open_memmap(os.path.join(directory, VECTORS_FILE), mode="w+",
+                                        dtype=np.float32, shape=(num_vectors, dimension))
+    for start in range(0, num_vectors, CHUNK_SIZE):
+        vectors[start:start + CHUNK_SIZE] = sample(min(CHUNK_SIZE, num_vectors - start))
+    vectors.flush()
+    del vectors
+    np.save(os.path.join(directory, QUERIES_FILE), sample(num_queries))
+
+    meta = {
+        "source": "synthetic",
+        "vectors": num_vectors,
+        "queries": num_queries,
+        "dimension": dimension,
+        "clusters": clusters,
+        "seed": seed
+    }
+    with open(os.path.join(directory, DATASET_META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+def load_dataset(directory: str) -> Tuple[np.ndarray, np.ndarray, Dict[str, Any]]:
+    """
+    Open a saved dataset.
+
+    A dataset is a directory with float32 vectors.npy and queries.npy, for
+    example real embeddings exported from a store, and an optional meta.json.
+
+    Args:
+        directory: Dataset directory
+
+    Returns:
+        Tuple of (memory-mapped document vectors, query vectors, metadata)
+    """
+    vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r")
+    queries = np.load(os.path.join(directory, QUERIES_FILE)).astype(np.float32)
+    meta_path = os.path.join(directory, DATASET_META_FILE)
+    meta = {"source": directory}
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+    meta.update({"vectors": len(vectors), "queries": len(queries), "dimension": vectors.shape[1]})
+    return vectors, queries, meta
+
+def ground_truth_path(directory: str, num_vectors: int, k: int) -> str:
+    """Return the file holding the exact neighbors of the queries among the first vectors."""
+    return os.path.join(directory, f"ground_truth_{num_vectors}_{k}.npy")
+
+def exact_neighbors(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """
+    Find the exact k nearest vectors of every query by L2 distance.
+
+    Args:
+        vectors: Document vectors (may be memory-mapped)
+        queries: Query vectors
+        k: Number of neighbors
+
+    Returns:
+        Matrix of dataset rows, one row of k neighbors per query, nearest first
+    """
+    best_distances = np.full((len(queries), 0), np.inf, dtype=np.float32)
+    best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+    for start in range(0, len(vectors), CHUNK_SIZE):
+        chunk = np.ascontiguousarray(vectors[start:start + CHUNK_SIZE], dtype=np.float32)
+        distances, rows = faiss.knn(queries, chunk, min(k, len(chunk)))
+        best_distances = np.hstack([best_distances, distances])
+        best_rows = np.hstack([best_rows, rows + start])
+        order = np.argsort(best_distances, axis=1, kind="stable")[:, :k]
+        best_distances = np.take_along_axis(best_distances, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+    return best_rows
+
+def _latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """Summarize query latencies in milliseconds."""
+    milliseconds = np.asarray(latencies) * 1000
+    return {
+        "p50": round(float(np.percentile(milliseconds, 50)), 3),
+        "p95": round(float(np.percentile(milliseconds, 95)), 3),
+        "p99": round(float(np.percentile(milliseconds, 99)), 3),
+        "mean": round(float(milliseconds.mean()), 3),
+        "max": round(float(milliseconds.max()), 3)
+    }
+
+def _current_rss_mb() -> Optional[float]:
+    """Return the resident set size of this process, where /proc is available."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20, 1)
+
+def _peak_rss_mb() -> Optional[float]:
+    """Return the peak resident set size of this process."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (2 ** 20 if platform.system() == "Darwin" else 2 ** 10), 1)
+
+def _directory_size(directory: str) -> int:
+    """Return the total size of the files under a directory."""
+    return sum(os.path.getsize(os.path.join(path, filename))
+               for path, _, filenames in os.walk(directory) for filename in filenames)
+
+def run_configuration(
+    dataset_dir: str,
+    num_vectors: int,
+    configuration: Dict[str, Any],
+    options: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Ingest a corpus into a fresh store with one configuration and measure it.
+
+    The corpus is added with RAGService.add_documents and the snapshot
+    index is built by one compaction, which are timed separately. Queries
+    then run through retrieve_context, which retrieve wraps, so latencies
+    cover the whole retrieval path except the embedding call. Results are
+    ranked by relevance alone (MMR lambda 1.0), so the returned documents
+    can be compared with the exact neighbors for recall@k.
+
+    Args:
+        dataset_dir: Dataset directory with the ground truth for num_vectors
+        num_vectors: Number of dataset vectors to ingest
+        configuration: "index_type", "compression" and "retrieval_cache" to benchmark
+        options: "k", "mode", "threads", "batch_size", "work_dir" and "keep_stores"
+
+    Returns:
+        Measurements of the configuration
+    """
+    # Info logging of every query would dominate the measured latencies
+    logging.getLogger("backend.services").setLevel(logging.WARNING)
+    vectors, queries, meta = load_dataset(dataset_dir)
+    truth = np.load(ground_truth_path(dataset_dir, num_vectors, options["k"]))
+    provider = LookupEmbeddingProvider(f"benchmark-{meta.get('source', 'dataset')}-{vectors.shape[1]}",
+                                       vectors, queries)
+    k = options["k"]
+
+    settings = get_settings().model_copy(update={
+        "rag_index_type": configuration["index_type"],
+        "rag_vector_compression": configuration["compression"],
+        # Stay on the in-memory delta until the measured build
+        "rag_index_promotion_threshold": num_vectors + 1,
+        "wal_compaction_threshold": num_vectors + 1,
+        "wal_fsync": False,
+        "retrieval_cache_enabled": configuration["retrieval_cache"],
+        "rag_retrieval_mode": options["mode"],
+        "rag_mmr_lambda": 1.0,
+        "rag_context_max_tokens": max(k * 100, 3000),
+        "embedding_cache_enabled": False
+    })
+    store_dir = tempfile.mkdtemp(prefix="store-", dir=options["work_dir"])
+    result = {"documents": num_vectors, **configuration}
+    try:
+        rag_service = RAGService(store_dir, settings=settings, embedding_provider=provider)
+
+        start_time = time.perf_counter()
+        doc_ids = rag_service.add_documents((document_text(row) for row in range(num_vectors)),
+                                            batch_size=options["batch_size"])
+        ingest_seconds = time.perf_counter() - start_time
+        settings.rag_index_promotion_threshold = 0
+        start_time = time.perf_counter()
+        rag_service.compact()
+        build_seconds = time.perf_counter() - start_time
+        stats = rag_service.stats()
+
+        row_of = {doc_id: row for row, doc_id in enumerate(doc_ids)}
+        texts = [query_text(row) for row in range(len(queries))]
+
+        def timed_query(text: str) -> Tuple[float, List[int]]:
+            query_start = time.perf_counter()
+            documents = rag_service.retrieve_context(text, top_k=k)["documents"]
+            return time.perf_counter() - query_start, documents
+
+        # A second pass over the same queries measures retrieval cache hits
+        passes = []
+        for _ in range(2 if configuration["retrieval_cache"] else 1):
+            start_time = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["threads"]) as executor:
+                answers = list(executor.map(timed_query, texts))
+            wall_seconds = time.perf_counter() - start_time
+            passes.append((answers, wall_seconds))
+
+        answers, wall_seconds = passes[0]
+        hits = [len({row_of[doc_id] for doc_id in documents[:k]} & set(truth[number].tolist()))
+                for number, (_, documents) in enumerate(answers)]
+        result.update({
+            "built_index_type": stats["index_type"],
+            "built_compression": stats["compression"],
+            "ingest": {
+                "seconds": round(ingest_seconds, 3),
+                "documents_per_second": round(num_vectors / ingest_seconds, 1)
+            },
+            "build_seconds": round(build_seconds, 3),
+            "latency_ms": _latency_summary([latency for latency, _ in answers]),
+            "qps": round(len(answers) / wall_seconds, 1),
+            "recall_at_k": round(sum(hits) / (k * len(hits)), 4),
+        })
+        if len(passes) > 1:
+            answers, wall_seconds = passes[1]
+            result["cached"] = {
+                "latency_ms": _latency_summary([latency for latency, _ in answers]),
+                "qps": round(len(answers) / wall_seconds, 1)
+            }
+
+        with open(os.path.join(store_dir, "CURRENT")) as f:
+            snapshot_dir = os.path.join(store_dir, "snapshots", f.read().strip())
+        result.update({
+            "rss_mb": _current_rss_mb(),
+            "peak_rss_mb": _peak_rss_mb(),
+            "disk_bytes": _directory_size(store_dir),
+            "index_bytes": os.path.getsize(os.path.join(snapshot_dir, "index.faiss"))
+        })
+        rag_service.close()
+    finally:
+        if not options["keep_stores"]:
+            shutil.rmtree(store_dir, ignore_errors=True)
+    return result
+
+def _configurations(index_types: List[str], compressions: List[str], caches: List[bool]) -> List[Dict[str, Any]]:
+    """List the configurations to benchmark; ivf_pq always stores PQ codes, so it runs once per cache setting."""
+    configurations = []
+    for index_type in index_types:
+        for compression in (["pq"] if index_type == "ivf_pq" else compressions):
+            for retrieval_cache in caches:
+                configurations.append({
+                    "index_type": index_type,
+                    "compression": compression,
+                    "retrieval_cache": retrieval_cache
+                })
+    return configurations
+
+def _split(value: str) -> List[str]:
+    """Split a comma-separated option."""
+    return [item.strip().lower() for item in value.split(",") if item.strip()]
+
+def main() -> None:
+    """Benchmark RAG ingestion and retrieval across corpus sizes, index types and cache settings.
+
+    Every configuration runs in a fresh process against a fresh store, so
+    the reported memory belongs to that configuration alone. The report is
+    JSON with one result per corpus size and configuration.
+    """
+    parser = argparse.ArgumentParser(prog="python -m backend.benchmarks.rag_benchmark", description=main.__doc__)
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="Comma-separated corpus sizes, e.g. 1000,10000,100000,1000000")
+    parser.add_argument("--index-types", default=",".join(INDEX_TYPES),
+                        help=f"Comma-separated index types out of {', '.join(INDEX_TYPES)}")
+    parser.add_argument("--compressions", default="none",
+                        help=f"Comma-separated vector compressions out of {', '.join(COMPRESSIONS)}")
+    parser.add_argument("--retrieval-cache", choices=("off", "on", "both"), default="off",
+                        help="Benchmark with the retrieval cache disabled, enabled or both")
+    parser.add_argument("--mode", choices=RETRIEVAL_MODES, default="vector",
+                        help="Retrieval mode; recall is measured against exact vector search")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries of a generated dataset")
+    parser.add_argument("--k", type=int, default=10, help="Number of documents retrieved per query")
+    parser.add_argument("--threads", type=int, default=1, help="Number of threads sending queries")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Documents per add_documents batch")
+    parser.add_argument("--dimension", type=int, default=128, help="Vector dimension of a generated dataset")
+    parser.add_argument("--clusters", type=int, default=0, help="Clusters of a generated dataset, 0 for about sqrt(n)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of a generated dataset")
+    parser.add_argument("--dataset", help="Dataset directory to load, or to generate the dataset into if it has none")
+    parser.add_argument("--work-dir", help="Directory for the stores and a generated dataset, defaults to a temporary one")
+    parser.add_argument("--keep-stores", action="store_true", help="Keep the benchmark stores after each run")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Run every configuration in this process; peak RSS then covers all of them")
+    parser.add_argument("--output", help="File to write the JSON report to, defaults to standard output")
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in _split(args.sizes))
+    index_types = _split(args.index_types)
+    compressions = _split(args.compressions)
+    for name, values, allowed in (("index type", index_types, INDEX_TYPES), ("compression", compressions, COMPRESSIONS)):
+        unknown = [value for value in values if value not in allowed]
+        if unknown:
+            parser.error(f"Unknown {name} {unknown}, expected some of {allowed}")
+    caches = {"off": [False], "on": [True], "both": [False, True]}[args.retrieval_cache]
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="rag-benchmark-")
+    os.makedirs(work_dir, exist_ok=True)
+    dataset_dir = args.dataset or os.path.join(work_dir, "dataset")
+    if not os.path.exists(os.path.join(dataset_dir, VECTORS_FILE)):
+        generate_dataset(dataset_dir, sizes[-1], args.queries, args.dimension,
+                         args.clusters or max(1, int(np.sqrt(sizes[-1]))), args.seed)
+    vectors, queries, dataset_meta = load_dataset(dataset_dir)
+    if sizes[-1] > len(vectors):
+        parser.error(f"Dataset {dataset_dir} holds only {len(vectors)} vectors")
+
+    for size in sizes:
+        path = ground_truth_path(dataset_dir, size, args.k)
+        if not os.path.exists(path):
+            logger.info(f"Computing exact neighbors of {len(queries)} queries among {size} vectors")
+            np.save(path, exact_neighbors(vectors[:size], queries, args.k))
+    del vectors
+
+    options = {
+        "k": args.k,
+        "mode": args.mode,
+        "threads": args.threads,
+        "batch_size": args.batch_size,
+        "work_dir": work_dir,
+        "keep_stores": args.keep_stores
+    }
+    results = []
+    for size in sizes:
+        for configuration in _configurations(index_types, compressions, caches):
+            logger.info(f"Benchmarking {configuration} on {size} documents")
+            try:
+                if args.in_process:
+                    result = run_configuration(dataset_dir, size, configuration, options)
+                else:
+                    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                        result = pool.submit(run_configuration, dataset_dir, size, configuration, options).result()
+            except Exception as e:
+                logger.error(f"Error benchmarking {configuration} on {size} documents: {str(e)}")
+                result = {"documents": size, **configuration, "error": str(e)}
+            else:
+                logger.info(f"p50 {result['latency_ms']['p50']} ms, p99 {result['latency_ms']['p99']} ms, "
+                            f"{result['qps']} QPS, recall@{args.k} {result['recall_at_k']}")
+            results.append(result)
+
+    report = {
+        "created_at": time.time(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "faiss": getattr(faiss, "__version__", None),
+            "faiss_threads": faiss.omp_get_max_threads()
+        },
+        "dataset": dataset_meta,
+        "parameters": {key: value for key, value in options.items() if key not in ("work_dir", "keep_stores")},
+        "results": results
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        logger.info(f"Wrote benchmark report to {args.output}")
+    else:
+        print(output)
+    if not args.work_dir and not args.keep_stores:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import argparse
+import json
+import logging
+
+from backend.config import Settings, get_settings
+from backend.services.collection_manager import DEFAULT_COLLECTION, CollectionManager
+from backend.services.ingestion import CodebaseIngestor
+from backend.services.rag import RAGService
+from backend.services.vector_index import COMPRESSIONS, INDEX_TYPES
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+def writer_settings() -> Settings:
+    """Return the application settings for opening stores to write, failing if another process writes to them."""
+    return get_settings().model_copy(update={"rag_store_mode": "writer"})
+
+def ingest(args: argparse.Namespace) -> None:
+    """Incrementally index a local source tree into the knowledge base."""
+    collections = CollectionManager(writer_settings(), root_path=args.vector_db_path)
+    rag_service = collections.get(args.collection, create=True)
+    ingestor = CodebaseIngestor(rag_service, workers=args.workers,
+                                chunk_lines=args.chunk_lines, chunk_tokens=args.chunk_tokens)
+    extensions = [extension.strip() for extension in args.extensions.split(",")] if args.extensions else None
+    stats = ingestor.ingest(args.path, extensions=extensions)
+    rag_service.compact()
+    print(json.dumps(stats, indent=2))
+
+def migrate_index(args: argparse.Namespace) -> None:
+    """Rebuild the vector index of a store with another index type or vector compression."""
+    collections = CollectionManager(writer_settings(), root_path=args.vector_db_path)
+    overrides = {}
+    if args.index_type:
+        # Use the requested type whatever the store size
+        overrides["rag_index_type"] = args.index_type
+        overrides["rag_index_promotion_threshold"] = 0
+    if args.compression:
+        overrides["rag_vector_compression"] = args.compression
+    rag_service = RAGService(
+        vector_db_path=collections.path_of(args.collection),
+        settings=collections.settings_for(args.collection)
+    )
+    before = rag_service.stats()
+    # Pinned in the new snapshot, so later compactions keep the index; no overrides unpin it
+    rag_service.pin_index_settings(overrides)
+    rag_service.compact(purge=True, rebuild=True)
+    after = rag_service.stats()
+    rag_service.close()
+    print(json.dumps({
+        "documents": after["documents"],
+        "from": {"index_type": before["index_type"], "compression": before["compression"]},
+        "to": {"index_type": after["index_type"], "compression": after["compression"]},
+        "pinned": after["index_settings"],
+        "snapshot_seq": after["snapshot_seq"]
+    }, indent=2))
+
+def main() -> None:
+    """Command-line entry point for maintenance tasks.
+
+    These commands write to the vector store directly, so run them while the
+    API server is stopped, or while all of its workers follow the store
+    read-only with RAG_STORE_MODE=reader; a store another process writes to
+    is refused.
+    """
+    parser = argparse.ArgumentParser(prog="python -m backend.cli", description=main.__doc__)
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subcommands.add_parser("ingest", help="Index a local source tree")
+    ingest_parser.add_argument("path", help="Root directory of the source tree")
+    ingest_parser.add_argument("--extensions", help="Comma-separated file extensions, e.g. .py,.js")
+    ingest_parser.add_argument("--workers", type=int, help="Number of worker processes")
+    ingest_parser.add_argument("--chunk-lines", type=int, help="Maximum number of lines per chunk")
+    ingest_parser.add_argument("--chunk-tokens", type=int, help="Maximum number of tokens per chunk")
+    ingest_parser.add_argument("--vector-db-path", help="Vector store directory, defaults to VECTOR_DB_PATH")
+    ingest_parser.add_argument("--collection", default=DEFAULT_COLLECTION,
+                               help="Collection to index into, created if it does not exist")
+    ingest_parser.set_defaults(handler=ingest)
+
+    migrate_parser = subcommands.add_parser(
+        "migrate-index",
+        help="Rebuild the vector index, e.g. to compress a store or convert a legacy index.faiss into a snapshot"
+    )
+    migrate_parser.add_argument("--index-type", choices=INDEX_TYPES,
+                                help="Index type kept by later compactions, defaults to RAG_INDEX_TYPE")
+    migrate_parser.add_argument("--compression", choices=COMPRESSIONS,
+                                help="Vector compression kept by later compactions, defaults to RAG_VECTOR_COMPRESSION")
+    migrate_parser.add_argument("--vector-db-path", help="Vector store directory, defaults to VECTOR_DB_PATH")
+    migrate_parser.add_argument("--collection", default=DEFAULT_COLLECTION, help="Collection to migrate")
+    migrate_parser.set_defaults(handler=migrate_index)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
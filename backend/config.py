@@ -15,6 +15,27 @@ class Settings(BaseSettings):
     # OpenAI API settings
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
     openai_model: str = os.getenv("OPENAI_MODEL", "gpt-4o")
+    # Connection pool shared by all OpenAI requests
+    llm_http2: bool = os.getenv("LLM_HTTP2", "True").lower() in ('true', '1', 't')
+    llm_max_connections: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    llm_max_keepalive_connections: int = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    llm_keepalive_expiry: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+    llm_timeout: float = float(os.getenv("LLM_TIMEOUT", "120"))  # Seconds per read, write and pool wait
+    llm_connect_timeout: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+    llm_max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    # Exact-match cache of chat completions, used for requests at or below the maximum temperature
+    llm_cache_enabled: bool = os.getenv("LLM_CACHE_ENABLED", "True").lower() in ('true', '1', 't')
+    llm_cache_path: str = os.getenv("LLM_CACHE_PATH", "")  # Defaults to <vector_db_path>/llm_cache.db
+    llm_cache_ttl: float = float(os.getenv("LLM_CACHE_TTL", "86400"))  # 0 keeps responses until evicted
+    llm_cache_max_size_mb: int = int(os.getenv("LLM_CACHE_MAX_SIZE_MB", "256"))
+    llm_cache_memory_size: int = int(os.getenv("LLM_CACHE_MEMORY_SIZE", "1000"))
+    llm_cache_max_temperature: float = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.2"))
+    # Semantic cache of generate-code results, matched by prompt similarity within the same options
+    prompt_cache_enabled: bool = os.getenv("PROMPT_CACHE_ENABLED", "True").lower() in ('true', '1', 't')
+    prompt_cache_path: str = os.getenv("PROMPT_CACHE_PATH", "")  # Defaults to <vector_db_path>/prompt_cache.db
+    prompt_cache_threshold: float = float(os.getenv("PROMPT_CACHE_THRESHOLD", "0.95"))  # Minimum cosine similarity
+    prompt_cache_max_entries: int = int(os.getenv("PROMPT_CACHE_MAX_ENTRIES", "10000"))
+    prompt_cache_ttl: float = float(os.getenv("PROMPT_CACHE_TTL", "86400"))  # 0 keeps results until evicted
     
     # GitHub API settings
     github_token: str = os.getenv("GITHUB_TOKEN", "")
@@ -23,8 +44,64 @@ class Settings(BaseSettings):
     
     # RAG settings
     vector_db_path: str = os.getenv("VECTOR_DB_PATH", "./vector_db")
+    ingest_workers: int = int(os.getenv("INGEST_WORKERS", "0"))  # 0 uses the CPU count
+    ingest_chunk_lines: int = int(os.getenv("INGEST_CHUNK_LINES", "60"))
+    ingest_chunk_tokens: int = int(os.getenv("INGEST_CHUNK_TOKENS", "512"))
+    ingest_manifest_path: str = os.getenv("INGEST_MANIFEST_PATH", "")  # Defaults to <vector_db_path>/ingest_manifest.json
+    # Comma-separated directories POST /rag/ingest-codebase may index; must be set to use the endpoint
+    ingest_allowed_roots: str = os.getenv("INGEST_ALLOWED_ROOTS", "")
+    retrieval_cache_enabled: bool = os.getenv("RETRIEVAL_CACHE_ENABLED", "True").lower() in ('true', '1', 't')
+    retrieval_cache_size: int = int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024"))
+    retrieval_cache_ttl: float = float(os.getenv("RETRIEVAL_CACHE_TTL", "300"))
+    rag_retrieval_mode: str = os.getenv("RAG_RETRIEVAL_MODE", "auto")  # auto, hybrid, vector or lexical
+    rag_hybrid_candidates: int = int(os.getenv("RAG_HYBRID_CANDIDATES", "50"))
+    rag_rrf_k: int = int(os.getenv("RAG_RRF_K", "60"))
+    rag_context_max_tokens: int = int(os.getenv("RAG_CONTEXT_MAX_TOKENS", "3000"))
+    rag_context_max_document_tokens: int = int(os.getenv("RAG_CONTEXT_MAX_DOCUMENT_TOKENS", "1000"))
+    rag_mmr_lambda: float = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+    rag_mmr_candidates: int = int(os.getenv("RAG_MMR_CANDIDATES", "20"))
+    rag_filter_fields: str = os.getenv("RAG_FILTER_FIELDS", "language,tags,source,kind")  # Comma-separated
+    rag_filter_exact_limit: int = int(os.getenv("RAG_FILTER_EXACT_LIMIT", "20000"))
+    # Compaction drops deleted documents from the index once there are this many, or this share of the store
+    rag_purge_deleted_threshold: int = int(os.getenv("RAG_PURGE_DELETED_THRESHOLD", "1000"))
+    rag_purge_deleted_ratio: float = float(os.getenv("RAG_PURGE_DELETED_RATIO", "0.2"))
+    # Index type used once the store reaches the promotion threshold: flat, ivf_flat, hnsw, ivf_pq
+    rag_index_type: str = os.getenv("RAG_INDEX_TYPE", "hnsw")
+    rag_index_promotion_threshold: int = int(os.getenv("RAG_INDEX_PROMOTION_THRESHOLD", "50000"))
+    rag_index_train_size: int = int(os.getenv("RAG_INDEX_TRAIN_SIZE", "100000"))
+    rag_ivf_nlist: int = int(os.getenv("RAG_IVF_NLIST", "0"))  # 0 picks about 4 * sqrt(n)
+    rag_ivf_nprobe: int = int(os.getenv("RAG_IVF_NPROBE", "16"))
+    rag_hnsw_m: int = int(os.getenv("RAG_HNSW_M", "32"))
+    rag_hnsw_ef_construction: int = int(os.getenv("RAG_HNSW_EF_CONSTRUCTION", "80"))
+    rag_hnsw_ef_search: int = int(os.getenv("RAG_HNSW_EF_SEARCH", "64"))
+    rag_pq_m: int = int(os.getenv("RAG_PQ_M", "64"))
+    # Snapshot vector storage: none (float32), fp16, int8 or pq; raw vectors stay on disk for exact re-ranking
+    rag_vector_compression: str = os.getenv("RAG_VECTOR_COMPRESSION", "none")
+    rag_rerank_factor: int = int(os.getenv("RAG_RERANK_FACTOR", "4"))  # Candidates re-ranked per result
+    wal_fsync: bool = os.getenv("WAL_FSYNC", "False").lower() in ('true', '1', 't')
+    wal_compaction_threshold: int = int(os.getenv("WAL_COMPACTION_THRESHOLD", "1000"))
+    # auto writes to a store if no other process does and follows it read-only otherwise; writer or reader forces a role
+    rag_store_mode: str = os.getenv("RAG_STORE_MODE", "auto")
+    rag_follow_interval: float = float(os.getenv("RAG_FOLLOW_INTERVAL", "1.0"))  # Seconds between read-only catch-ups
+    embedding_provider: str = os.getenv("EMBEDDING_PROVIDER", "openai")  # openai or local
+    embedding_model: str = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+    embedding_dimension: int = int(os.getenv("EMBEDDING_DIMENSION", "0"))  # 0 uses the provider's default
+    embedding_batch_size: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+    embedding_cache_enabled: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "True").lower() in ('true', '1', 't')
+    embedding_cache_path: str = os.getenv("EMBEDDING_CACHE_PATH", "")  # Defaults to <vector_db_path>/embedding_cache.db
+    embedding_cache_memory_size: int = int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "10000"))
+    
+    # Startup settings
+    warmup_enabled: bool = os.getenv("WARMUP_ENABLED", "True").lower() in ('true', '1', 't')
+    warmup_languages: str = os.getenv("WARMUP_LANGUAGES", "python,javascript,java")  # Comma-separated
     
     # Agent settings
+    # Vector store collection queried by each agent; missing collections are created empty
+    requirements_agent_collection: str = os.getenv("REQUIREMENTS_AGENT_COLLECTION", "default")
+    coding_agent_collection: str = os.getenv("CODING_AGENT_COLLECTION", "default")
+    debugging_agent_collection: str = os.getenv("DEBUGGING_AGENT_COLLECTION", "default")
+    optimization_agent_collection: str = os.getenv("OPTIMIZATION_AGENT_COLLECTION", "default")
+    documentation_agent_collection: str = os.getenv("DOCUMENTATION_AGENT_COLLECTION", "default")
     max_iterations: int = int(os.getenv("MAX_ITERATIONS", "10"))
     debug_mode: bool = os.getenv("DEBUG_MODE", "False").lower() in ('true', '1', 't')
     
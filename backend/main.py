@@ -41,9 +41,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import logging
+import time
 
-from backend.api.router import router
+from backend.agents.agent_registry import get_agent_registry
+from backend.api.router import router, readiness
 from backend.config import Settings, get_settings
 
 # Configure logging
@@ -53,13 +56,40 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def warm_up(settings: Settings) -> None:
+    """Build the agent registry and pre-resolve stage contexts, then mark the app ready."""
+    start_time = time.time()
+    try:
+        registry = get_agent_registry()
+        languages = [language.strip() for language in settings.warmup_languages.split(",") if language.strip()]
+        result = registry.warm_up(languages)
+        readiness["warmup"] = {
+            **result,
+            "languages": languages,
+            "seconds": round(time.time() - start_time, 3)
+        }
+        readiness["ready"] = True
+        logger.info(f"Warm-up finished in {time.time() - start_time:.2f} seconds")
+    except Exception as e:
+        logger.error(f"Error during warm-up: {str(e)}")
+        readiness["error"] = str(e)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events for the FastAPI application."""
     settings = get_settings()
     logger.info(f"Starting application in {settings.environment} mode")
-    # Any startup operations would go here
+    
+    # Warm up in the background so the server accepts connections (and reports
+    # readiness) while the registry, vector store and caches are being built
+    warmup_task = None
+    if settings.warmup_enabled:
+        warmup_task = asyncio.create_task(asyncio.to_thread(warm_up, settings))
+    else:
+        readiness["ready"] = True
     yield
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
     # Any cleanup operations would go here
     logger.info("Application shutting down")
 
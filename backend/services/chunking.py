@@ -0,0 +1,501 @@
+import ast
+import hashlib
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.services.metadata_filters import normalize_language
+from backend.utils.tokens import count_tokens
+
+# Bumped whenever chunk boundaries change so that ingested files are re-chunked
+CHUNKER_VERSION = 3
+
+# Source file extensions picked up by codebase ingestion, mapped to their language
+EXTENSION_LANGUAGES = {
+    ".py": "python",
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".mjs": "javascript",
+    ".ts": "typescript",
+    ".tsx": "typescript",
+    ".java": "java",
+    ".kt": "kotlin",
+    ".scala": "scala",
+    ".go": "go",
+    ".rs": "rust",
+    ".c": "c",
+    ".h": "c",
+    ".cc": "cpp",
+    ".cpp": "cpp",
+    ".hpp": "cpp",
+    ".cs": "csharp",
+    ".rb": "ruby",
+    ".php": "php",
+    ".swift": "swift",
+    ".sh": "shell",
+    ".sql": "sql",
+    ".md": "markdown",
+}
+
+# Languages whose definitions are delimited by braces
+BRACE_LANGUAGES = {
+    "javascript", "typescript", "java", "kotlin", "scala", "go", "rust",
+    "c", "cpp", "csharp", "php", "swift",
+}
+
+# Chunk kinds whose adjacent units are merged into one chunk while they fit
+MERGEABLE_KINDS = {"module", "section"}
+
+def language_for_path(path: str) -> Optional[str]:
+    """Return the language of a source file based on its extension."""
+    return EXTENSION_LANGUAGES.get(os.path.splitext(path)[1].lower())
+
+def content_hash(text: str) -> str:
+    """Hash text content for change detection."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class _Unit:
+    """A span of source lines [start, end) that is chunked as a whole when it fits."""
+
+    __slots__ = ("start", "end", "kind", "symbol", "parent", "children", "child_symbols")
+
+    def __init__(
+        self,
+        start: int,
+        end: int,
+        kind: str,
+        symbol: Optional[str] = None,
+        parent: Optional[str] = None,
+        children: Optional[List["_Unit"]] = None
+    ):
+        self.start = start
+        self.end = end
+        self.kind = kind
+        self.symbol = symbol
+        self.parent = parent
+        self.children = children or []
+        self.child_symbols: List[str] = []
+
+def _fill_gaps(start: int, end: int, units: List[_Unit], kind: str,
+               symbol: Optional[str] = None, parent: Optional[str] = None) -> List[_Unit]:
+    """Interleave units with gap units of the given kind so that they cover [start, end)."""
+    covered = []
+    position = start
+    for unit in units:
+        if unit.start > position:
+            covered.append(_Unit(position, unit.start, kind, symbol, parent))
+        covered.append(unit)
+        position = max(position, unit.end)
+    if position < end:
+        covered.append(_Unit(position, end, kind, symbol, parent))
+    return covered
+
+def _attach_comments(lines: List[str], start: int, floor: int, comment_prefixes: Tuple[str, ...]) -> int:
+    """Move a definition's start line up over the comment lines directly above it."""
+    while start > floor and lines[start - 1].strip().startswith(comment_prefixes):
+        start -= 1
+    return start
+
+def _python_units(text: str, lines: List[str]) -> Optional[List[_Unit]]:
+    """
+    Split Python source into module-level statements, functions and classes.
+
+    Returns:
+        Top-level units, or None if the source does not parse
+    """
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return None
+
+    def definitions(body: List[ast.stmt], floor: int, parent: Optional[str]) -> List[_Unit]:
+        units = []
+        for node in body:
+            if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                continue
+            first_line = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+            start = _attach_comments(lines, first_line - 1, floor, ("#",))
+            floor = node.end_lineno
+            symbol = f"{parent}.{node.name}" if parent else node.name
+            if isinstance(node, ast.ClassDef):
+                children = definitions(node.body, node.lineno, symbol)
+                units.append(_Unit(start, node.end_lineno, "class", symbol, parent, children))
+            else:
+                kind = "method" if parent else "function"
+                units.append(_Unit(start, node.end_lineno, kind, symbol, parent))
+        return units
+
+    return definitions(tree.body, 0, None)
+
+# Strings, character literals and line comments, blanked out before counting braces
+_STRING_NOISE = r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|`(?:\\.|[^`\\])*`'
+_LINE_NOISE = r"//.*$|#\s*(?:include|define|if|endif|pragma).*$"
+_BRACE_NOISE = re.compile(f"{_STRING_NOISE}|{_LINE_NOISE}")
+
+# JavaScript and TypeScript regex literals, told apart from a division by the token before the slash;
+# that token is captured so that it is kept, and a brace in it still counted
+_REGEX_LITERAL = (r"(?P<before>^|[(,=:\[!&|?{};+\-*%~^]|\b(?:return|typeof|case|in|of|delete|void|throw|"
+                  r"instanceof|new|yield|await|else|do))\s*/(?![*/])(?:\\.|\[(?:\\.|[^\]\\])*\]|[^/\\\[])+/[a-z]*")
+_JS_BRACE_NOISE = re.compile(f"{_STRING_NOISE}|{_REGEX_LITERAL}|{_LINE_NOISE}")
+
+# Languages with regex literals
+REGEX_LITERAL_LANGUAGES = {"javascript", "typescript"}
+
+# Keywords that introduce type-like blocks whose members are chunked separately
+_TYPE_KEYWORDS = re.compile(r"\b(class|interface|struct|enum|trait|impl|object|namespace|module|record|extension|protocol)\b\s*(?:<[^>]*>\s*)?(?:for\s+)?([A-Za-z_$][\w$]*)?")
+
+# Go type declarations, which name the type before its keyword
+_GO_TYPE = re.compile(r"\btype\s+([A-Za-z_]\w*)\s+(?:struct|interface)\b")
+
+# Function-like headers: an identifier followed by a parameter list
+_FUNCTION_NAME = re.compile(r"(?:\bfunc\s*(?:\([^)]*\)\s*)?|\bfn\s+|\bfun\s+|\bfunction\s*\*?\s*|\bdef\s+)?([A-Za-z_$][\w$]*)\s*(?:<[^>]*>\s*)?(?:=\s*(?:async\s*)?(?:function\b|\([^)]*\)\s*=>)|\()")
+
+_CONTROL_KEYWORDS = {"if", "for", "while", "switch", "catch", "return", "else", "do", "try", "synchronized", "using", "lock"}
+
+def _brace_depths(lines: List[str], language: Optional[str] = None) -> Optional[List[Tuple[int, int]]]:
+    """
+    Return the brace depth at the start and end of every line, skipping strings, comments and regex literals.
+
+    Returns:
+        The depths, or None if the braces do not balance, e.g. because of a
+        construct the scanner does not skip, since the blocks found from them
+        would be wrong for the rest of the file
+    """
+    noise = _JS_BRACE_NOISE if language in REGEX_LITERAL_LANGUAGES else _BRACE_NOISE
+    depths = []
+    depth = 0
+    in_comment = False
+    for line in lines:
+        line_start = depth
+        code = line
+        if in_comment:
+            close = code.find("*/")
+            if close < 0:
+                depths.append((line_start, depth))
+                continue
+            code = code[close + 2:]
+            in_comment = False
+        code = noise.sub(lambda match: match.groupdict().get("before") or "", code)
+        while "/*" in code:
+            before, _, after = code.partition("/*")
+            close = after.find("*/")
+            if close < 0:
+                code = before
+                in_comment = True
+                break
+            code = before + after[close + 2:]
+        depth += code.count("{") - code.count("}")
+        if depth < 0:
+            return None
+        depths.append((line_start, depth))
+    return depths if depth == 0 else None
+
+def _describe_block(header: str) -> Tuple[str, Optional[str]]:
+    """Classify a brace block by its header and extract the name it defines."""
+    go_match = _GO_TYPE.search(header)
+    if go_match:
+        return "class", go_match.group(1)
+    type_match = _TYPE_KEYWORDS.search(header)
+    if type_match and "(" not in header[:type_match.start()]:
+        return "class", type_match.group(2)
+    for function_match in _FUNCTION_NAME.finditer(header):
+        name = function_match.group(1)
+        if name not in _CONTROL_KEYWORDS:
+            return "function", name
+    return "block", None
+
+def _brace_units(lines: List[str], depths: List[Tuple[int, int]], start: int, end: int,
+                 level: int, parent: Optional[str]) -> List[_Unit]:
+    """
+    Find the brace-delimited blocks opened at a given depth within [start, end).
+
+    A block runs from the first line of its header, including comments and
+    annotations above it, to the line where its closing brace brings the
+    depth back down. Type-like blocks are searched for member blocks.
+    """
+    units = []
+    pending = None
+    index = start
+    while index < end:
+        stripped = lines[index].strip()
+        depth_start, depth_end = depths[index]
+        if depth_start != level:
+            index += 1
+            continue
+        if not stripped:
+            pending = None
+            index += 1
+            continue
+        if pending is None:
+            pending = index
+
+        if depth_end > level:
+            # A block opens on this line: find the line that closes it
+            close = index
+            while close + 1 < end and depths[close][1] > level:
+                close += 1
+            block_start = pending
+            header = " ".join(line.strip() for line in lines[block_start:index + 1])
+            kind, name = _describe_block(header)
+            if kind == "function" and parent:
+                kind = "method"
+            symbol = f"{parent}.{name}" if parent and name else name
+            children = []
+            if kind == "class":
+                children = _brace_units(lines, depths, index + 1, close, level + 1, symbol)
+            units.append(_Unit(block_start, close + 1, kind, symbol, parent, children))
+            pending = None
+            index = close + 1
+            continue
+
+        if stripped.endswith((";", "}", "},", ")", ",")) and not stripped.startswith(("@", "/*", "*", "//")):
+            # End of a statement at this depth
+            pending = None
+        index += 1
+    return units
+
+# Lines that close a block in indentation-structured files rather than start a new one
+_CLOSING_LINES = re.compile(r"^(end\b|fi\b|done\b|esac\b|[}\])])")
+
+# Names defined by section headers of indentation-structured files
+_SECTION_NAME = re.compile(r"^(?:#+\s+(.+)|(?:def|class|module|function)\s+([\w.:!?]+)|create\s+(?:or\s+replace\s+)?\w+\s+(?:if\s+not\s+exists\s+)?([\w.\"]+)|([\w-]+)\s*\(\)\s*\{?)", re.IGNORECASE)
+
+def _indent_units(lines: List[str], headings_only: bool = False) -> List[_Unit]:
+    """
+    Split a file into sections that start at unindented lines after a blank line or dedent.
+
+    Used for languages without a dedicated parser and for Python that does not parse.
+
+    Args:
+        lines: Source lines
+        headings_only: Only start sections at Markdown headings
+    """
+    units = []
+    section_start = 0
+    previous_blank = True
+    previous_indented = False
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        if not stripped:
+            previous_blank = True
+            continue
+        indented = line[:1].isspace()
+        heading = stripped.startswith("#") and stripped.lstrip("#").startswith(" ")
+        if headings_only:
+            starts_section = heading
+        else:
+            starts_section = not indented and not _CLOSING_LINES.match(stripped) and (
+                previous_blank or previous_indented or heading
+            )
+        if starts_section and index > section_start:
+            units.append(_Unit(section_start, index, "section"))
+            section_start = index
+        previous_blank = False
+        previous_indented = indented
+    if section_start < len(lines):
+        units.append(_Unit(section_start, len(lines), "section"))
+
+    for unit in units:
+        first_line = next((line.strip() for line in lines[unit.start:unit.end] if line.strip()), "")
+        match = _SECTION_NAME.match(first_line)
+        if match:
+            unit.symbol = next(group for group in match.groups() if group).strip()
+    return units
+
+# Spans holding nothing but the closing delimiters of an enclosing block
+_CLOSING_ONLY = re.compile(r"^[\s})\];,]*(end)?[\s;]*$")
+
+def _trimmed_span(lines: List[str], start: int, end: int) -> Tuple[int, int]:
+    """Shrink a line span to exclude leading and trailing blank lines."""
+    while start < end and not lines[start].strip():
+        start += 1
+    while end > start and not lines[end - 1].strip():
+        end -= 1
+    return start, end
+
+def _split_span(lines: List[str], start: int, end: int, max_tokens: int, max_lines: int) -> List[Tuple[int, int]]:
+    """Split a line span into pieces within the token and line caps, preferring blank-line boundaries."""
+    pieces = []
+    while start < end:
+        stop = start
+        tokens = 0
+        while stop < end and stop - start < max_lines:
+            line_tokens = count_tokens(lines[stop]) + 1
+            if stop > start and tokens + line_tokens > max_tokens:
+                break
+            tokens += line_tokens
+            stop += 1
+        if stop < end:
+            for split in range(stop, start + (stop - start) // 2, -1):
+                if not lines[split - 1].strip():
+                    stop = split
+                    break
+        pieces.append((start, stop))
+        start = stop
+    return pieces
+
+def chunk_code(
+    text: str,
+    language: Optional[str] = None,
+    max_tokens: int = 512,
+    max_lines: int = 60
+) -> List[Dict[str, Any]]:
+    """
+    Split source code into chunks along syntactic units.
+
+    Python is split with the ast module, brace languages on their blocks and
+    everything else, including source that does not parse or whose braces do
+    not balance, on unindented section starts. A unit that fits within
+    both caps becomes one chunk; larger classes are split into a header chunk
+    and one chunk per member, and other oversized units into numbered parts.
+    Adjacent module-level statements and sections are merged up to the caps.
+
+    Args:
+        text: Source text
+        language: Language name as returned by language_for_path
+        max_tokens: Maximum number of tokens per chunk
+        max_lines: Maximum number of lines per chunk
+
+    Returns:
+        Chunks with their content, 1-based start and end lines, kind, and
+        symbol, parent and children names where known
+    """
+    lines = text.splitlines()
+    units = None
+    top_level_kind = "module"
+    if language == "python":
+        units = _python_units(text, lines)
+    elif language in BRACE_LANGUAGES:
+        depths = _brace_depths(lines, language)
+        if depths is not None:
+            units = _brace_units(lines, depths, 0, len(lines), 0, None)
+    if units is None:
+        units = _indent_units(lines, headings_only=language == "markdown")
+        top_level_kind = "section"
+
+    chunks: List[Dict[str, Any]] = []
+    previous_tokens = 0
+
+    def emit(unit: _Unit, start: int, end: int, tokens: int, part: Optional[Tuple[int, int]] = None) -> None:
+        nonlocal previous_tokens
+        previous = chunks[-1] if chunks else None
+        if (
+            part is None and previous is not None and unit.kind in MERGEABLE_KINDS
+            and previous["kind"] == unit.kind and previous["parent"] == unit.parent and "part" not in previous
+            and previous_tokens + tokens <= max_tokens and end - previous["start_line"] + 1 <= max_lines
+        ):
+            previous["end_line"] = end
+            if previous["symbol"] is None:
+                previous["symbol"] = unit.symbol
+            elif unit.symbol is not None and unit.symbol != previous["symbol"]:
+                previous["symbol"] = None
+            previous_tokens += tokens
+            return
+        chunk = {"start_line": start + 1, "end_line": end, "kind": unit.kind,
+                 "symbol": unit.symbol, "parent": unit.parent}
+        if unit.child_symbols:
+            chunk["children"] = unit.child_symbols
+        if part is not None:
+            chunk["part"], chunk["parts"] = part
+        chunks.append(chunk)
+        previous_tokens = tokens
+
+    def visit(unit: _Unit) -> None:
+        start, end = _trimmed_span(lines, unit.start, unit.end)
+        if start >= end or _CLOSING_ONLY.match("".join(lines[start:end])):
+            return
+        tokens = count_tokens("\n".join(lines[start:end]))
+        if tokens <= max_tokens and end - start <= max_lines:
+            emit(unit, start, end, tokens)
+        elif unit.children:
+            members = _fill_gaps(unit.start, unit.end, unit.children, unit.kind, unit.symbol, unit.parent)
+            members[0].child_symbols = [child.symbol for child in unit.children if child.symbol]
+            for member in members:
+                visit(member)
+        else:
+            pieces = _split_span(lines, start, end, max_tokens, max_lines)
+            for number, (piece_start, piece_end) in enumerate(pieces, 1):
+                piece_start, piece_end = _trimmed_span(lines, piece_start, piece_end)
+                if piece_start < piece_end:
+                    emit(unit, piece_start, piece_end, 0, (number, len(pieces)))
+
+    for unit in _fill_gaps(0, len(lines), units, top_level_kind):
+        visit(unit)
+
+    for chunk in chunks:
+        chunk["content"] = "\n".join(lines[chunk["start_line"] - 1:chunk["end_line"]])
+    return chunks
+
+def chunk_metadata(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the structural fields of a chunk that are stored in document metadata."""
+    metadata = {key: chunk[key] for key in ("start_line", "end_line", "kind") if key in chunk}
+    for key in ("symbol", "parent", "children", "part", "parts"):
+        if chunk.get(key) is not None:
+            metadata[key] = chunk[key]
+    return metadata
+
+def chunk_document(
+    content: str,
+    language: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    max_tokens: int = 512,
+    max_lines: int = 60
+) -> List[Dict[str, Any]]:
+    """
+    Split a code document into chunk documents ready for RAGService.add_documents.
+
+    Args:
+        content: Document content
+        language: Language of the content, if it is source code; aliases such as "js" are normalized
+        metadata: Metadata copied onto every chunk
+        max_tokens: Maximum number of tokens per chunk
+        max_lines: Maximum number of lines per chunk
+
+    Returns:
+        Documents with "content" and "metadata" keys
+    """
+    language = normalize_language(language)
+    documents = []
+    for chunk in chunk_code(content, language, max_tokens=max_tokens, max_lines=max_lines):
+        chunk_meta = dict(metadata or {})
+        if language:
+            chunk_meta["language"] = language
+        chunk_meta.update(chunk_metadata(chunk))
+        documents.append({"content": chunk["content"], "metadata": chunk_meta})
+    return documents
+
+def process_file(path: str, relpath: str, max_tokens: int = 512, max_lines: int = 60) -> Optional[Dict[str, Any]]:
+    """
+    Read, hash and chunk a source file.
+
+    Runs in ingestion worker processes, so it avoids importing the service stack.
+
+    Args:
+        path: Absolute path of the file
+        relpath: Path relative to the ingested root
+        max_tokens: Maximum number of tokens per chunk
+        max_lines: Maximum number of lines per chunk
+
+    Returns:
+        File hash and chunks, or None if the file is binary or unreadable
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if b"\0" in data[:8192]:
+        return None
+
+    text = data.decode("utf-8", errors="replace")
+    language = language_for_path(path)
+    chunks = chunk_code(text, language, max_tokens=max_tokens, max_lines=max_lines)
+    for chunk in chunks:
+        chunk["hash"] = content_hash(chunk["content"])
+
+    return {
+        "relpath": relpath,
+        "hash": hashlib.sha256(data).hexdigest(),
+        "language": language,
+        "chunks": chunks,
+    }
@@ -0,0 +1,291 @@
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from backend.config import Settings
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+    from backend.services.rag import RAGService
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Collection stored directly in VECTOR_DB_PATH, which holds the store of earlier versions
+DEFAULT_COLLECTION = "default"
+
+# Directory under VECTOR_DB_PATH holding the named collections
+COLLECTIONS_DIR = "collections"
+
+# Settings file of a named collection
+COLLECTION_FILE = "collection.json"
+
+COLLECTION_NAME_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+# Settings a collection may override: index, retrieval, log and embedding settings. Paths are left out,
+# since collections are created through the API and must not point the server at arbitrary files
+COLLECTION_SETTINGS = frozenset({
+    "rag_retrieval_mode", "rag_hybrid_candidates", "rag_rrf_k",
+    "rag_context_max_tokens", "rag_context_max_document_tokens", "rag_mmr_lambda", "rag_mmr_candidates",
+    "rag_filter_fields", "rag_filter_exact_limit", "rag_purge_deleted_threshold", "rag_purge_deleted_ratio",
+    "rag_index_type", "rag_index_promotion_threshold", "rag_index_train_size", "rag_ivf_nlist", "rag_ivf_nprobe",
+    "rag_hnsw_m", "rag_hnsw_ef_construction", "rag_hnsw_ef_search", "rag_pq_m",
+    "rag_vector_compression", "rag_rerank_factor",
+    "retrieval_cache_enabled", "retrieval_cache_size", "retrieval_cache_ttl",
+    "wal_fsync", "wal_compaction_threshold",
+    "embedding_provider", "embedding_model", "embedding_dimension", "embedding_batch_size",
+    "embedding_cache_enabled", "embedding_cache_memory_size",
+})
+
+class CollectionManager:
+    """Named vector store collections, each with its own index, documents and settings.
+
+    The default collection is the store in VECTOR_DB_PATH itself and uses
+    the application settings. Other collections live in
+    VECTOR_DB_PATH/collections/<name>, where collection.json records the
+    settings they override, so a collection can use another index type,
+    compression, retrieval mode or embedding model. Collections are opened
+    on first use and stay open; they share the embedding cache of the
+    default collection, whose entries are keyed by embedding model.
+    """
+
+    def __init__(self, settings: Settings, root_path: Optional[str] = None, openai_client: Optional["OpenAI"] = None):
+        """
+        Initialize the manager.
+
+        Args:
+            settings: Application settings
+            root_path: Path of the default collection, defaults to VECTOR_DB_PATH
+            openai_client: OpenAI client shared by the embedding providers of the collections
+        """
+        self.settings = settings
+        self.root_path = root_path or settings.vector_db_path
+        self.openai_client = openai_client
+        self.collections_path = os.path.join(self.root_path, COLLECTIONS_DIR)
+        self._services: Dict[str, "RAGService"] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def validate_name(name: str) -> str:
+        """Check that a collection name is safe to use as a directory name."""
+        if not COLLECTION_NAME_PATTERN.match(name or ""):
+            raise ValueError(f"Invalid collection name '{name}', use up to 64 lowercase letters, digits, "
+                             f"'-' and '_', starting with a letter or digit")
+        return name
+
+    @staticmethod
+    def validate_settings(overrides: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Check and normalize the settings a collection overrides.
+
+        Args:
+            overrides: Mapping of setting name, lowercase as in Settings, to value
+
+        Returns:
+            The overrides converted to the types of the settings
+        """
+        overrides = {key.lower(): value for key, value in (overrides or {}).items()}
+        for key in overrides:
+            if key not in COLLECTION_SETTINGS:
+                raise ValueError(f"Setting '{key}' cannot be set per collection, "
+                                 f"only {', '.join(sorted(COLLECTION_SETTINGS))} can")
+        validated = Settings.model_validate(overrides)
+        return {key: getattr(validated, key) for key in overrides}
+
+    def path_of(self, name: str) -> str:
+        """Return the directory of a collection."""
+        if name == DEFAULT_COLLECTION:
+            return self.root_path
+        return os.path.join(self.collections_path, self.validate_name(name))
+
+    def exists(self, name: str) -> bool:
+        """Check whether a collection exists."""
+        return name == DEFAULT_COLLECTION or os.path.exists(os.path.join(self.path_of(name), COLLECTION_FILE))
+
+    def _read_config(self, name: str) -> Dict[str, Any]:
+        """Read the collection.json of a named collection."""
+        with open(os.path.join(self.path_of(name), COLLECTION_FILE)) as f:
+            return json.load(f)
+
+    def settings_for(self, name: str) -> Settings:
+        """
+        Build the settings of a collection.
+
+        Args:
+            name: Collection name
+
+        Returns:
+            The application settings with the collection's overrides applied
+        """
+        if name == DEFAULT_COLLECTION:
+            return self.settings
+        if not self.exists(name):
+            raise KeyError(f"Collection '{name}' does not exist")
+        overrides = {
+            # Every collection keeps its own ingest manifest but shares the embedding cache
+            "ingest_manifest_path": "",
+            "embedding_cache_path": self.settings.embedding_cache_path or os.path.join(
+                self.root_path, "embedding_cache.db"
+            ),
+        }
+        for key, value in self._read_config(name).get("settings", {}).items():
+            # Ignore settings that collections created by earlier versions could override
+            if key in COLLECTION_SETTINGS:
+                overrides[key] = value
+            else:
+                logger.warning(f"Ignoring setting '{key}' of collection '{name}', it cannot be set per collection")
+        return self.settings.model_copy(update=overrides)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """
+        List the collections.
+
+        Returns:
+            Name, settings overrides and whether it is open, for every collection
+        """
+        names = [DEFAULT_COLLECTION]
+        if os.path.isdir(self.collections_path):
+            names.extend(sorted(entry for entry in os.listdir(self.collections_path)
+                                if COLLECTION_NAME_PATTERN.match(entry) and self.exists(entry)))
+        return [self.describe(name, stats=False) for name in names]
+
+    def describe(self, name: str, stats: bool = True) -> Dict[str, Any]:
+        """
+        Describe a collection.
+
+        Args:
+            name: Collection name
+            stats: Open the collection and include its store statistics
+
+        Returns:
+            Name, creation time, settings overrides, whether it is open and optionally its statistics
+        """
+        if not self.exists(name):
+            raise KeyError(f"Collection '{name}' does not exist")
+        config = self._read_config(name) if name != DEFAULT_COLLECTION else {}
+        description = {
+            "name": name,
+            "created_at": config.get("created_at"),
+            "settings": config.get("settings", {}),
+            "open": name in self._services,
+        }
+        if stats:
+            description["stats"] = self.get(name).stats()
+        return description
+
+    def create(self, name: str, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Create an empty named collection.
+
+        Args:
+            name: Collection name
+            overrides: Settings that differ from the application settings
+
+        Returns:
+            Description of the new collection
+        """
+        self.validate_name(name)
+        overrides = self.validate_settings(overrides)
+        with self._lock:
+            if self.exists(name):
+                raise FileExistsError(f"Collection '{name}' already exists")
+            path = self.path_of(name)
+            tmp_path = path + ".tmp"
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+            with open(os.path.join(tmp_path, COLLECTION_FILE), "w") as f:
+                json.dump({"name": name, "created_at": time.time(), "settings": overrides}, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.rename(tmp_path, path)
+        logger.info(f"Created collection '{name}'" + (f" with settings {overrides}" if overrides else ""))
+        return self.describe(name, stats=False)
+
+    def update_settings(self, name: str, overrides: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Change settings overrides of a named collection, taking effect when it is next opened.
+
+        Args:
+            name: Collection name
+            overrides: Settings to override in addition to the current ones
+
+        Returns:
+            All settings overrides of the collection
+        """
+        if name == DEFAULT_COLLECTION:
+            raise ValueError("Settings of the default collection come from the environment")
+        overrides = self.validate_settings(overrides)
+        with self._lock:
+            if not self.exists(name):
+                raise KeyError(f"Collection '{name}' does not exist")
+            config = self._read_config(name)
+            config["settings"] = {**config.get("settings", {}), **overrides}
+            config_path = os.path.join(self.path_of(name), COLLECTION_FILE)
+            with open(config_path + ".tmp", "w") as f:
+                json.dump(config, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(config_path + ".tmp", config_path)
+        return config["settings"]
+
+    def get(self, name: str, create: bool = False) -> "RAGService":
+        """
+        Open a collection, or return it if it is already open.
+
+        Args:
+            name: Collection name
+            create: Create the collection with the application settings if it does not exist
+
+        Returns:
+            RAG service of the collection
+        """
+        service = self._services.get(name)
+        if service is not None:
+            return service
+        # The store loads faiss and numpy, so they are imported with the first opened collection
+        from backend.services.embeddings import create_embedding_provider
+        from backend.services.rag import RAGService
+
+        if create and not self.exists(name):
+            try:
+                self.create(name)
+            except FileExistsError:
+                pass
+        with self._lock:
+            if name not in self._services:
+                if not self.exists(name):
+                    raise KeyError(f"Collection '{name}' does not exist")
+                settings = self.settings_for(name)
+                self._services[name] = RAGService(
+                    vector_db_path=self.path_of(name),
+                    settings=settings,
+                    embedding_provider=create_embedding_provider(settings, self.openai_client)
+                )
+            return self._services[name]
+
+    def delete(self, name: str) -> None:
+        """
+        Close a named collection and remove its directory.
+
+        Args:
+            name: Collection name
+        """
+        if name == DEFAULT_COLLECTION:
+            raise ValueError("The default collection cannot be deleted")
+        with self._lock:
+            if not self.exists(name):
+                raise KeyError(f"Collection '{name}' does not exist")
+            service = self._services.pop(name, None)
+            if service is not None:
+                service.close()
+            path = self.path_of(name)
+            # Remove the settings file first, so a partly removed directory is not taken for a collection
+            os.remove(os.path.join(path, COLLECTION_FILE))
+            shutil.rmtree(path, ignore_errors=True)
+        logger.info(f"Deleted collection '{name}'")
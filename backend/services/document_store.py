@@ -0,0 +1,195 @@
+import bisect
+import json
+import logging
+import mmap
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DATA_FILE = "documents.dat"
+OFFSETS_FILE = "documents.idx.npy"
+IDS_FILE = "documents.ids.npy"
+ID_ORDER_FILE = "documents.id_order.npy"
+
+class MappedDocuments:
+    """Read-only documents stored in a memory-mapped file.
+
+    Each document is a UTF-8 JSON record; records are concatenated in
+    documents.dat and located through an int64 offsets array in
+    documents.idx.npy, so only the documents that are actually read get
+    decoded and the pages are shared between processes. The stable ID of
+    each position is kept in documents.ids.npy with its argsort in
+    documents.id_order.npy for lookups by ID; snapshots written before IDs
+    were decoupled from positions have neither, and their IDs are their
+    positions.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Open the document files of a snapshot.
+
+        Args:
+            directory: Snapshot directory containing the data and offsets files
+        """
+        self.directory = directory
+        self.offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode="r")
+
+        data_path = os.path.join(directory, DATA_FILE)
+        if os.path.getsize(data_path) > 0:
+            with open(data_path, "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._data = b""
+
+        ids_path = os.path.join(directory, IDS_FILE)
+        if os.path.exists(ids_path):
+            self.ids = np.load(ids_path, mmap_mode="r")
+            self.id_order = np.load(os.path.join(directory, ID_ORDER_FILE), mmap_mode="r")
+        else:
+            self.ids = None
+            self.id_order = None
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        """Check whether a directory holds memory-mappable document files."""
+        return (os.path.exists(os.path.join(directory, DATA_FILE))
+                and os.path.exists(os.path.join(directory, OFFSETS_FILE)))
+
+    @staticmethod
+    def write(directory: str, documents: Iterable[Dict[str, Any]]) -> int:
+        """
+        Write documents to the data and offsets files of a directory.
+
+        Args:
+            directory: Target directory
+            documents: Documents to write, in position order
+
+        Returns:
+            Number of documents written
+        """
+        offsets = [0]
+        ids = []
+        with open(os.path.join(directory, DATA_FILE), "wb") as f:
+            for document in documents:
+                f.write(json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+                offsets.append(f.tell())
+                ids.append(document["id"])
+            f.flush()
+            os.fsync(f.fileno())
+
+        ids = np.array(ids, dtype=np.int64)
+        for name, array in ((OFFSETS_FILE, np.array(offsets, dtype=np.int64)),
+                            (IDS_FILE, ids),
+                            (ID_ORDER_FILE, np.argsort(ids, kind="stable"))):
+            with open(os.path.join(directory, name), "wb") as f:
+                np.save(f, array)
+                f.flush()
+                os.fsync(f.fileno())
+
+        return len(offsets) - 1
+
+    def id_at(self, position: int) -> int:
+        """Return the stable ID of the document at a position."""
+        return int(self.ids[position]) if self.ids is not None else position
+
+    def position_of(self, doc_id: int) -> Optional[int]:
+        """Return the latest position of the document with a stable ID, or None if it is not in this base."""
+        if self.ids is None:
+            return doc_id if 0 <= doc_id < len(self) else None
+        # Snapshots that keep deleted documents hold every version of an updated
+        # document, and the stable argsort lists them in position order
+        index = int(np.searchsorted(self.ids, doc_id, side="right", sorter=self.id_order)) - 1
+        if index >= 0 and int(self.ids[self.id_order[index]]) == doc_id:
+            return int(self.id_order[index])
+        return None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position: int) -> Dict[str, Any]:
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        return json.loads(self._data[start:end].decode("utf-8"))
+
+class DocumentTable:
+    """Positional document table made of a memory-mapped base and an in-memory tail.
+
+    The base holds the documents of the current snapshot; documents added
+    since then (including those replayed from the write-ahead log) live in
+    the tail until the next compaction. Positions index the vector and
+    lexical indexes and change when compaction drops deleted documents;
+    documents are also addressed by their stable "id", which does not.
+    """
+
+    def __init__(self, base: Optional[MappedDocuments] = None, tail: Optional[List[Dict[str, Any]]] = None):
+        """
+        Initialize the table.
+
+        Args:
+            base: Memory-mapped snapshot documents
+            tail: Documents held in memory after the base
+        """
+        self.base = base
+        self.tail = tail if tail is not None else []
+        # Every tail position of each ID, ascending, so that views published before an update still find it
+        self._tail_positions: Dict[int, List[int]] = {}
+        for offset, document in enumerate(self.tail):
+            self._tail_positions.setdefault(document["id"], []).append(self.base_size + offset)
+
+    @property
+    def base_size(self) -> int:
+        return len(self.base) if self.base is not None else 0
+
+    def __len__(self) -> int:
+        return self.base_size + len(self.tail)
+
+    def __getitem__(self, position: int) -> Dict[str, Any]:
+        if position < 0:
+            position += len(self)
+        if position < self.base_size:
+            return self.base[position]
+        return self.tail[position - self.base_size]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for position in range(self.base_size):
+            yield self.base[position]
+        yield from self.tail
+
+    def append(self, document: Dict[str, Any]) -> None:
+        # Record the position before the document becomes visible to readers of the tail
+        self._tail_positions.setdefault(document["id"], []).append(len(self))
+        self.tail.append(document)
+
+    def extend(self, documents: Iterable[Dict[str, Any]]) -> None:
+        for document in documents:
+            self.append(document)
+
+    def position_of(self, doc_id: int, limit: Optional[int] = None) -> Optional[int]:
+        """
+        Return the latest position of the document with a stable ID.
+
+        An updated document is appended to the tail again, so the tail is
+        searched before the base. The table keeps growing after a store view
+        is published, so views pass their document count as the limit to
+        find the version they cover rather than a later one.
+
+        Args:
+            doc_id: Stable document ID
+            limit: Only consider positions below this one
+
+        Returns:
+            Position, or None if no document has the ID
+        """
+        positions = self._tail_positions.get(doc_id)
+        if positions:
+            if limit is None:
+                return positions[-1]
+            index = bisect.bisect_left(positions, limit)
+            if index:
+                return positions[index - 1]
+        if self.base is not None:
+            return self.base.position_of(doc_id)
+        return None
@@ -0,0 +1,216 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from backend.utils.cache import LRUCache
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """Persistent content-addressed cache for text embeddings.
+
+    Embeddings are keyed by a hash of (embedding model, text) and stored in a
+    SQLite database so they survive restarts and can be shared between worker
+    processes. A bounded in-memory LRU sits in front of the database.
+    """
+
+    def __init__(self, path: str, max_memory_items: int = 10000):
+        """
+        Initialize the embedding cache.
+
+        Args:
+            path: Path to the SQLite database file
+            max_memory_items: Maximum number of embeddings kept in memory
+        """
+        self.path = path
+        self.memory = LRUCache(max_size=max_memory_items)
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dimension INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+        logger.info(f"Embedding cache opened at {path}")
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """Build the content-addressed key for a (model, text) pair."""
+        digest = hashlib.sha256()
+        digest.update(model.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        """
+        Look up the embedding for a text.
+
+        Args:
+            model: Embedding model name
+            text: Embedded text
+
+        Returns:
+            Cached embedding as a float32 array, or None on a miss
+        """
+        key = self.make_key(model, text)
+        embedding = self.memory.get(key)
+        if embedding is not None:
+            return embedding
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+
+        embedding = np.frombuffer(row[0], dtype=np.float32)
+        self.memory.put(key, embedding)
+        return embedding
+
+    def put(self, model: str, text: str, embedding: Any) -> np.ndarray:
+        """
+        Store the embedding for a text.
+
+        Args:
+            model: Embedding model name
+            text: Embedded text
+            embedding: Embedding vector
+
+        Returns:
+            The stored embedding as a float32 array
+        """
+        key = self.make_key(model, text)
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector.setflags(write=False)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, model, dimension, vector, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, int(vector.shape[0]), vector.tobytes(), time.time())
+            )
+            self._conn.commit()
+
+        self.memory.put(key, vector)
+        return vector
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up embeddings for several texts at once.
+
+        Args:
+            model: Embedding model name
+            texts: Texts to look up
+
+        Returns:
+            List aligned with texts holding cached embeddings or None for misses
+        """
+        keys = [self.make_key(model, text) for text in texts]
+        results: List[Optional[np.ndarray]] = [self.memory.get(key) for key in keys]
+        pending = [i for i, embedding in enumerate(results) if embedding is None]
+        if not pending:
+            return results
+
+        rows: Dict[str, bytes] = {}
+        with self._lock:
+            # Stay well below SQLite's bound parameter limit
+            for start in range(0, len(pending), 500):
+                chunk = [keys[i] for i in pending[start:start + 500]]
+                placeholders = ",".join("?" * len(chunk))
+                rows.update(self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall())
+            self.disk_hits += sum(1 for i in pending if keys[i] in rows)
+            self.misses += sum(1 for i in pending if keys[i] not in rows)
+
+        for i in pending:
+            blob = rows.get(keys[i])
+            if blob is not None:
+                results[i] = np.frombuffer(blob, dtype=np.float32)
+                self.memory.put(keys[i], results[i])
+        return results
+
+    def put_many(self, model: str, texts: Sequence[str], embeddings: Sequence[Any]) -> List[np.ndarray]:
+        """
+        Store embeddings for several texts in a single transaction.
+
+        Args:
+            model: Embedding model name
+            texts: Embedded texts
+            embeddings: Embedding vectors aligned with texts
+
+        Returns:
+            The stored embeddings as float32 arrays
+        """
+        keys = [self.make_key(model, text) for text in texts]
+        vectors = []
+        for embedding in embeddings:
+            vector = np.asarray(embedding, dtype=np.float32)
+            vector.setflags(write=False)
+            vectors.append(vector)
+
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dimension, vector, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(key, model, int(vector.shape[0]), vector.tobytes(), now)
+                 for key, vector in zip(keys, vectors)]
+            )
+            self._conn.commit()
+
+        for key, vector in zip(keys, vectors):
+            self.memory.put(key, vector)
+        return vectors
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for the memory and disk tiers."""
+        memory_stats = self.memory.stats()
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            disk_hits = self.disk_hits
+            misses = self.misses
+        hits = memory_stats["hits"] + disk_hits
+        lookups = hits + misses
+        return {
+            "path": self.path,
+            "entries": entries,
+            "memory": memory_stats,
+            "memory_hits": memory_stats["hits"],
+            "disk_hits": disk_hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
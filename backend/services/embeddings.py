@@ -0,0 +1,145 @@
+import hashlib
+import logging
+import math
+from typing import Any, List, Optional
+
+import numpy as np
+from openai import OpenAI
+
+from backend.services.lexical_index import tokenize
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+EMBEDDING_PROVIDERS = ("openai", "local")
+
+# Output dimensions of the OpenAI embedding models
+OPENAI_MODEL_DIMENSIONS = {
+    "text-embedding-ada-002": 1536,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+
+# Dimension of the local hashing embeddings unless EMBEDDING_DIMENSION is set
+DEFAULT_LOCAL_DIMENSION = 1024
+
+class EmbeddingProvider:
+    """Turns texts into fixed-size vectors for the RAG index.
+
+    Subclasses set name, which identifies the embedding space in the
+    embedding cache and the snapshot metadata, and dimension, which sizes
+    the vector index, and implement embed.
+    """
+
+    name: str = ""
+    dimension: int = 0
+    # Whether embeddings are worth keeping in the persistent embedding cache
+    cacheable: bool = True
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of texts.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            float32 matrix with one row per text
+        """
+        raise NotImplementedError
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """Embeddings from the OpenAI embeddings API."""
+
+    def __init__(self, api_key: str, model: str, dimension: int = 0, client: Optional[OpenAI] = None):
+        """
+        Initialize the provider.
+
+        Args:
+            api_key: OpenAI API key
+            model: Embedding model name
+            dimension: Requested output dimension, 0 for the model's own; only
+                the text-embedding-3 models can shorten their output
+            client: OpenAI client to share, such as the LLM gateway's; a new one is created if None
+        """
+        self.client = client or OpenAI(api_key=api_key)
+        self.model = model
+        self.name = model
+        self._dimensions_parameter = None
+        if dimension and model.startswith("text-embedding-3"):
+            self._dimensions_parameter = dimension
+            self.name = f"{model}@{dimension}"
+        elif dimension and dimension != OPENAI_MODEL_DIMENSIONS.get(model, dimension):
+            raise ValueError(f"Embedding model '{model}' cannot produce {dimension}-dimensional embeddings")
+        self.dimension = dimension or OPENAI_MODEL_DIMENSIONS.get(model, 0)
+        if not self.dimension:
+            raise ValueError(f"Unknown dimension of embedding model '{model}', set EMBEDDING_DIMENSION")
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts with a single embeddings request."""
+        options = {"dimensions": self._dimensions_parameter} if self._dimensions_parameter else {}
+        response = self.client.embeddings.create(model=self.model, input=texts, **options)
+        return np.array([item.embedding for item in sorted(response.data, key=lambda item: item.index)],
+                        dtype=np.float32)
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """Local embeddings from hashed lexical features, computed on the CPU without any network call.
+
+    Each text is tokenized like the lexical index, so identifiers also count
+    through their camelCase and snake_case words, and its terms and adjacent
+    term pairs are hashed into a fixed number of signed buckets with
+    sublinear term frequency. Rows are L2-normalized, so L2 distance ranks
+    texts by cosine similarity. These embeddings capture shared vocabulary
+    rather than meaning; they suit offline deployments and CI.
+    """
+
+    cacheable = False
+
+    def __init__(self, dimension: int = DEFAULT_LOCAL_DIMENSION):
+        """
+        Initialize the provider.
+
+        Args:
+            dimension: Number of hash buckets, which is the embedding dimension
+        """
+        self.dimension = dimension
+        self.name = f"local-hashing-{dimension}"
+
+    def _features(self, text: str) -> List[str]:
+        """Return the terms and adjacent term pairs of a text."""
+        terms = tokenize(text)
+        return terms + [f"{first} {second}" for first, second in zip(terms, terms[1:])]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts."""
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = {}
+            for feature in self._features(text):
+                counts[feature] = counts.get(feature, 0) + 1
+            for feature, count in counts.items():
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                sign = 1.0 if value & 1 else -1.0
+                vectors[row, (value >> 1) % self.dimension] += sign * (1.0 + math.log(count))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+def create_embedding_provider(settings: Any, client: Optional[OpenAI] = None) -> EmbeddingProvider:
+    """
+    Create the embedding provider selected by EMBEDDING_PROVIDER.
+
+    Args:
+        settings: Application settings
+        client: OpenAI client to share with the provider, if it calls the OpenAI API
+
+    Returns:
+        The configured provider
+    """
+    provider = settings.embedding_provider.lower()
+    if provider == "openai":
+        return OpenAIEmbeddingProvider(settings.openai_api_key, settings.embedding_model,
+                                       settings.embedding_dimension, client)
+    if provider == "local":
+        return HashingEmbeddingProvider(settings.embedding_dimension or DEFAULT_LOCAL_DIMENSION)
+    raise ValueError(f"Unknown embedding provider '{settings.embedding_provider}', expected one of {EMBEDDING_PROVIDERS}")
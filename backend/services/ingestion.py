@@ -0,0 +1,280 @@
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+from backend.services.chunking import CHUNKER_VERSION, EXTENSION_LANGUAGES, chunk_metadata, process_file
+
+if TYPE_CHECKING:
+    from backend.services.rag import RAGService
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Changed files below this count are chunked in-process instead of in the pool
+INLINE_FILE_LIMIT = 32
+
+# Directories never descended into while walking a source tree
+SKIPPED_DIRECTORIES = {
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv",
+    ".tox", ".nox", ".mypy_cache", ".pytest_cache", ".ruff_cache", "dist", "build", "target",
+}
+
+class CodebaseIngestor:
+    """Incrementally index a local source tree into the RAG knowledge base.
+
+    Files are walked and compared against a manifest of (path, mtime, size,
+    content hash); only new or changed files are read and chunked, in a
+    process pool, and only chunks whose content changed are embedded. Chunks
+    of changed and removed files that no longer exist are deleted.
+    """
+
+    def __init__(
+        self,
+        rag_service: "RAGService",
+        manifest_path: Optional[str] = None,
+        workers: Optional[int] = None,
+        chunk_lines: Optional[int] = None,
+        chunk_tokens: Optional[int] = None,
+        files_per_batch: int = 200
+    ):
+        """
+        Initialize the ingestor.
+
+        Args:
+            rag_service: RAG service receiving the chunks
+            manifest_path: Path of the JSON manifest, defaults to the vector store directory
+            workers: Number of worker processes, defaults to the CPU count
+            chunk_lines: Maximum number of lines per chunk
+            chunk_tokens: Maximum number of tokens per chunk
+            files_per_batch: Files whose chunks are upserted and recorded in the manifest together
+        """
+        self.rag_service = rag_service
+        self.settings = rag_service.settings
+        self.manifest_path = manifest_path or self.settings.ingest_manifest_path or os.path.join(
+            rag_service.vector_db_path, "ingest_manifest.json"
+        )
+        self.workers = workers or self.settings.ingest_workers or os.cpu_count() or 1
+        self.chunk_lines = chunk_lines or self.settings.ingest_chunk_lines
+        self.chunk_tokens = chunk_tokens or self.settings.ingest_chunk_tokens
+        self.files_per_batch = files_per_batch
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        """Load the manifest of previously ingested files."""
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        """Atomically write the manifest."""
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def _scan(self, root: str, extensions: Iterable[str], entries: Dict[str, Any]) -> Tuple[List[Tuple[str, str, float, int]], int, List[str]]:
+        """
+        Walk the tree and find files that are new or whose mtime or size changed.
+
+        Only files with one of the extensions are considered, both for changes
+        and removals, so a scan restricted to some extensions leaves the
+        indexed files of the others alone. Symlinked directories are not
+        descended into, and symlinked files are only read if they resolve to a
+        file inside the root, so links cannot pull in files from outside it.
+
+        Returns:
+            Tuple of (files to process as (path, relpath, mtime, size), unchanged file count, removed relpaths)
+        """
+        extensions = {extension.lower() for extension in extensions}
+        changed = []
+        seen = set()
+        unchanged = 0
+        real_root = os.path.realpath(root)
+
+        for directory, subdirectories, filenames in os.walk(root, followlinks=False):
+            subdirectories[:] = [name for name in subdirectories
+                                 if name not in SKIPPED_DIRECTORIES and not name.startswith(".")]
+            for filename in filenames:
+                if os.path.splitext(filename)[1].lower() not in extensions:
+                    continue
+                path = os.path.join(directory, filename)
+                relpath = os.path.relpath(path, root)
+                if os.path.islink(path):
+                    target = os.path.realpath(path)
+                    if os.path.commonpath([real_root, target]) != real_root:
+                        logger.warning(f"Skipping {relpath}, which links outside {root}")
+                        continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                seen.add(relpath)
+
+                entry = entries.get(relpath)
+                if (entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size
+                        and entry.get("chunker") == CHUNKER_VERSION):
+                    unchanged += 1
+                else:
+                    changed.append((path, relpath, stat.st_mtime, stat.st_size))
+
+        # Files of other extensions were not looked at, so only files of the scanned ones count as removed
+        removed = [relpath for relpath in entries if relpath not in seen
+                   and os.path.splitext(relpath)[1].lower() in extensions]
+        return changed, unchanged, removed
+
+    def ingest(self, root: str, extensions: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Index new and changed files under a source tree.
+
+        Args:
+            root: Root directory of the source tree
+            extensions: File extensions to include, defaults to all known source extensions
+
+        Returns:
+            Ingestion statistics
+        """
+        start_time = time.time()
+        root = os.path.abspath(root)
+        if not os.path.isdir(root):
+            raise ValueError(f"Not a directory: {root}")
+
+        manifest = self._load_manifest()
+        entries = manifest.setdefault(root, {})
+        changed, unchanged, removed = self._scan(root, extensions or EXTENSION_LANGUAGES.keys(), entries)
+        stats = {
+            "root": root,
+            "files_unchanged": unchanged,
+            "files_changed": 0,
+            "files_removed": len(removed),
+            "chunks_added": 0,
+            "chunks_reused": 0,
+            "chunks_deleted": 0,
+        }
+
+        # Drop the chunks of files that no longer exist
+        stale_ids = [chunk["id"] for relpath in removed for chunk in entries.pop(relpath)["chunks"]]
+        stats["chunks_deleted"] += self.rag_service.delete_documents(stale_ids)
+        if removed:
+            self._save_manifest(manifest)
+
+        logger.info(f"Ingesting {len(changed)} new or changed files from {root} "
+                    f"({unchanged} unchanged, {len(removed)} removed)")
+
+        if changed:
+            paths = [path for path, _, _, _ in changed]
+            relpaths = [relpath for _, relpath, _, _ in changed]
+            chunk_tokens = [self.chunk_tokens] * len(changed)
+            chunk_lines = [self.chunk_lines] * len(changed)
+            if self.workers > 1 and len(changed) > INLINE_FILE_LIMIT:
+                context = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as executor:
+                    results = executor.map(process_file, paths, relpaths, chunk_tokens, chunk_lines, chunksize=16)
+                    self._upsert_results(root, manifest, entries, changed, results, stats)
+            else:
+                # Starting worker processes costs more than chunking a handful of files
+                results = map(process_file, paths, relpaths, chunk_tokens, chunk_lines)
+                self._upsert_results(root, manifest, entries, changed, results, stats)
+
+        stats["seconds"] = round(time.time() - start_time, 3)
+        logger.info(f"Ingested {root}: {stats}")
+        return stats
+
+    def _upsert_results(
+        self,
+        root: str,
+        manifest: Dict[str, Any],
+        entries: Dict[str, Any],
+        changed: List[Tuple[str, str, float, int]],
+        results: Iterable[Optional[Dict[str, Any]]],
+        stats: Dict[str, Any]
+    ) -> None:
+        """Upsert processed files in batches, saving the manifest after each batch."""
+        batch = []
+        for (_, relpath, mtime, size), result in zip(changed, results):
+            batch.append((relpath, mtime, size, result))
+            if len(batch) >= self.files_per_batch:
+                self._upsert_batch(root, entries, batch, stats)
+                self._save_manifest(manifest)
+                batch = []
+        if batch:
+            self._upsert_batch(root, entries, batch, stats)
+            self._save_manifest(manifest)
+
+    def _upsert_batch(
+        self,
+        root: str,
+        entries: Dict[str, Any],
+        batch: List[Tuple[str, float, int, Optional[Dict[str, Any]]]],
+        stats: Dict[str, Any]
+    ) -> None:
+        """Embed the new chunks of a batch of files, delete their stale chunks and update the manifest."""
+        new_documents = []
+        pending = []
+        stale_ids = []
+
+        for relpath, mtime, size, result in batch:
+            entry = entries.get(relpath)
+            if result is None:
+                # Binary or unreadable: forget the file
+                if entry:
+                    stale_ids.extend(chunk["id"] for chunk in entry["chunks"])
+                    entries.pop(relpath)
+                continue
+
+            if entry and entry["hash"] == result["hash"] and entry.get("chunker") == CHUNKER_VERSION:
+                # Touched but not modified
+                entry["mtime"], entry["size"] = mtime, size
+                continue
+
+            stats["files_changed"] += 1
+
+            # Reuse chunks whose content is unchanged, unless they were cut by an older chunker
+            previous: Dict[str, List[int]] = {}
+            stale_chunker = entry is not None and entry.get("chunker") != CHUNKER_VERSION
+            for chunk in (entry or {}).get("chunks", []):
+                if stale_chunker:
+                    stale_ids.append(chunk["id"])
+                else:
+                    previous.setdefault(chunk["hash"], []).append(chunk["id"])
+
+            chunks = []
+            for chunk in result["chunks"]:
+                reused = previous.get(chunk["hash"])
+                if reused:
+                    chunks.append({"hash": chunk["hash"], "id": reused.pop()})
+                    stats["chunks_reused"] += 1
+                    continue
+                chunks.append({"hash": chunk["hash"], "id": None})
+                metadata = {
+                    "source": "codebase",
+                    "root": root,
+                    "path": relpath,
+                    "language": result["language"],
+                    "chunk_hash": chunk["hash"],
+                }
+                metadata.update(chunk_metadata(chunk))
+                new_documents.append({"content": chunk["content"], "metadata": metadata})
+            stale_ids.extend(doc_id for ids in previous.values() for doc_id in ids)
+            pending.append((relpath, {
+                "mtime": mtime,
+                "size": size,
+                "hash": result["hash"],
+                "chunker": CHUNKER_VERSION,
+                "chunks": chunks,
+            }))
+
+        doc_ids = iter(self.rag_service.add_documents(new_documents)) if new_documents else iter(())
+        stats["chunks_added"] += len(new_documents)
+        for relpath, entry in pending:
+            for chunk in entry["chunks"]:
+                if chunk["id"] is None:
+                    chunk["id"] = next(doc_ids)
+            entries[relpath] = entry
+
+        stats["chunks_deleted"] += self.rag_service.delete_documents(stale_ids)
@@ -0,0 +1,352 @@
+import json
+import logging
+import math
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Snapshot file names, formatted with the index prefix
+TERMS_FILE = "{}_terms.json"
+OFFSETS_FILE = "{}_offsets.npy"
+IDS_FILE = "{}_ids.npy"
+FREQUENCIES_FILE = "{}_tfs.npy"
+LENGTHS_FILE = "{}_lengths.npy"
+INDEX_FILES = (TERMS_FILE, OFFSETS_FILE, IDS_FILE, FREQUENCIES_FILE, LENGTHS_FILE)
+
+# BM25 term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Identifiers and numbers, and the camelCase / snake_case words inside identifiers
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_SUBWORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase lexical terms.
+
+    Identifiers are kept whole and also split into their camelCase and
+    snake_case words, so "getUserName" matches both "getusername" and "user".
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        Terms in order of occurrence
+    """
+    terms = []
+    for word in _WORD.findall(text):
+        terms.append(word.lower())
+        parts = _SUBWORD.findall(word)
+        if len(parts) > 1:
+            terms.extend(part.lower() for part in parts if len(part) > 1)
+    return terms
+
+def _fsync_file(path: str) -> None:
+    """Flush a written file to disk."""
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+class LexicalIndex:
+    """BM25 inverted index over document terms.
+
+    Like the vector store, the index is a read-only memory-mapped base
+    written with a snapshot, holding postings as (document id, term
+    frequency) arrays sorted by term, plus an in-memory delta of the
+    documents added since. Documents are identified by their position in
+    the store. Deleted documents are excluded at search time by the
+    caller's tombstones and dropped when a snapshot is written with a remap.
+    """
+
+    def __init__(self, directory: Optional[str] = None, prefix: str = "lexical"):
+        """
+        Initialize the index.
+
+        Args:
+            directory: Snapshot directory holding a written base, or None for an empty index
+            prefix: Prefix of the index file names in the snapshot directory
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self._terms: Dict[str, int] = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._frequencies = np.zeros(0, dtype=np.int32)
+        self._lengths = np.zeros(0, dtype=np.int32)
+        if directory is not None:
+            with open(self._path(directory, TERMS_FILE)) as f:
+                self._terms = {term: position for position, term in enumerate(json.load(f))}
+            self._offsets = np.load(self._path(directory, OFFSETS_FILE), mmap_mode="r")
+            self._ids = np.load(self._path(directory, IDS_FILE), mmap_mode="r")
+            self._frequencies = np.load(self._path(directory, FREQUENCIES_FILE), mmap_mode="r")
+            self._lengths = np.load(self._path(directory, LENGTHS_FILE), mmap_mode="r")
+        self._base_length = int(self._lengths.sum())
+
+        self.delta_postings: Dict[str, Dict[int, int]] = {}
+        self.delta_lengths: Dict[int, int] = {}
+        self._delta_length = 0
+
+    def _path(self, directory: str, name: str) -> str:
+        """Return the path of one of the index files in a directory."""
+        return os.path.join(directory, name.format(self.prefix))
+
+    @staticmethod
+    def exists(directory: Optional[str], prefix: str = "lexical") -> bool:
+        """Check whether a snapshot directory holds a written index with the given prefix."""
+        return directory is not None and all(
+            os.path.exists(os.path.join(directory, name.format(prefix))) for name in INDEX_FILES
+        )
+
+    @property
+    def base_size(self) -> int:
+        """Number of documents in the memory-mapped base."""
+        return len(self._lengths)
+
+    def __len__(self) -> int:
+        return self.base_size + len(self.delta_lengths)
+
+    def add(self, doc_id: int, text: str) -> None:
+        """
+        Index a document in the delta.
+
+        Documents that are already indexed are skipped, so replaying a log
+        over an index that already covers part of it is harmless.
+
+        Args:
+            doc_id: Document ID
+            text: Document content
+        """
+        self.add_terms(doc_id, tokenize(text))
+
+    def add_terms(self, doc_id: int, terms: List[str]) -> None:
+        """
+        Index a document given as its list of terms.
+
+        Args:
+            doc_id: Document ID
+            terms: Terms of the document, repeated as often as they occur
+        """
+        if doc_id < self.base_size or doc_id in self.delta_lengths:
+            return
+        frequencies: Dict[str, int] = {}
+        for term in terms:
+            frequencies[term] = frequencies.get(term, 0) + 1
+        for term, frequency in frequencies.items():
+            self.delta_postings.setdefault(term, {})[doc_id] = frequency
+        self.delta_lengths[doc_id] = len(terms)
+        self._delta_length += len(terms)
+
+    def add_many(self, documents: Iterable[Tuple[int, str]]) -> None:
+        """Index (document ID, content) pairs in the delta."""
+        for doc_id, text in documents:
+            self.add(doc_id, text)
+
+    def copy(self) -> "LexicalIndex":
+        """Return an index sharing this base with a private copy of the delta."""
+        copied = LexicalIndex.__new__(LexicalIndex)
+        copied.__dict__.update(self.__dict__)
+        copied.delta_postings = {term: dict(postings) for term, postings in self.delta_postings.items()}
+        copied.delta_lengths = dict(self.delta_lengths)
+        return copied
+
+    def carry_over(self, other: "LexicalIndex", first_id: int, shift: int = 0) -> None:
+        """
+        Copy the delta documents of another index from first_id onwards into this delta.
+
+        Args:
+            other: Index whose delta holds documents added after first_id
+            first_id: First document to copy
+            shift: Number of positions the copied documents move down by
+        """
+        for term, postings in other.delta_postings.items():
+            for doc_id, frequency in postings.items():
+                if doc_id >= first_id and doc_id - shift >= self.base_size:
+                    self.delta_postings.setdefault(term, {})[doc_id - shift] = frequency
+        for doc_id, length in other.delta_lengths.items():
+            if doc_id >= first_id and doc_id - shift >= self.base_size:
+                self.delta_lengths[doc_id - shift] = length
+                self._delta_length += length
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the document IDs and term frequencies of a term across the base and the delta."""
+        ids, frequencies = [], []
+        position = self._terms.get(term)
+        if position is not None:
+            start, end = int(self._offsets[position]), int(self._offsets[position + 1])
+            ids.append(np.asarray(self._ids[start:end]))
+            frequencies.append(np.asarray(self._frequencies[start:end]))
+        delta = self.delta_postings.get(term)
+        if delta:
+            # Postings are only ever appended, so the first count keys and values match even during an add
+            count = len(delta)
+            ids.append(np.fromiter(delta.keys(), dtype=np.int64, count=count))
+            frequencies.append(np.fromiter(delta.values(), dtype=np.int32, count=count))
+        if not ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+        return np.concatenate(ids), np.concatenate(frequencies)
+
+    def _document_lengths(self, ids: np.ndarray) -> np.ndarray:
+        """Look up the term counts of documents in the base and the delta."""
+        lengths = np.empty(len(ids), dtype=np.float32)
+        in_base = ids < self.base_size
+        lengths[in_base] = self._lengths[ids[in_base]]
+        for position in np.flatnonzero(~in_base):
+            lengths[position] = self.delta_lengths.get(int(ids[position]), 0)
+        return lengths
+
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        exclude: Optional[Set[int]] = None,
+        include: Optional[np.ndarray] = None,
+        limit: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Rank documents against a query with BM25.
+
+        Args:
+            query: Query text
+            top_k: Number of results to return
+            exclude: Document IDs to leave out, such as deleted documents
+            include: Sorted document IDs to restrict the search to, such as a filter's matches
+            limit: Number of documents visible to the search; documents added later are left out
+
+        Returns:
+            (document ID, score) pairs, best first
+        """
+        document_count = len(self) if limit is None else min(len(self), limit)
+        if document_count == 0 or top_k <= 0:
+            return []
+        average_length = max((self._base_length + self._delta_length) / document_count, 1.0)
+
+        matched_ids, matched_scores = [], []
+        for term in set(tokenize(query)):
+            ids, frequencies = self.postings(term)
+            if len(ids) == 0:
+                continue
+            idf = math.log(1 + (document_count - len(ids) + 0.5) / (len(ids) + 0.5))
+            frequencies = frequencies.astype(np.float32)
+            norms = BM25_K1 * (1 - BM25_B + BM25_B * self._document_lengths(ids) / average_length)
+            matched_ids.append(ids)
+            matched_scores.append(idf * frequencies * (BM25_K1 + 1) / (frequencies + norms))
+        if not matched_ids:
+            return []
+
+        # Sum the per-term scores of each document
+        ids, inverse = np.unique(np.concatenate(matched_ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(matched_scores))
+        if limit is not None:
+            keep = ids < limit
+            ids, scores = ids[keep], scores[keep]
+        if exclude:
+            keep = ~np.isin(ids, np.fromiter(exclude, dtype=np.int64, count=len(exclude)))
+            ids, scores = ids[keep], scores[keep]
+        if include is not None:
+            keep = np.isin(ids, include, assume_unique=True)
+            ids, scores = ids[keep], scores[keep]
+
+        if len(ids) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            ids, scores = ids[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        return [(int(ids[position]), float(scores[position])) for position in order]
+
+    def write(self, directory: str, document_count: int, remap: Optional[np.ndarray] = None) -> None:
+        """
+        Write the base and delta as a single base into a snapshot directory.
+
+        Args:
+            directory: Target snapshot directory
+            document_count: Number of documents the snapshot covers
+            remap: New position of each of the document_count documents, -1 for dropped ones
+        """
+        # Count the postings that are kept, dropping terms left without any
+        terms, total = [], 0
+        for term in sorted(set(self._terms) | set(self.delta_postings)):
+            term_ids, _ = self.postings(term)
+            kept = int((remap[term_ids] >= 0).sum()) if remap is not None else len(term_ids)
+            if kept:
+                terms.append(term)
+                total += kept
+
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        ids_path = self._path(directory, IDS_FILE)
+        frequencies_path = self._path(directory, FREQUENCIES_FILE)
+        ids = np.lib.format.open_memmap(ids_path, mode="w+", dtype=np.int64, shape=(total,))
+        frequencies = np.lib.format.open_memmap(frequencies_path, mode="w+", dtype=np.int32, shape=(total,))
+        position = 0
+        for number, term in enumerate(terms):
+            term_ids, term_frequencies = self.postings(term)
+            if remap is not None:
+                term_ids = remap[term_ids]
+                keep = term_ids >= 0
+                term_ids, term_frequencies = term_ids[keep], term_frequencies[keep]
+            ids[position:position + len(term_ids)] = term_ids
+            frequencies[position:position + len(term_ids)] = term_frequencies
+            position += len(term_ids)
+            offsets[number + 1] = position
+        ids.flush()
+        frequencies.flush()
+        del ids, frequencies
+
+        lengths = np.zeros(document_count, dtype=np.int32)
+        lengths[:min(self.base_size, document_count)] = self._lengths[:document_count]
+        for doc_id, length in self.delta_lengths.items():
+            if doc_id < document_count:
+                lengths[doc_id] = length
+        if remap is not None:
+            lengths = lengths[remap >= 0]
+
+        np.save(self._path(directory, OFFSETS_FILE), offsets)
+        np.save(self._path(directory, LENGTHS_FILE), lengths)
+        with open(self._path(directory, TERMS_FILE), "w") as f:
+            json.dump(terms, f, ensure_ascii=False)
+        for name in INDEX_FILES:
+            _fsync_file(self._path(directory, name))
+
+        logger.info(f"Wrote {self.prefix} index with {len(terms)} terms and {total} postings")
+
+# Marks of code in a query word: separators, call parentheses or a camelCase hump
+_CODE_WORD = re.compile(r"[_.:$#()\[\]<>]|[a-z][A-Z]")
+
+def is_identifier_query(query: str) -> bool:
+    """
+    Check whether a query is mostly identifiers, such as function or API names.
+
+    Such queries are answered well by exact term matches alone, so they can
+    skip the embedding call.
+
+    Args:
+        query: Query text
+
+    Returns:
+        True if at least half of the query words look like code identifiers
+    """
+    words = query.split()
+    if not words:
+        return False
+    code_words = sum(1 for word in words if _CODE_WORD.search(word) and _WORD.search(word))
+    return code_words * 2 >= len(words)
+
+def fuse_rankings(rankings: Iterable[List[int]], k: int = 60) -> List[int]:
+    """
+    Combine ranked lists with reciprocal rank fusion.
+
+    Args:
+        rankings: Lists of document IDs, best first
+        k: Rank offset damping the weight of the top ranks
+
+    Returns:
+        Document IDs ordered by their summed reciprocal ranks
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
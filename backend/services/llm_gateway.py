@@ -0,0 +1,238 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from backend.config import Settings
+from backend.services.response_cache import ResponseCache
+
+try:
+    import h2
+except ImportError:  # HTTP/2 needs the h2 package; fall back to HTTP/1.1 keep-alive
+    h2 = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class LLMGateway:
+    """Single OpenAI client shared by all agents and embedding providers.
+
+    Every call goes through one httpx connection pool, so keep-alive
+    connections (and, with HTTP/2, multiplexed streams) are reused across
+    agents instead of each agent opening its own sockets. The pool size,
+    keep-alive expiry, timeouts and retries come from the LLM_* settings.
+    Low-temperature requests are answered from an exact-match response
+    cache when the same request was completed before.
+    """
+
+    def __init__(self, settings: Settings):
+        """
+        Initialize the gateway.
+
+        Args:
+            settings: Application settings
+        """
+        self.settings = settings
+        self.model = settings.openai_model
+        http2 = settings.llm_http2 and h2 is not None
+        if settings.llm_http2 and not http2:
+            logger.warning("The h2 package is not installed, using HTTP/1.1 for LLM requests")
+
+        # The openai package takes most of the gateway's import time, so it is loaded with the first gateway
+        from openai import OpenAI
+
+        self.timeout = httpx.Timeout(settings.llm_timeout, connect=settings.llm_connect_timeout)
+        self.http_client = httpx.Client(
+            http2=http2,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_keepalive_connections,
+                keepalive_expiry=settings.llm_keepalive_expiry
+            )
+        )
+        self.client = OpenAI(
+            api_key=settings.openai_api_key,
+            http_client=self.http_client,
+            timeout=self.timeout,
+            max_retries=settings.llm_max_retries
+        )
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._failures = 0
+        self._seconds = 0.0
+        self._prompt_tokens = 0
+        self._completion_tokens = 0
+        self._streamed = 0
+        self._first_token_seconds = 0.0
+
+        self.cache = None
+        if settings.llm_cache_enabled:
+            self.cache = ResponseCache(
+                settings.llm_cache_path or os.path.join(settings.vector_db_path, "llm_cache.db"),
+                ttl=settings.llm_cache_ttl,
+                max_bytes=settings.llm_cache_max_size_mb * 1024 * 1024,
+                max_memory_items=settings.llm_cache_memory_size
+            )
+
+        logger.info(f"LLM gateway initialized ({'HTTP/2' if http2 else 'HTTP/1.1'}, "
+                    f"up to {settings.llm_max_connections} connections)")
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.1,
+        max_tokens: int = 4000,
+        model: Optional[str] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        use_cache: bool = True,
+        response_format: Optional[Dict[str, Any]] = None,
+        validate: Optional[Callable[[str], Any]] = None
+    ) -> str:
+        """
+        Run a chat completion.
+
+        Args:
+            messages: Chat messages
+            temperature: Sampling temperature
+            max_tokens: Maximum number of tokens to generate
+            model: Model to use, defaults to OPENAI_MODEL
+            on_token: Called with each piece of content as it is generated; the response is streamed if set
+            use_cache: Answer from, and store in, the response cache; False forces a new completion
+            response_format: Output format of the completion, e.g. {"type": "json_object"}
+            validate: Checks the content against the caller's contract, raising ValueError if it breaks it;
+                only content that passes is cached or answered from the cache
+
+        Returns:
+            Content of the first choice
+
+        Raises:
+            ValueError: If the new content does not pass validation
+        """
+        model = model or self.model
+        cache_key = None
+        if self.cache is not None and temperature <= self.settings.llm_cache_max_temperature:
+            cache_key = ResponseCache.make_key(model, messages, temperature, max_tokens, response_format)
+            if use_cache:
+                content = self.cache.get(cache_key)
+                if content is not None and not self._is_valid(content, validate):
+                    logger.warning(f"Ignoring cached response that fails validation: {content[:50]}...")
+                    content = None
+                if content is not None:
+                    if on_token is not None:
+                        on_token(content)
+                    return content
+
+        # Only send the output format when one is requested
+        options = {"response_format": response_format} if response_format is not None else {}
+        start_time = time.perf_counter()
+        try:
+            if on_token is not None:
+                content, usage, first_token_seconds = self._stream(
+                    messages, temperature, max_tokens, model, on_token, start_time, options
+                )
+            else:
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **options
+                )
+                content, usage, first_token_seconds = response.choices[0].message.content or "", response.usage, None
+        except Exception:
+            with self._lock:
+                self._requests += 1
+                self._failures += 1
+            raise
+
+        with self._lock:
+            self._requests += 1
+            self._seconds += time.perf_counter() - start_time
+            if first_token_seconds is not None:
+                self._streamed += 1
+                self._first_token_seconds += first_token_seconds
+            if usage is not None:
+                self._prompt_tokens += usage.prompt_tokens
+                self._completion_tokens += usage.completion_tokens
+        if validate is not None:
+            validate(content)
+        # A bypassed lookup still refreshes the cached response
+        if cache_key is not None and content:
+            self.cache.put(cache_key, model, content)
+        return content
+
+    @staticmethod
+    def _is_valid(content: str, validate: Optional[Callable[[str], Any]]) -> bool:
+        """Check whether content passes an optional validation."""
+        if validate is None:
+            return True
+        try:
+            validate(content)
+        except ValueError:
+            return False
+        return True
+
+    def _stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        model: str,
+        on_token: Callable[[str], None],
+        start_time: float,
+        options: Dict[str, Any]
+    ) -> Tuple[str, Any, float]:
+        """Run a streamed chat completion, returning its content, usage and time to first token."""
+        stream = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+            **options
+        )
+        pieces = []
+        usage = None
+        first_token_seconds = 0.0
+        with stream:
+            for chunk in stream:
+                # The last chunk carries the usage and no choices
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                piece = chunk.choices[0].delta.content
+                if piece:
+                    if not pieces:
+                        first_token_seconds = time.perf_counter() - start_time
+                    pieces.append(piece)
+                    on_token(piece)
+        return "".join(pieces), usage, first_token_seconds
+
+    def stats(self) -> Dict[str, Any]:
+        """Return request counts, latency, token usage and response cache counters."""
+        cache_stats = self.cache.stats() if self.cache is not None else None
+        with self._lock:
+            succeeded = self._requests - self._failures
+            return {
+                "requests": self._requests,
+                "failures": self._failures,
+                "streamed": self._streamed,
+                "mean_seconds": self._seconds / succeeded if succeeded else 0.0,
+                "mean_first_token_seconds": self._first_token_seconds / self._streamed if self._streamed else 0.0,
+                "prompt_tokens": self._prompt_tokens,
+                "completion_tokens": self._completion_tokens,
+                "cache": cache_stats
+            }
+
+    def close(self) -> None:
+        """Close the pooled connections and the response cache."""
+        self.http_client.close()
+        if self.cache is not None:
+            self.cache.close()
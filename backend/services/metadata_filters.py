@@ -0,0 +1,66 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+# Separates the field from the value in an index key
+KEY_SEPARATOR = "\0"
+
+# Common spellings of languages mapped to the names used by codebase ingestion
+LANGUAGE_ALIASES = {
+    "c++": "cpp",
+    "c#": "csharp",
+    "js": "javascript",
+    "node": "javascript",
+    "ts": "typescript",
+    "golang": "go",
+    "py": "python",
+    "python3": "python",
+    "bash": "shell",
+}
+
+def normalize_value(value: Any) -> str:
+    """Normalize a metadata value for exact, case-insensitive matching."""
+    return str(value).strip().lower()
+
+def normalize_language(language: Optional[str]) -> Optional[str]:
+    """
+    Normalize a language name to the name used by codebase ingestion.
+
+    Args:
+        language: Language name or alias, e.g. "JS" or "c++"
+
+    Returns:
+        The canonical name, e.g. "javascript" or "cpp", or None for an empty name
+    """
+    if language is None:
+        return None
+    language = normalize_value(language)
+    return LANGUAGE_ALIASES.get(language, language) or None
+
+def normalize_field_value(field: str, value: Any) -> str:
+    """Normalize a metadata value of a field, resolving language aliases."""
+    value = normalize_value(value)
+    return LANGUAGE_ALIASES.get(value, value) if field == "language" else value
+
+def language_filter(language: str) -> Dict[str, List[Optional[str]]]:
+    """
+    Build a filter for documents in a language or without a language.
+
+    Documents added without a language stay visible to every language, so
+    knowledge that is not tied to a language is not lost to the filter.
+
+    Args:
+        language: Programming language
+
+    Returns:
+        Filter for RAGService.retrieve
+    """
+    return {"language": [normalize_language(language), None]}
+
+def filter_key(filters: Optional[Dict[str, Any]]) -> Optional[Tuple[Tuple[str, Tuple[str, ...]], ...]]:
+    """Turn a filter into a hashable, order-independent cache key."""
+    if not filters:
+        return None
+    key = []
+    for field, value in sorted(filters.items()):
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        key.append((field, tuple(sorted("" if item is None else normalize_value(item) for item in values))))
+    return tuple(key)
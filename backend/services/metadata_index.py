@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from backend.services.lexical_index import LexicalIndex
+from backend.services.metadata_filters import KEY_SEPARATOR, normalize_field_value
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+FIELDS_FILE = "metadata_fields.json"
+
+class MetadataIndex:
+    """Partitions of document IDs by metadata value, used for filtered retrieval.
+
+    Each indexed field is split into one partition per value, plus one for
+    documents that lack the field; list values such as tags put a document
+    in several partitions. Partitions are stored as postings in a
+    LexicalIndex under the "metadata" prefix, so they are memory-mapped from
+    the snapshot and extended in memory like the lexical index.
+    """
+
+    def __init__(self, fields: Iterable[str], directory: Optional[str] = None):
+        """
+        Initialize the index.
+
+        Args:
+            fields: Metadata fields to index
+            directory: Snapshot directory holding a written index, or None for an empty index
+        """
+        self.fields = sorted({field.strip() for field in fields if field.strip()})
+        self.postings = LexicalIndex(directory, prefix="metadata")
+
+    @staticmethod
+    def exists(directory: Optional[str], fields: Iterable[str]) -> bool:
+        """Check whether a snapshot directory holds a metadata index of the given fields."""
+        fields_path = os.path.join(directory, FIELDS_FILE) if directory else None
+        if not fields_path or not os.path.exists(fields_path) or not LexicalIndex.exists(directory, "metadata"):
+            return False
+        with open(fields_path) as f:
+            return json.load(f) == sorted({field.strip() for field in fields if field.strip()})
+
+    def __len__(self) -> int:
+        return len(self.postings)
+
+    def _keys(self, metadata: Dict[str, Any]) -> List[str]:
+        """Return the partition keys of a document's metadata."""
+        keys = []
+        for field in self.fields:
+            value = metadata.get(field)
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            values = [normalize_field_value(field, item) for item in values if item is not None]
+            if not values:
+                keys.append(field + KEY_SEPARATOR)
+            keys.extend(dict.fromkeys(field + KEY_SEPARATOR + item for item in values))
+        return keys
+
+    def add(self, doc_id: int, metadata: Optional[Dict[str, Any]]) -> None:
+        """Put a document in the partitions of its metadata values."""
+        self.postings.add_terms(doc_id, self._keys(metadata or {}))
+
+    def copy(self) -> "MetadataIndex":
+        """Return an index sharing this base with a private copy of the delta."""
+        copied = MetadataIndex.__new__(MetadataIndex)
+        copied.fields = self.fields
+        copied.postings = self.postings.copy()
+        return copied
+
+    def carry_over(self, other: "MetadataIndex", first_id: int, shift: int = 0) -> None:
+        """Copy the delta documents of another index from first_id onwards, moved down by shift."""
+        self.postings.carry_over(other.postings, first_id, shift)
+
+    def matching(self, filters: Dict[str, Any], limit: Optional[int] = None) -> np.ndarray:
+        """
+        Find the documents matching a filter.
+
+        Every field of the filter must match; a list of values matches any of
+        them, and None matches documents without the field.
+
+        Args:
+            filters: Mapping of metadata field to a value or list of values
+            limit: Number of documents visible to the lookup; documents added later are left out
+
+        Returns:
+            Sorted IDs of the matching documents
+        """
+        matches = None
+        for field, value in filters.items():
+            if field not in self.fields:
+                raise ValueError(f"Metadata field '{field}' is not indexed for filtering, "
+                                 f"indexed fields are {self.fields} (see RAG_FILTER_FIELDS)")
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            keys = [field + KEY_SEPARATOR + ("" if item is None else normalize_field_value(field, item))
+                    for item in values]
+            field_ids = [self.postings.postings(key)[0] for key in keys]
+            field_matches = np.unique(np.concatenate(field_ids)) if field_ids else np.zeros(0, dtype=np.int64)
+            matches = field_matches if matches is None else np.intersect1d(matches, field_matches, assume_unique=True)
+        if matches is None:
+            return np.zeros(0, dtype=np.int64)
+        return matches[:np.searchsorted(matches, limit)] if limit is not None else matches
+
+    def write(self, directory: str, document_count: int, remap: Optional[np.ndarray] = None) -> None:
+        """
+        Write the index into a snapshot directory.
+
+        Args:
+            directory: Target snapshot directory
+            document_count: Number of documents the snapshot covers
+            remap: New position of each document, -1 for dropped ones
+        """
+        self.postings.write(directory, document_count, remap)
+        with open(os.path.join(directory, FIELDS_FILE), "w") as f:
+            json.dump(self.fields, f)
+            f.flush()
+            os.fsync(f.fileno())
@@ -1,71 +1,930 @@
 import logging
 import os
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, FrozenSet, Optional, Iterable, Iterator, Tuple, TypeVar, Union
 import faiss
 import numpy as np
-from openai import OpenAI
 import pickle
+import itertools
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from backend.config import get_settings
+from backend.config import Settings, get_settings
+from backend.services.chunking import chunk_document
+from backend.services.embedding_cache import EmbeddingCache
+from backend.services.embeddings import EmbeddingProvider, create_embedding_provider
+from backend.services.lexical_index import LexicalIndex, fuse_rankings, is_identifier_query
+from backend.services.metadata_filters import filter_key
+from backend.services.metadata_index import MetadataIndex
+from backend.services.document_store import DocumentTable, MappedDocuments
+from backend.services.store_view import StoreView
+from backend.services.vector_index import (
+    ADD_CHUNK_SIZE,
+    build_index,
+    compression_of,
+    configure_search,
+    index_type_of,
+    search_parameters,
+    search_vectors,
+    select_compression,
+    select_index_type,
+    VectorBuffer
+)
+from backend.services.wal import WriteAheadLog, fsync_directory, lock_store
+from backend.utils.cache import LRUCache
+from backend.utils.tokens import count_tokens, truncate_to_tokens
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Memory-map snapshot indexes read-only so worker processes share their pages
+FAISS_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+# Ways of ranking documents for a query; "auto" uses lexical for identifier queries and hybrid otherwise
+RETRIEVAL_MODES = ("auto", "hybrid", "vector", "lexical")
+
+# Vectors compared per step when scanning a filtered partition exactly
+FILTER_SCAN_CHUNK_SIZE = 4096
+
+# Roles a service can take on its store, see RAG_STORE_MODE
+STORE_MODES = ("auto", "writer", "reader")
+
+# Settings a store can pin in its snapshot to override the configured index for its compactions
+INDEX_SETTINGS = ("rag_index_type", "rag_index_promotion_threshold", "rag_vector_compression")
+
+# Smallest excerpt worth adding to a retrieved context
+MIN_EXCERPT_TOKENS = 32
+
+# Tokens taken by the blank line between documents and the truncation marker
+SEPARATOR_TOKENS = 4
+
+T = TypeVar("T")
+
 class RAGService:
-    """Service for Retrieval-Augmented Generation (RAG)."""
+    """Service for Retrieval-Augmented Generation (RAG).
+    
+    Reads and writes follow a read-copy-update scheme: every mutation is
+    logged and applied by a single writer thread, which then publishes a new
+    immutable StoreView; queries take the current view without a lock, so
+    any number of threads can search while documents are added.
     
-    def __init__(self, vector_db_path: str):
+    A store has one writer process. Other processes, such as the other API
+    workers, open it read-only and follow the writer by mapping its snapshots
+    and replaying the records it appends to the log.
+    """
+    
+    def __init__(
+        self,
+        vector_db_path: str,
+        settings: Optional[Settings] = None,
+        embedding_provider: Optional[EmbeddingProvider] = None
+    ):
         """
         Initialize the RAG service.
         
         Args:
             vector_db_path: Path to the vector database
+            settings: Settings of the store, defaults to the application settings
+            embedding_provider: Provider of the embeddings, defaults to the one selected by EMBEDDING_PROVIDER
         """
         self.vector_db_path = vector_db_path
-        self.settings = get_settings()
-        self.client = OpenAI(api_key=self.settings.openai_api_key)
+        self.settings = settings or get_settings()
+        self.embedding_provider = embedding_provider or create_embedding_provider(self.settings)
+        self.embedding_model = self.embedding_provider.name
+        self.embedding_cache = self._initialize_embedding_cache()
+        self.retrieval_cache = LRUCache(
+            max_size=self.settings.retrieval_cache_size,
+            ttl=self.settings.retrieval_cache_ttl
+        ) if self.settings.retrieval_cache_enabled else None
         
         # Initialize or load the vector index and documents
-        self.index, self.documents = self._initialize_vector_store()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-writer")
+        self._compaction_lock = threading.Lock()
+        self._compaction_thread = None
+        self._initialize_vector_store()
         
         logger.info("RAG Service initialized")
     
-    def _initialize_vector_store(self):
-        """Initialize or load the vector store."""
-        index_path = os.path.join(self.vector_db_path, "index.faiss")
-        docs_path = os.path.join(self.vector_db_path, "documents.pkl")
+    def _initialize_vector_store(self) -> None:
+        """
+        Load the latest snapshot and replay the write-ahead log on top of it.
+        
+        The snapshot index and document bodies are memory-mapped, so their
+        pages live in the page cache shared by all worker processes rather
+        than in each worker's heap; vectors and documents added since the
+        snapshot live in an in-memory delta until the next compaction. Stores
+        created before snapshots existed keep their top-level index.faiss and
+        documents.pkl, which are used as the base until the first compaction.
+        
+        The log, document IDs and snapshots have a single owner, so the writer
+        holds the store's lock while it is open. With RAG_STORE_MODE=auto a
+        store whose lock another process holds is opened read-only instead;
+        writer fails and reader never takes the lock.
+        """
+        os.makedirs(self.vector_db_path, exist_ok=True)
+        mode = self.settings.rag_store_mode.lower()
+        if mode not in STORE_MODES:
+            raise ValueError(f"Unknown store mode '{self.settings.rag_store_mode}', expected one of {STORE_MODES}")
+        self._store_lock = None
+        self.read_only = True
+        if mode != "reader":
+            try:
+                self._store_lock = lock_store(self.vector_db_path)
+                self.read_only = False
+            except RuntimeError:
+                if mode == "writer":
+                    raise
+                logger.info(f"Vector store at {self.vector_db_path} is written by another process, "
+                            f"following it read-only")
+        self.generation = 0
+        self._reload_due = False
+        self._followed_at = time.monotonic()
+        try:
+            self._load_vector_store()
+        except Exception:
+            self._release_store_lock()
+            raise
+    
+    def _load_vector_store(self) -> None:
+        """Load the snapshot and replay the log, truncating a torn tail only if the store is ours to write."""
+        index, self.documents, self.snapshot_seq, self._snapshot_dir = self._load_snapshot()
+        self._base_index = self._check_embedding_space(index, self._snapshot_dir)
+        self._delta = VectorBuffer(self._base_index.d)
+        self.tombstones = self._load_tombstones(self._snapshot_dir)
+        self.next_id = self._load_next_id(self._snapshot_dir)
+        self.index_settings = self._load_index_settings(self._snapshot_dir)
+        self.lexical_index = self._load_lexical_index(self._snapshot_dir)
+        self.metadata_index = self._load_metadata_index(self._snapshot_dir)
+        self._base_vectors = self._load_base_vectors(self._snapshot_dir)
         
-        if os.path.exists(index_path) and os.path.exists(docs_path):
-            # Load existing index and documents
-            logger.info("Loading existing vector store")
+        # Replay mutations logged after the snapshot was taken
+        self.wal = WriteAheadLog(
+            os.path.join(self.vector_db_path, "wal"),
+            fsync=self.settings.wal_fsync
+        )
+        self._logged_since_snapshot = 0
+        self.sequence = self.snapshot_seq
+        if self.read_only:
+            records, self._wal_position = self.wal.tail(after_seq=self.snapshot_seq)
+        else:
+            records = self.wal.replay(after_seq=self.snapshot_seq)
+        replayed = 0
+        for seq, record in records:
+            self._apply_record(record)
+            self.sequence = seq
+            replayed += 1
+        
+        if replayed:
+            logger.info(f"Replayed {replayed} log records on top of snapshot {self.snapshot_seq}")
+        self._publish()
+    
+    def _create_index(self):
+        """Create an empty flat vector index of the embedding provider's dimension."""
+        return faiss.IndexFlatL2(self.embedding_provider.dimension)
+    
+    def _check_embedding_space(self, index, snapshot_dir: Optional[str]):
+        """
+        Make sure a loaded index holds embeddings of the configured provider.
+        
+        Vectors of another model or dimension cannot be compared with new
+        query embeddings, so such a store is refused unless it is empty.
+        
+        Returns:
+            The index, or a new empty index if an empty one had another dimension
+        """
+        stored_model = None
+        if snapshot_dir is not None:
+            with open(os.path.join(snapshot_dir, "meta.json")) as f:
+                stored_model = json.load(f).get("embedding_model")
+        if index.ntotal == 0:
+            return index if index.d == self.embedding_provider.dimension else self._create_index()
+        if index.d != self.embedding_provider.dimension or stored_model not in (None, self.embedding_model):
+            raise ValueError(
+                f"Vector store at {self.vector_db_path} holds {index.d}-dimensional embeddings of "
+                f"'{stored_model or 'unknown model'}', but the configured embedding provider produces "
+                f"{self.embedding_provider.dimension}-dimensional embeddings of '{self.embedding_model}'; "
+                f"use another VECTOR_DB_PATH or re-ingest the documents into a new store"
+            )
+        return index
+    
+    def _current_snapshot_dir(self) -> Optional[str]:
+        """Return the directory of the published snapshot, if any."""
+        current_path = os.path.join(self.vector_db_path, "CURRENT")
+        if not os.path.exists(current_path):
+            return None
+        with open(current_path) as f:
+            return os.path.join(self.vector_db_path, "snapshots", f.read().strip())
+    
+    def _load_snapshot(self):
+        """Load the current snapshot as (index, documents, last covered log sequence, snapshot directory)."""
+        snapshot_dir = self._current_snapshot_dir()
+        if snapshot_dir is not None:
+            with open(os.path.join(snapshot_dir, "meta.json")) as f:
+                snapshot_seq = json.load(f)["seq"]
+            base_dir = snapshot_dir
+        else:
+            base_dir = self.vector_db_path
+            snapshot_seq = 0
+        
+        index_path = os.path.join(base_dir, "index.faiss")
+        docs_path = os.path.join(base_dir, "documents.pkl")
+        
+        if os.path.exists(index_path) and MappedDocuments.exists(base_dir):
+            # Memory-map the index and document bodies
+            logger.info(f"Loading vector store snapshot from {base_dir}")
+            index = faiss.read_index(index_path, FAISS_MMAP_FLAGS)
+            configure_search(index, self.settings)
+            documents = DocumentTable(base=MappedDocuments(base_dir))
+        elif os.path.exists(index_path) and os.path.exists(docs_path):
+            # Legacy store with a pickled document list
+            logger.info(f"Loading legacy vector store from {base_dir}")
             index = faiss.read_index(index_path)
             with open(docs_path, 'rb') as f:
-                documents = pickle.load(f)
+                documents = DocumentTable(tail=pickle.load(f))
         else:
-            # Create a new index and empty documents list
+            # Create a new index and empty documents table
             logger.info("Creating new vector store")
-            os.makedirs(self.vector_db_path, exist_ok=True)
+            index = self._create_index()
+            documents = DocumentTable()
+        
+        return index, documents, snapshot_seq, snapshot_dir
+    
+    def _load_tombstones(self, snapshot_dir: Optional[str]) -> FrozenSet[int]:
+        """Load the positions of deleted documents recorded in a snapshot."""
+        tombstones_path = os.path.join(snapshot_dir, "tombstones.npy") if snapshot_dir else None
+        if tombstones_path and os.path.exists(tombstones_path):
+            return frozenset(np.load(tombstones_path).tolist())
+        return frozenset()
+    
+    def _load_next_id(self, snapshot_dir: Optional[str]) -> int:
+        """Return the next unused document ID recorded in a snapshot; IDs of older stores are positions."""
+        if snapshot_dir is not None:
+            with open(os.path.join(snapshot_dir, "meta.json")) as f:
+                meta = json.load(f)
+            if "next_id" in meta:
+                return meta["next_id"]
+        return len(self.documents)
+    
+    def _load_index_settings(self, snapshot_dir: Optional[str]) -> Dict[str, Any]:
+        """Return the index settings pinned in a snapshot, if any."""
+        if snapshot_dir is not None:
+            with open(os.path.join(snapshot_dir, "meta.json")) as f:
+                return json.load(f).get("index_settings", {})
+        return {}
+    
+    def _compaction_settings(self, index_settings: Dict[str, Any]) -> Settings:
+        """Return the settings compactions build the index with, after the pinned index settings."""
+        return self.settings.model_copy(update=index_settings) if index_settings else self.settings
+    
+    def pin_index_settings(self, index_settings: Dict[str, Any]) -> None:
+        """
+        Pin the index type and compression of the store for its compactions.
+        
+        The pinned settings are written into the next snapshot and override
+        the configured RAG_INDEX_* and RAG_VECTOR_COMPRESSION settings for
+        every later compaction, until they are replaced.
+        
+        Args:
+            index_settings: Values of some of INDEX_SETTINGS; empty to follow the configured settings again
             
-            # Create a simple L2 index
-            dimension = 1536  # OpenAI's embedding dimension
-            index = faiss.IndexFlatL2(dimension)
-            documents = []
+        Raises:
+            ValueError: If a setting is not one of INDEX_SETTINGS
+        """
+        self._check_writable()
+        unknown = set(index_settings) - set(INDEX_SETTINGS)
+        if unknown:
+            raise ValueError(f"Cannot pin settings {sorted(unknown)}, expected some of {INDEX_SETTINGS}")
+        
+        def pin():
+            self.index_settings = dict(index_settings)
+        self._write(pin)
+    
+    def _load_base_vectors(self, snapshot_dir: Optional[str]) -> Optional[np.ndarray]:
+        """Memory-map the raw vectors kept next to a compressed or graph snapshot index, if any."""
+        vectors_path = os.path.join(snapshot_dir, "vectors.npy") if snapshot_dir else None
+        if vectors_path and os.path.exists(vectors_path):
+            return np.load(vectors_path, mmap_mode="r")
+        return None
+    
+    def _load_lexical_index(self, snapshot_dir: Optional[str]) -> LexicalIndex:
+        """Open the lexical index of a snapshot, building it from the documents if it was never written."""
+        if LexicalIndex.exists(snapshot_dir):
+            return LexicalIndex(snapshot_dir)
+        lexical_index = LexicalIndex()
+        if len(self.documents):
+            logger.info(f"Building lexical index for {len(self.documents)} documents")
+            lexical_index.add_many((position, document["content"])
+                                   for position, document in enumerate(self.documents))
+        return lexical_index
+    
+    def _filter_fields(self) -> List[str]:
+        """Return the metadata fields indexed for filtered retrieval."""
+        return [field.strip() for field in self.settings.rag_filter_fields.split(",") if field.strip()]
+    
+    def _load_metadata_index(self, snapshot_dir: Optional[str]) -> MetadataIndex:
+        """Open the metadata index of a snapshot, building it from the documents if missing or outdated."""
+        fields = self._filter_fields()
+        if MetadataIndex.exists(snapshot_dir, fields):
+            return MetadataIndex(fields, snapshot_dir)
+        metadata_index = MetadataIndex(fields)
+        if len(self.documents):
+            logger.info(f"Building metadata index on {fields} for {len(self.documents)} documents")
+            for position, document in enumerate(self.documents):
+                metadata_index.add(position, document.get("metadata"))
+        return metadata_index
+    
+    @property
+    def view(self) -> StoreView:
+        """Latest published state of the store."""
+        self._follow()
+        return self._view
+    
+    @property
+    def index(self):
+        """Index of the current snapshot."""
+        return self._view.index
+    
+    @property
+    def ntotal(self) -> int:
+        """Total number of vectors in the snapshot index and the delta."""
+        return self._view.ntotal
+    
+    def _publish(self) -> None:
+        """Publish the writer's state as the view seen by new queries."""
+        self._view = StoreView(
+            index=self._base_index,
+            delta=self._delta.rows(),
+            documents=self.documents,
+            tombstones=self.tombstones,
+            lexical_index=self.lexical_index,
+            metadata_index=self.metadata_index,
+            base_vectors=self._base_vectors,
+            generation=self.generation,
+            sequence=self.sequence
+        )
+    
+    def _write(self, mutation: Callable[[], T]) -> T:
+        """Run a function on the writer thread and wait for its result."""
+        return self._writer.submit(mutation).result()
+    
+    def _check_writable(self) -> None:
+        """Refuse a mutation of a store this service follows read-only."""
+        if self.read_only:
+            raise RuntimeError(f"Vector store at {self.vector_db_path} is open read-only in this process; "
+                               f"write to it through the process holding its lock")
+    
+    def _follow(self) -> None:
+        """Queue a catch-up with the writer of a read-only store, at most every RAG_FOLLOW_INTERVAL seconds."""
+        if not self.read_only:
+            return
+        now = time.monotonic()
+        if now - self._followed_at < self.settings.rag_follow_interval:
+            return
+        self._followed_at = now
+        # Queries keep using the current view instead of waiting for the catch-up
+        self._writer.submit(self._catch_up_logged)
+    
+    def refresh(self) -> None:
+        """Catch up with the writer of a read-only store now and wait until the new state is published."""
+        if self.read_only:
+            self._followed_at = time.monotonic()
+            self._write(self._catch_up)
+    
+    def _catch_up_logged(self) -> None:
+        """Catch up with the writer, logging instead of raising on failure."""
+        try:
+            self._catch_up()
+        except Exception as e:
+            logger.warning(f"Error following vector store at {self.vector_db_path}: {str(e)}")
+    
+    def _catch_up(self) -> None:
+        """
+        Apply what the writer process logged since the last catch-up; runs on the writer thread.
+        
+        Records appended to the log are replayed on top of the current
+        state. Once the writer publishes a new snapshot, the log segments it
+        covers may be gone, so the new snapshot is loaded instead. If the
+        writer has exited and RAG_STORE_MODE is auto, the store is taken over
+        for writing.
+        """
+        if self.settings.rag_store_mode.lower() == "auto":
+            try:
+                self._store_lock = lock_store(self.vector_db_path)
+            except RuntimeError:
+                pass
+            else:
+                logger.info(f"Vector store at {self.vector_db_path} has no writer anymore, taking it over")
+                self.read_only = False
+                try:
+                    self._reload()
+                except Exception:
+                    self.read_only = True
+                    self._release_store_lock()
+                    raise
+                return
+        if self._reload_due or self._current_snapshot_dir() != self._snapshot_dir:
+            self._reload()
+            return
+        records, position = self.wal.tail(after_seq=self.sequence, position=self._wal_position)
+        if records and records[0][0] != self.sequence + 1:
+            # Segments were dropped by a compaction whose snapshot was published since
+            self._reload()
+            return
+        self._wal_position = position
+        for seq, record in records:
+            self._apply_record(record)
+            self.sequence = seq
+        if records:
+            self._publish()
+    
+    def _reload(self) -> None:
+        """Load the current snapshot and log from scratch; queries use the previous view meanwhile."""
+        # A failure halfway leaves a mix of old and new state, which only a later reload replaces
+        self._reload_due = True
+        # Results cached for the previous state must not match the reloaded one
+        self.generation += 1
+        self._load_vector_store()
+        self._reload_due = False
+    
+    def _apply_record(self, record: Dict[str, Any]) -> None:
+        """
+        Apply a logged mutation to the in-memory delta and bump the generation.
+        
+        Added documents are appended at new positions; adding a document with
+        the ID of a live one replaces it by tombstoning its old position.
+        Deletes name stable document IDs, which are resolved to positions.
+        Rebuild records only mark a forced compaction and change nothing.
+        """
+        self.generation += 1
+        if record["op"] == "add":
+            self._delta.append(record["vectors"])
+            replaced = set()
+            for document in record["documents"]:
+                previous = self.documents.position_of(document["id"])
+                if previous is not None:
+                    replaced.add(previous)
+                position = len(self.documents)
+                self.documents.append(document)
+                self.lexical_index.add(position, document["content"])
+                self.metadata_index.add(position, document.get("metadata"))
+                self.next_id = max(self.next_id, document["id"] + 1)
+            if replaced:
+                self.tombstones = self.tombstones | replaced
+            self._logged_since_snapshot += len(record["documents"])
+        elif record["op"] == "delete":
+            positions = (self.documents.position_of(doc_id) for doc_id in record["ids"])
+            self.tombstones = self.tombstones | {position for position in positions if position is not None}
+            self._logged_since_snapshot += len(record["ids"])
+        elif record["op"] == "clear":
+            self._base_index = self._create_index()
+            self._delta = VectorBuffer(self._base_index.d)
+            self.documents = DocumentTable()
+            self.tombstones = frozenset()
+            self.lexical_index = LexicalIndex()
+            self.metadata_index = MetadataIndex(self._filter_fields())
+            self._base_vectors = None
+        elif record["op"] != "rebuild":
+            raise ValueError(f"Unknown log record type: {record['op']}")
+    
+    def _log_and_apply(self, record: Dict[str, Any]) -> None:
+        """Append a mutation to the write-ahead log, apply it in memory and publish it; runs on the writer thread."""
+        seq = self.wal.append(record)
+        self._apply_record(record)
+        self.sequence = seq
+        self._publish()
+    
+    def _search(self, view: StoreView, query_np: np.ndarray, top_k: int, allowed: Optional[np.ndarray] = None):
+        """
+        Search the snapshot index and the delta and merge the results.
+        
+        Args:
+            view: Store view to search
+            query_np: Query embedding matrix with a single row
+            top_k: Number of results to return
+            allowed: Sorted positions of live documents to restrict the search to
             
-            # Save the empty index and documents
-            faiss.write_index(index, index_path)
-            with open(docs_path, 'wb') as f:
-                pickle.dump(documents, f)
+        Returns:
+            Tuple of (distances, document positions), nearest first
+        """
+        if allowed is not None:
+            return self._search_partition(view, query_np, top_k, allowed)
+        
+        index, tombstones = view.index, view.tombstones
+        
+        # Over-fetch so that deleted documents can be skipped
+        fetch_k = top_k + len(tombstones)
+        results = []
+        if index.ntotal:
+            distances, indices = self._search_base(view, query_np, min(fetch_k, index.ntotal))
+            results.extend((float(distance), int(idx)) for distance, idx in zip(distances, indices)
+                           if int(idx) not in tombstones)
+        distances, indices = search_vectors(view.delta, query_np, fetch_k)
+        results.extend((float(distance), int(idx) + index.ntotal) for distance, idx in zip(distances, indices)
+                       if int(idx) + index.ntotal not in tombstones)
         
-        return index, documents
+        results.sort(key=lambda result: result[0])
+        results = results[:top_k]
+        return [distance for distance, _ in results], [position for _, position in results]
+    
+    def _search_base(self, view: StoreView, query_np: np.ndarray, k: int, params=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search the snapshot index, re-ranking the results of a compressed index exactly.
+        
+        Compressed indexes only approximate distances, so they are asked for
+        RAG_RERANK_FACTOR times as many candidates, which are then ordered by
+        their exact distance to the raw vectors kept on disk next to the index.
+        
+        Args:
+            view: Store view whose snapshot index is searched
+            query_np: Query embedding matrix with a single row
+            k: Number of results to return
+            params: Optional search parameters, e.g. an ID selector
+            
+        Returns:
+            Tuple of (distances, positions), nearest first, without empty slots
+        """
+        index, base_vectors = view.index, view.base_vectors
+        rerank = (compression_of(index) != "none"
+                  and base_vectors is not None and len(base_vectors) >= index.ntotal)
+        fetch_k = min(k * self.settings.rag_rerank_factor, index.ntotal) if rerank else k
+        distances, indices = index.search(query_np, fetch_k, params=params)
+        distances, indices = distances[0], indices[0]
+        found = indices >= 0
+        distances, indices = distances[found], indices[found]
+        if rerank and len(indices):
+            # Read the candidate rows in file order
+            order = np.argsort(indices)
+            exact = np.empty(len(indices), dtype=np.float32)
+            exact[order] = ((base_vectors[indices[order]] - query_np[0]) ** 2).sum(axis=1)
+            nearest = np.argsort(exact, kind="stable")[:k]
+            distances, indices = exact[nearest], indices[nearest]
+        return distances, indices
+    
+    def _search_partition(self, view: StoreView, query_np: np.ndarray, top_k: int, allowed: np.ndarray):
+        """
+        Search only the given documents.
+        
+        Small partitions are scanned exactly from their stored vectors, so the
+        cost follows the partition size rather than the store size; larger
+        ones are searched through the snapshot index with an ID selector.
+        
+        Args:
+            view: Store view to search
+            query_np: Query embedding matrix with a single row
+            top_k: Number of results to return
+            allowed: Sorted positions of live documents to search
+            
+        Returns:
+            Tuple of (distances, document positions), nearest first
+        """
+        if len(allowed) <= self.settings.rag_filter_exact_limit:
+            distances = np.empty(len(allowed), dtype=np.float32)
+            for start in range(0, len(allowed), FILTER_SCAN_CHUNK_SIZE):
+                vectors = self._vectors_at(view, allowed[start:start + FILTER_SCAN_CHUNK_SIZE])
+                if vectors is None:
+                    break
+                distances[start:start + len(vectors)] = ((vectors - query_np[0]) ** 2).sum(axis=1)
+            else:
+                order = np.argsort(distances, kind="stable")[:top_k]
+                return distances[order].tolist(), allowed[order].tolist()
+        
+        index = view.index
+        results = []
+        base_ids = allowed[allowed < index.ntotal]
+        if len(base_ids):
+            params = search_parameters(index, faiss.IDSelectorBatch(base_ids), self.settings)
+            distances, indices = self._search_base(view, query_np, min(top_k, len(base_ids)), params)
+            results.extend((float(distance), int(idx)) for distance, idx in zip(distances, indices))
+        delta_ids = allowed[allowed >= index.ntotal]
+        if len(delta_ids):
+            distances, indices = search_vectors(view.delta[delta_ids - index.ntotal], query_np, top_k)
+            results.extend((float(distance), int(delta_ids[idx])) for distance, idx in zip(distances, indices))
+        
+        results.sort(key=lambda result: result[0])
+        results = results[:top_k]
+        return [distance for distance, _ in results], [position for _, position in results]
+    
+    def _purge_due(self, deleted: int, documents: int) -> bool:
+        """Check whether enough documents are deleted for a compaction to drop them from the index."""
+        return deleted > 0 and (deleted >= self.settings.rag_purge_deleted_threshold
+                                or deleted >= self.settings.rag_purge_deleted_ratio * documents)
+    
+    def _maybe_compact(self) -> None:
+        """Start a background compaction when the log is long, the index is due for promotion or deleted documents pile up."""
+        view = self._view
+        due_for_promotion = (index_type_of(view.index) == "flat"
+                             and select_index_type(view.ntotal, self._compaction_settings(self.index_settings)) != "flat")
+        if (self._logged_since_snapshot < self.settings.wal_compaction_threshold and not due_for_promotion
+                and not self._purge_due(len(view.tombstones), view.document_count)):
+            return
+        
+        def start_compaction():
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return
+            self._compaction_thread = threading.Thread(
+                target=self._compact_in_background, name="rag-compaction", daemon=True
+            )
+            self._compaction_thread.start()
+        self._write(start_compaction)
+    
+    def _compact_in_background(self) -> None:
+        """Run a compaction, logging instead of raising on failure."""
+        try:
+            self.compact()
+        except Exception as e:
+            logger.error(f"Error in background compaction: {str(e)}")
+    
+    def _iter_snapshot_vectors(self, index, snapshot_dir: Optional[str]) -> Iterator[np.ndarray]:
+        """Yield the raw vectors of a snapshot index in chunks."""
+        vectors_path = os.path.join(snapshot_dir, "vectors.npy") if snapshot_dir else None
+        if vectors_path and os.path.exists(vectors_path):
+            stored = np.load(vectors_path, mmap_mode="r")
+            for start in range(0, len(stored), ADD_CHUNK_SIZE):
+                yield np.asarray(stored[start:start + ADD_CHUNK_SIZE])
+        else:
+            # Flat indexes hold the raw vectors themselves
+            for start in range(0, index.ntotal, ADD_CHUNK_SIZE):
+                yield index.reconstruct_n(start, min(ADD_CHUNK_SIZE, index.ntotal - start))
     
-    def _get_embedding(self, text: str) -> List[float]:
-        """Get embedding for the given text."""
-        response = self.client.embeddings.create(
-            model="text-embedding-ada-002",
-            input=text
+    def compact(self, purge: Optional[bool] = None, rebuild: bool = False) -> None:
+        """
+        Write a snapshot covering the whole log and drop the covered log segments.
+        
+        The store is captured on the writer thread, but the new index is built
+        and written outside it, so queries and adds keep being served from the
+        current snapshot and delta meanwhile; the writer thread then swaps the
+        new snapshot in and publishes it. The index type follows the store size
+        and the index settings pinned in the snapshot, if any, which promotes the store
+        from a flat index to the configured ANN index once it crosses the
+        promotion threshold. Snapshots are published by atomically replacing
+        the CURRENT pointer, so a crash at any point leaves either the old or
+        the new snapshot in place, with the log still covering the gap.
+        
+        Once deleted documents pass RAG_PURGE_DELETED_THRESHOLD or
+        RAG_PURGE_DELETED_RATIO of the store, the snapshot is rebuilt without
+        them: the remaining documents move down to close the gaps, which
+        changes their positions but not their IDs.
+        
+        Args:
+            purge: Drop deleted documents from the snapshot, defaults to doing so when due
+            rebuild: Build the index from scratch with the current index type and
+                compression settings, even if nothing was logged since the snapshot
+        """
+        self._check_writable()
+        with self._compaction_lock:
+            # Capture a consistent view of the store
+            def capture():
+                if self.wal.last_seq == self.snapshot_seq:
+                    if not rebuild:
+                        return None
+                    # The new snapshot needs a sequence number of its own
+                    self._log_and_apply({"op": "rebuild"})
+                return (self.wal.rotate(), self._base_index, self._snapshot_dir, self._delta.rows(),
+                        self.documents, sorted(self.tombstones), self.lexical_index.copy(),
+                        self.metadata_index.copy(), self._logged_since_snapshot, self.next_id,
+                        self.index_settings)
+            captured = self._write(capture)
+            if captured is None:
+                return
+            (seq, base_index, base_dir, delta_vectors, documents, tombstones,
+             lexical_index, metadata_index, logged, next_id, index_settings) = captured
+            settings = self._compaction_settings(index_settings)
+            delta_count = len(delta_vectors)
+            document_count = base_index.ntotal + delta_count
+            if purge is None:
+                purge = self._purge_due(len(tombstones), document_count)
+            
+            # New position of every captured document, -1 for the dropped ones
+            keep = np.ones(document_count, dtype=bool)
+            if purge:
+                keep[tombstones] = False
+            remap = np.cumsum(keep) - 1
+            remap[~keep] = -1
+            kept_count = int(keep.sum())
+            
+            name = f"{seq:016d}"
+            snapshots_path = os.path.join(self.vector_db_path, "snapshots")
+            snapshot_dir = os.path.join(snapshots_path, name)
+            tmp_dir = snapshot_dir + ".tmp"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            
+            # Gather the raw vectors of the snapshot and the delta on disk
+            vectors_path = os.path.join(tmp_dir, "vectors.npy")
+            vectors = np.lib.format.open_memmap(
+                vectors_path, mode="w+", dtype=np.float32, shape=(kept_count, base_index.d)
+            )
+            position = written = 0
+            chunks = self._iter_snapshot_vectors(base_index, base_dir)
+            for chunk in itertools.chain(chunks, [delta_vectors] if delta_count else []):
+                kept = chunk[keep[position:position + len(chunk)]]
+                vectors[written:written + len(kept)] = kept
+                position += len(chunk)
+                written += len(kept)
+            vectors.flush()
+            
+            index_type = select_index_type(kept_count, settings)
+            compression = select_compression(index_type, kept_count, settings)
+            if (index_type != "flat" and base_dir is not None and not rebuild
+                    and index_type_of(base_index) == index_type and compression_of(base_index) == compression):
+                # Reuse a private copy of the already trained index
+                index = faiss.read_index(os.path.join(base_dir, "index.faiss"))
+                if purge:
+                    index.reset()
+                    for start in range(0, kept_count, ADD_CHUNK_SIZE):
+                        index.add(np.asarray(vectors[start:start + ADD_CHUNK_SIZE]))
+                elif delta_count:
+                    index.add(delta_vectors)
+            else:
+                index = build_index(index_type, vectors, settings)
+            del vectors
+            
+            index_path = os.path.join(tmp_dir, "index.faiss")
+            faiss.write_index(index, index_path)
+            del index
+            for path in (index_path, vectors_path):
+                with open(path, 'rb') as f:
+                    os.fsync(f.fileno())
+            if index_type == "flat" and compression == "none":
+                # The flat index already holds the raw vectors
+                os.remove(vectors_path)
+            
+            MappedDocuments.write(tmp_dir, (document for document, kept in
+                                            zip(itertools.islice(documents, document_count), keep) if kept))
+            lexical_index.write(tmp_dir, document_count, remap if purge else None)
+            metadata_index.write(tmp_dir, document_count, remap if purge else None)
+            del lexical_index, metadata_index
+            with open(os.path.join(tmp_dir, "tombstones.npy"), 'wb') as f:
+                np.save(f, np.array([] if purge else tombstones, dtype=np.int64))
+                f.flush()
+                os.fsync(f.fileno())
+            with open(os.path.join(tmp_dir, "meta.json"), 'w') as f:
+                json.dump({
+                    "seq": seq,
+                    "documents": kept_count,
+                    "deleted": 0 if purge else len(tombstones),
+                    "purged": document_count - kept_count,
+                    "next_id": next_id,
+                    "index_type": index_type,
+                    "compression": compression,
+                    "index_settings": index_settings,
+                    "embedding_model": self.embedding_model
+                }, f)
+                f.flush()
+                os.fsync(f.fileno())
+            
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            os.rename(tmp_dir, snapshot_dir)
+            fsync_directory(snapshots_path)
+            
+            # Publish the snapshot
+            current_tmp = os.path.join(self.vector_db_path, "CURRENT.tmp")
+            with open(current_tmp, 'w') as f:
+                f.write(name)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(current_tmp, os.path.join(self.vector_db_path, "CURRENT"))
+            fsync_directory(self.vector_db_path)
+            
+            # Swap in the memory-mapped snapshot, carrying over anything added meanwhile
+            new_index = faiss.read_index(os.path.join(snapshot_dir, "index.faiss"), FAISS_MMAP_FLAGS)
+            configure_search(new_index, self.settings)
+            new_documents = MappedDocuments(snapshot_dir)
+            new_lexical_index = LexicalIndex(snapshot_dir)
+            new_metadata_index = MetadataIndex(self._filter_fields(), snapshot_dir)
+            new_base_vectors = self._load_base_vectors(snapshot_dir)
+            shift = document_count - kept_count
+            
+            def swap():
+                new_delta = VectorBuffer(new_index.d)
+                new_delta.append(self._delta.rows()[delta_count:])
+                tail = self.documents.tail[document_count - self.documents.base_size:]
+                self.documents = DocumentTable(base=new_documents, tail=tail)
+                self._base_index, self._delta = new_index, new_delta
+                new_lexical_index.carry_over(self.lexical_index, document_count, shift)
+                self.lexical_index = new_lexical_index
+                new_metadata_index.carry_over(self.metadata_index, document_count, shift)
+                self.metadata_index = new_metadata_index
+                if purge:
+                    # Move documents deleted meanwhile to their new positions
+                    self.tombstones = frozenset(
+                        int(remap[position]) if position < document_count else position - shift
+                        for position in self.tombstones if position >= document_count or keep[position]
+                    )
+                self._base_vectors = new_base_vectors
+                self._snapshot_dir = snapshot_dir
+                self.snapshot_seq = seq
+                self._logged_since_snapshot -= logged
+                # Queries still running on the previous view keep its snapshot files mapped
+                self._publish()
+            self._write(swap)
+            
+            # Drop log segments and snapshots that are no longer needed
+            self.wal.truncate(seq)
+            for entry in os.listdir(snapshots_path):
+                if entry != name:
+                    shutil.rmtree(os.path.join(snapshots_path, entry), ignore_errors=True)
+            
+            logger.info(f"Compacted vector store into {index_type} ({compression}) snapshot {name}"
+                        + (f", dropping {shift} deleted documents" if shift else ""))
+    
+    def _release_store_lock(self) -> None:
+        """Release the write lock of the store."""
+        if self._store_lock is not None:
+            self._store_lock.close()
+            self._store_lock = None
+    
+    def close(self) -> None:
+        """Wait for a running compaction, then stop the writer thread, close the log and release the store."""
+        with self._compaction_lock:
+            self._writer.shutdown(wait=True)
+        self.wal.close()
+        self._release_store_lock()
+        if self.embedding_cache is not None:
+            self.embedding_cache.close()
+    
+    def _initialize_embedding_cache(self) -> Optional[EmbeddingCache]:
+        """Open the persistent embedding cache if it is enabled and the provider's embeddings are worth caching."""
+        if not self.settings.embedding_cache_enabled or not self.embedding_provider.cacheable:
+            return None
+        
+        cache_path = self.settings.embedding_cache_path or os.path.join(
+            self.vector_db_path, "embedding_cache.db"
+        )
+        return EmbeddingCache(
+            path=cache_path,
+            max_memory_items=self.settings.embedding_cache_memory_size
         )
-        return response.data[0].embedding
+    
+    def _get_embedding(self, text: str) -> np.ndarray:
+        """Get embedding for the given text, using the embedding cache when available."""
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get(self.embedding_model, text)
+            if cached is not None:
+                return cached
+        
+        embedding = self.embedding_provider.embed([text])[0]
+        
+        if self.embedding_cache is not None:
+            return self.embedding_cache.put(self.embedding_model, text, embedding)
+        return embedding
+    
+    def _get_embeddings(self, texts: List[str]) -> np.ndarray:
+        """
+        Get embeddings for several texts with a single call to the embedding provider.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            Matrix of embeddings with one row per text
+        """
+        embeddings: List[Optional[np.ndarray]] = [None] * len(texts)
+        if self.embedding_cache is not None:
+            embeddings = self.embedding_cache.get_many(self.embedding_model, texts)
+        
+        # Embed each distinct missing text once
+        missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+        if missing:
+            fetched = list(self.embedding_provider.embed(missing))
+            if self.embedding_cache is not None:
+                fetched = self.embedding_cache.put_many(self.embedding_model, missing, fetched)
+            by_text = dict(zip(missing, fetched))
+            embeddings = [by_text[text] if embedding is None else embedding
+                          for text, embedding in zip(texts, embeddings)]
+        
+        return np.array(embeddings, dtype=np.float32)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return vector store size and embedding cache statistics."""
+        self._follow()
+        view = self._view
+        return {
+            "documents": view.document_count,
+            "deleted": len(view.tombstones),
+            "next_id": self.next_id,
+            "vectors": view.ntotal,
+            "delta_vectors": len(view.delta),
+            "lexical_documents": len(view.lexical_index),
+            "lexical_delta_terms": len(view.lexical_index.delta_postings),
+            "filter_fields": view.metadata_index.fields,
+            "index_type": index_type_of(view.index),
+            "compression": compression_of(view.index),
+            "index_settings": self.index_settings,
+            "compaction_running": self._compaction_thread is not None and self._compaction_thread.is_alive(),
+            "read_only": self.read_only,
+            "snapshot_seq": self.snapshot_seq,
+            "wal_seq": self.wal.last_seq,
+            "logged_since_snapshot": self._logged_since_snapshot,
+            "embedding_model": self.embedding_model,
+            "embedding_dimension": self.embedding_provider.dimension,
+            "generation": view.generation,
+            "sequence": view.sequence,
+            "embedding_cache": self.embedding_cache.stats() if self.embedding_cache is not None else None,
+            "retrieval_cache": self.retrieval_cache.stats() if self.retrieval_cache is not None else None
+        }
     
     def add_document(self, content: str, metadata: Optional[Dict[str, Any]] = None) -> int:
         """
@@ -78,73 +937,558 @@ class RAGService:
         Returns:
             Document ID
         """
+        self._check_writable()
         # Get embedding
         embedding = self._get_embedding(content)
-        
-        # Add to index
         embedding_np = np.array([embedding], dtype=np.float32)
-        self.index.add(embedding_np)
-        
-        # Add to documents
-        doc_id = len(self.documents)
-        self.documents.append({
-            "id": doc_id,
-            "content": content,
-            "metadata": metadata or {}
-        })
         
-        # Save updates
-        faiss.write_index(self.index, os.path.join(self.vector_db_path, "index.faiss"))
-        with open(os.path.join(self.vector_db_path, "documents.pkl"), 'wb') as f:
-            pickle.dump(self.documents, f)
+        # Log the new document and vector, then add them to the index
+        def add():
+            doc_id = self.next_id
+            self._log_and_apply({
+                "op": "add",
+                "documents": [{
+                    "id": doc_id,
+                    "content": content,
+                    "metadata": metadata or {}
+                }],
+                "vectors": embedding_np
+            })
+            return doc_id
+        doc_id = self._write(add)
+        self._maybe_compact()
         
         logger.info(f"Added document with ID {doc_id}")
         return doc_id
     
-    def retrieve(self, query: str, top_k: int = 5) -> str:
+    def add_code(
+        self,
+        content: str,
+        language: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> List[int]:
         """
-        Retrieve relevant context for the query.
+        Add a code document split into function- and class-level chunks.
+        
+        Args:
+            content: Source code
+            language: Programming language of the code
+            metadata: Optional metadata copied onto every chunk
+            
+        Returns:
+            Document IDs of the chunks
+        """
+        documents = chunk_document(
+            content,
+            language=language,
+            metadata=metadata,
+            max_tokens=self.settings.ingest_chunk_tokens,
+            max_lines=self.settings.ingest_chunk_lines
+        )
+        return self.add_documents(documents)
+    
+    def add_documents(
+        self,
+        documents: Iterable[Union[str, Dict[str, Any]]],
+        batch_size: Optional[int] = None,
+        checkpoint_interval: Optional[int] = None
+    ) -> List[int]:
+        """
+        Add many documents to the vector store.
+        
+        Documents are embedded in batches with one embeddings request per batch
+        and each batch is logged and added to the index as a single matrix. A
+        snapshot is written every checkpoint_interval documents if given.
+        
+        Args:
+            documents: Document contents, or dicts with "content" and optional "metadata"
+            batch_size: Number of texts per embeddings request
+            checkpoint_interval: Compact into a snapshot after at least this many new documents
+            
+        Returns:
+            Document IDs in input order
+        """
+        self._check_writable()
+        batch_size = batch_size or self.settings.embedding_batch_size
+        doc_ids: List[int] = []
+        since_checkpoint = 0
+        batch: List[Dict[str, Any]] = []
+        
+        def flush_batch():
+            embeddings = self._get_embeddings([doc["content"] for doc in batch])
+            
+            def add():
+                first_id = self.next_id
+                records = [{
+                    "id": first_id + offset,
+                    "content": doc["content"],
+                    "metadata": doc.get("metadata") or {}
+                } for offset, doc in enumerate(batch)]
+                self._log_and_apply({"op": "add", "documents": records, "vectors": embeddings})
+                return records
+            records = self._write(add)
+            doc_ids.extend(record["id"] for record in records)
+            batch.clear()
+        
+        for document in documents:
+            batch.append({"content": document} if isinstance(document, str) else document)
+            if len(batch) >= batch_size:
+                since_checkpoint += len(batch)
+                flush_batch()
+                if checkpoint_interval and since_checkpoint >= checkpoint_interval:
+                    self.compact()
+                    since_checkpoint = 0
+                    logger.info(f"Checkpointed vector store at {self.ntotal} documents")
+        
+        if batch:
+            flush_batch()
+        self._maybe_compact()
+        
+        logger.info(f"Added {len(doc_ids)} documents in batches of {batch_size}")
+        return doc_ids
+    
+    def _live_position(self, doc_id: int) -> Optional[int]:
+        """Return the writer's position of a document by ID, or None if it does not exist or was deleted."""
+        position = self.documents.position_of(doc_id)
+        return None if position is None or position in self.tombstones else position
+    
+    def get_document(self, doc_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Look up a live document by its ID.
+        
+        Args:
+            doc_id: Document ID
+            
+        Returns:
+            The document with its "id", "content" and "metadata", or None if it does not exist or was deleted
+        """
+        self._follow()
+        view = self._view
+        position = view.position_of(int(doc_id))
+        return view.documents[position] if position is not None else None
+    
+    def update_document(self, doc_id: int, content: str, metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Replace the content and metadata of a document, keeping its ID.
+        
+        The new version is embedded and appended like a new document, and the
+        old version is tombstoned in the same logged mutation.
         
         Args:
+            doc_id: ID of the document to update
+            content: New document content
+            metadata: New metadata, replacing the old metadata
+            
+        Returns:
+            True if the document was updated, False if it does not exist or was deleted
+        """
+        self._check_writable()
+        doc_id = int(doc_id)
+        if self._view.position_of(doc_id) is None:
+            return False
+        embedding_np = np.array([self._get_embedding(content)], dtype=np.float32)
+        
+        def update():
+            # The document may have been deleted while it was being embedded
+            if self._live_position(doc_id) is None:
+                return False
+            self._log_and_apply({
+                "op": "add",
+                "documents": [{
+                    "id": doc_id,
+                    "content": content,
+                    "metadata": metadata or {}
+                }],
+                "vectors": embedding_np
+            })
+            return True
+        if not self._write(update):
+            return False
+        self._maybe_compact()
+        
+        logger.info(f"Updated document with ID {doc_id}")
+        return True
+    
+    def delete_document(self, doc_id: int) -> bool:
+        """
+        Delete a document from the vector store.
+        
+        Args:
+            doc_id: ID of the document to delete
+            
+        Returns:
+            True if the document was deleted, False if it does not exist or was already deleted
+        """
+        return self.delete_documents([doc_id]) == 1
+    
+    def delete_documents(self, doc_ids: Iterable[int]) -> int:
+        """
+        Delete documents from the vector store.
+        
+        Deleted documents are recorded as tombstones and skipped by retrieval;
+        their rows are dropped by the next compaction once enough of them
+        pile up. IDs of other documents never change.
+        
+        Args:
+            doc_ids: IDs of the documents to delete
+            
+        Returns:
+            Number of documents deleted
+        """
+        self._check_writable()
+        doc_ids = [int(doc_id) for doc_id in doc_ids]
+        
+        def delete():
+            ids = sorted({doc_id for doc_id in doc_ids if self._live_position(doc_id) is not None})
+            if ids:
+                self._log_and_apply({"op": "delete", "ids": ids})
+            return ids
+        ids = self._write(delete)
+        
+        if ids:
+            logger.info(f"Deleted {len(ids)} documents")
+            self._maybe_compact()
+        return len(ids)
+    
+    @staticmethod
+    def _describe_source(document: Dict[str, Any]) -> str:
+        """Describe where a chunk comes from, e.g. " (rag.py:10-20, RAGService.retrieve)"."""
+        metadata = document.get("metadata") or {}
+        parts = []
+        if metadata.get("path"):
+            location = metadata["path"]
+            if metadata.get("start_line"):
+                location += f":{metadata['start_line']}-{metadata['end_line']}"
+            parts.append(location)
+        if metadata.get("symbol"):
+            parts.append(metadata["symbol"])
+        return f" ({', '.join(parts)})" if parts else ""
+    
+    def _vectors_at(self, view: StoreView, positions: Union[List[int], np.ndarray]) -> Optional[np.ndarray]:
+        """
+        Fetch the stored vectors of documents without re-embedding them.
+        
+        Returns:
+            Matrix with one row per position, or None if the index cannot reconstruct them
+        """
+        index, base_vectors = view.index, view.base_vectors
+        positions = np.asarray(positions, dtype=np.int64)
+        vectors = np.empty((len(positions), index.d), dtype=np.float32)
+        in_base = positions < index.ntotal
+        try:
+            if in_base.any():
+                if base_vectors is not None and len(base_vectors) >= index.ntotal:
+                    vectors[in_base] = base_vectors[positions[in_base]]
+                else:
+                    vectors[in_base] = index.reconstruct_batch(positions[in_base])
+            if not in_base.all():
+                vectors[~in_base] = view.delta[positions[~in_base] - index.ntotal]
+        except RuntimeError as e:
+            logger.warning(f"Could not reconstruct candidate vectors: {str(e)}")
+            return None
+        return vectors
+    
+    def _rank(
+        self,
+        view: StoreView,
+        query: str,
+        candidates: int,
+        mode: str,
+        allowed: Optional[np.ndarray] = None
+    ) -> Tuple[List[int], np.ndarray]:
+        """
+        Find candidate documents for a query with their relevance.
+        
+        Lexical ranking uses the BM25 index only and needs no embedding call.
+        Hybrid ranking fuses the vector and lexical candidate lists with
+        reciprocal rank fusion, and falls back to lexical ranking when the
+        query embedding cannot be obtained.
+        
+        Args:
+            view: Store view to search
             query: Query string
-            top_k: Number of top results to return
+            candidates: Number of candidates to return
+            mode: One of "hybrid", "vector" or "lexical"
+            allowed: Sorted positions of the live documents matching a filter, or None for all
             
         Returns:
-            Concatenated relevant context
+            Tuple of (document positions best first, relevance scores scaled to [0, 1])
         """
-        # If index is empty, return empty string
-        if self.index.ntotal == 0:
-            logger.info("Index is empty, returning empty context")
-            return ""
+        def scaled(scores: List[float]) -> np.ndarray:
+            scores = np.asarray(scores, dtype=np.float32)
+            top = scores.max() if len(scores) else 0.0
+            return scores / top if top > 0 else np.ones_like(scores)
         
-        # Get query embedding
-        query_embedding = self._get_embedding(query)
+        def lexical_ranking() -> Tuple[List[int], np.ndarray]:
+            results = view.lexical_index.search(query, candidates, exclude=view.tombstones, include=allowed,
+                                                limit=view.document_count)
+            return [doc_id for doc_id, _ in results], scaled([score for _, score in results])
+        
+        if mode == "lexical":
+            return lexical_ranking()
+        
+        try:
+            query_embedding = self._get_embedding(query)
+        except Exception as e:
+            if mode == "vector":
+                raise
+            logger.warning(f"Query embedding failed, falling back to lexical retrieval: {str(e)}")
+            return lexical_ranking()
         query_embedding_np = np.array([query_embedding], dtype=np.float32)
         
-        # Search the index
-        top_k = min(top_k, self.index.ntotal)
-        distances, indices = self.index.search(query_embedding_np, top_k)
+        if mode == "vector":
+            _, positions = self._search(view, query_embedding_np, min(candidates, view.ntotal), allowed)
+            vectors = self._vectors_at(view, positions)
+            if vectors is None:
+                return positions, scaled(list(range(len(positions), 0, -1)))
+            # Cosine similarity, on the same scale as the redundancy term of MMR
+            query_unit = query_embedding_np[0] / max(np.linalg.norm(query_embedding_np[0]), 1e-12)
+            norms = np.maximum(np.linalg.norm(vectors, axis=1), 1e-12)
+            return positions, (vectors @ query_unit) / norms
+        
+        fetch_k = max(candidates, self.settings.rag_hybrid_candidates)
+        _, vector_positions = self._search(view, query_embedding_np, min(fetch_k, view.ntotal), allowed)
+        lexical_positions = [doc_id for doc_id, _ in view.lexical_index.search(
+            query, fetch_k, exclude=view.tombstones, include=allowed, limit=view.document_count
+        )]
+        rankings = [vector_positions, lexical_positions]
+        positions = fuse_rankings(rankings, k=self.settings.rag_rrf_k)[:candidates]
+        rank_of = [{doc_id: rank for rank, doc_id in enumerate(ranking)} for ranking in rankings]
+        fused_scores = [sum(1.0 / (self.settings.rag_rrf_k + ranks[doc_id] + 1)
+                            for ranks in rank_of if doc_id in ranks) for doc_id in positions]
+        return positions, scaled(fused_scores)
+    
+    def _diversify(self, view: StoreView, positions: List[int], relevance: np.ndarray) -> List[int]:
+        """
+        Reorder candidates with maximal marginal relevance.
         
-        # Get the documents
-        retrieved_docs = [self.documents[int(idx)] for idx in indices[0]]
+        Each pick maximizes lambda * relevance - (1 - lambda) * the highest
+        cosine similarity to an already picked document, using the vectors
+        already stored in the index.
+        
+        Args:
+            view: Store view holding the candidates
+            positions: Candidate document positions
+            relevance: Relevance of each candidate, scaled to [0, 1]
+            
+        Returns:
+            Candidate positions in selection order
+        """
+        mmr_lambda = self.settings.rag_mmr_lambda
+        if len(positions) < 3 or mmr_lambda >= 1.0:
+            return list(positions)
+        vectors = self._vectors_at(view, positions)
+        if vectors is None:
+            return list(positions)
+        
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+        similarity = vectors @ vectors.T
+        
+        selected = [int(np.argmax(relevance))]
+        redundancy = similarity[selected[0]].copy()
+        remaining = np.ones(len(positions), dtype=bool)
+        remaining[selected[0]] = False
+        while remaining.any():
+            scores = mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+            scores[~remaining] = -np.inf
+            pick = int(np.argmax(scores))
+            selected.append(pick)
+            remaining[pick] = False
+            redundancy = np.maximum(redundancy, similarity[pick])
+        return [positions[index] for index in selected]
+    
+    def _allocate_budget(self, sizes: List[int], overhead: List[int], max_tokens: int) -> List[int]:
+        """
+        Split a token budget between documents so that no single document crowds out the rest.
+        
+        Documents smaller than an equal share keep their full size and leave the
+        rest of their share to the larger ones; no document gets more than the
+        per-document cap.
+        
+        Args:
+            sizes: Content tokens of each document
+            overhead: Header and separator tokens of each document
+            max_tokens: Total token budget
+            
+        Returns:
+            Content tokens allowed for each document, in input order
+        """
+        document_cap = self.settings.rag_context_max_document_tokens
+        allowances = [0] * len(sizes)
+        remaining = max_tokens - sum(overhead)
+        order = sorted(range(len(sizes)), key=lambda index: sizes[index])
+        for rank, index in enumerate(order):
+            share = max(remaining, 0) // (len(order) - rank)
+            allowances[index] = min(sizes[index], share, document_cap)
+            remaining -= allowances[index]
+        return allowances
+    
+    def _assemble_context(
+        self,
+        view: StoreView,
+        query: str,
+        top_k: int,
+        mode: str,
+        max_tokens: int,
+        filters: Optional[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Search, diversify and pack the documents of a context, as described in retrieve_context.
+        
+        Returns:
+            The retrieve_context result, or None if no document matches the filter
+        """
+        # Restrict the search to the live documents of the filter's partitions
+        allowed = None
+        if filters:
+            allowed = view.metadata_index.matching(filters, limit=view.document_count)
+            if view.tombstones:
+                allowed = np.setdiff1d(allowed, np.fromiter(view.tombstones, dtype=np.int64), assume_unique=True)
+            if len(allowed) == 0:
+                logger.info(f"No documents match filter {filters}, returning empty context")
+                return None
+        
+        # Search the indexes and pick a diverse subset of the candidates
+        candidates = max(top_k, self.settings.rag_mmr_candidates)
+        positions, relevance = self._rank(view, query, candidates, mode, allowed)
+        
+        # Decode the picks in order, skipping exact duplicates that would add nothing to the prompt
+        picked, documents = [], []
+        seen_contents = set()
+        for position in self._diversify(view, positions, relevance):
+            document = view.documents[position]
+            if document["content"] in seen_contents:
+                continue
+            seen_contents.add(document["content"])
+            picked.append(position)
+            documents.append(document)
+            if len(picked) == top_k:
+                break
+        positions = picked
+        
+        # Share the budget between the picked documents
+        headers = [f"Document {number}{self._describe_source(document)}:\n"
+                   for number, document in enumerate(documents, 1)]
+        sizes = [count_tokens(document["content"]) for document in documents]
+        overhead = [count_tokens(header) + SEPARATOR_TOKENS for header in headers]
+        allowances = self._allocate_budget(sizes, overhead, max_tokens)
+        
+        entries, included = [], []
+        truncated = 0
+        for position, document, size, allowance in zip(positions, documents, sizes, allowances):
+            if allowance < min(MIN_EXCERPT_TOKENS, size):
+                continue
+            content = truncate_to_tokens(document["content"], allowance)
+            if content != document["content"]:
+                content += "\n..."
+                truncated += 1
+            # Number the entries that made it in consecutively
+            entries.append(f"Document {len(entries) + 1}{self._describe_source(document)}:\n{content}")
+            included.append(document["id"])
         
         # Format the context
-        context = "\n\n".join([f"Document {i+1}:\n{doc['content']}" 
-                              for i, doc in enumerate(retrieved_docs)])
+        context = "\n\n".join(entries)
+        return {
+            "context": context,
+            "documents": included,
+            "tokens_used": count_tokens(context),
+            "token_budget": max_tokens,
+            "truncated": truncated
+        }
+    
+    def retrieve_context(
+        self,
+        query: str,
+        top_k: int = 5,
+        mode: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Retrieve a diverse set of documents that fits a token budget.
+        
+        Candidates are re-ranked with maximal marginal relevance, the top_k
+        picks share the token budget, and documents larger than their share
+        are cut to an excerpt of it. The whole query runs against the view
+        published when it starts, without taking any lock.
+        
+        Args:
+            query: Query string
+            top_k: Maximum number of documents to include
+            mode: Retrieval mode from RETRIEVAL_MODES, defaults to the configured mode
+            max_tokens: Token budget of the context, defaults to RAG_CONTEXT_MAX_TOKENS
+            filters: Metadata filter such as {"language": "python"}; a list of values
+                matches any of them and None matches documents without the field
+            
+        Returns:
+            Dict with the formatted "context", the IDs of the included "documents",
+            "tokens_used", "token_budget" and the number of "truncated" documents
+        """
+        mode = (mode or self.settings.rag_retrieval_mode).lower()
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {RETRIEVAL_MODES}")
+        if mode == "auto":
+            mode = "lexical" if is_identifier_query(query) else "hybrid"
+        max_tokens = max_tokens or self.settings.rag_context_max_tokens
+        empty = {"context": "", "documents": [], "tokens_used": 0, "token_budget": max_tokens, "truncated": 0}
+        
+        # If index is empty, return empty string
+        self._follow()
+        view = self._view
+        if view.ntotal == 0:
+            logger.info("Index is empty, returning empty context")
+            return empty
+        
+        # Serve repeated queries against an unchanged store from the cache
+        cache_key = (" ".join(query.split()), top_k, mode, max_tokens, filter_key(filters), view.generation)
+        if self.retrieval_cache is not None:
+            cached = self.retrieval_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Retrieval cache hit for query: {query[:50]}...")
+                return cached
+        
+        result = self._assemble_context(view, query, top_k, mode, max_tokens, filters)
+        if result is None:
+            return empty
+        
+        if self.retrieval_cache is not None:
+            self.retrieval_cache.put(cache_key, result)
+        
+        logger.info(f"Retrieved {len(result['documents'])} documents ({mode}, {result['tokens_used']}/{max_tokens} tokens) "
+                    f"for query: {query[:50]}...")
+        return result
+    
+    def retrieve(
+        self,
+        query: str,
+        top_k: int = 5,
+        mode: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Retrieve relevant context for the query.
         
-        logger.info(f"Retrieved {len(retrieved_docs)} documents for query: {query[:50]}...")
-        return context
+        Args:
+            query: Query string
+            top_k: Number of top results to return
+            mode: Retrieval mode from RETRIEVAL_MODES, defaults to the configured mode
+            max_tokens: Token budget of the context, defaults to RAG_CONTEXT_MAX_TOKENS
+            filters: Metadata filter such as {"language": "python"} or {"tags": ["api", "web"]}
+            
+        Returns:
+            Concatenated relevant context
+        """
+        return self.retrieve_context(
+            query, top_k=top_k, mode=mode, max_tokens=max_tokens, filters=filters
+        )["context"]
     
     def clear(self) -> None:
         """Clear the vector store."""
-        # Create a new index
-        dimension = 1536
-        self.index = faiss.IndexFlatL2(dimension)
-        self.documents = []
-        
-        # Save the empty index and documents
-        faiss.write_index(self.index, os.path.join(self.vector_db_path, "index.faiss"))
-        with open(os.path.join(self.vector_db_path, "documents.pkl"), 'wb') as f:
-            pickle.dump(self.documents, f)
+        self._check_writable()
+        with self._compaction_lock:
+            self._write(lambda: self._log_and_apply({"op": "clear"}))
+        self.compact()
         
-        logger.info("Cleared vector store")
\ No newline at end of file
+        logger.info("Cleared vector store")
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from backend.utils.cache import LRUCache
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def normalize_messages(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    Normalize chat messages for cache keys.
+
+    Trailing whitespace of each line and blank lines around the content are
+    dropped, since the prompts are built from indented templates; leading
+    indentation is kept because it is significant in code.
+
+    Args:
+        messages: Chat messages
+
+    Returns:
+        Messages with normalized content
+    """
+    normalized = []
+    for message in messages:
+        content = "\n".join(line.rstrip() for line in str(message.get("content", "")).splitlines())
+        normalized.append({"role": message.get("role", ""), "content": content.strip("\n")})
+    return normalized
+
+class ResponseCache:
+    """Persistent exact-match cache for chat completions.
+
+    Responses are keyed by a hash of (model, normalized messages,
+    temperature, max_tokens) and stored in a SQLite database, so repeated
+    requests are answered across restarts and worker processes. Entries
+    expire after the TTL, and once the stored responses exceed the size cap
+    the least recently used ones are deleted. A bounded in-memory LRU sits in
+    front of the database.
+    """
+
+    def __init__(self, path: str, ttl: float = 86400, max_bytes: int = 256 * 1024 * 1024,
+                 max_memory_items: int = 1000):
+        """
+        Initialize the response cache.
+
+        Args:
+            path: Path to the SQLite database file
+            ttl: Seconds a response stays valid after it is stored, 0 to keep it until evicted
+            max_bytes: Maximum total size of the stored responses
+            max_memory_items: Maximum number of responses kept in memory
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory = LRUCache(max_size=max_memory_items)
+        self.disk_hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+        logger.info(f"LLM response cache opened at {path}")
+
+    @staticmethod
+    def make_key(
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        response_format: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Build the key of a chat completion request."""
+        request = {
+            "model": model,
+            "messages": normalize_messages(messages),
+            "temperature": round(float(temperature), 4),
+            "max_tokens": int(max_tokens)
+        }
+        if response_format is not None:
+            request["response_format"] = response_format
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a response.
+
+        Args:
+            key: Request key from make_key
+
+        Returns:
+            Cached response, or None on a miss
+        """
+        # The memory tier drops expired entries itself, counting them as misses
+        response = self.memory.get(key)
+        if response is not None:
+            return response
+
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, size, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self._expired(row[2], now):
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self._size -= row[1]
+                self.expirations += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.disk_hits += 1
+
+        self._remember(key, row[0], row[2], now)
+        return row[0]
+
+    def put(self, key: str, model: str, response: str) -> None:
+        """
+        Store a response, evicting the least recently used ones beyond the size cap.
+
+        Args:
+            key: Request key from make_key
+            model: Model that generated the response
+            response: Response content
+        """
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now)
+            )
+            self._size += size - (row[0] if row else 0)
+            if self._size > self.max_bytes:
+                self._evict(now)
+            self._conn.commit()
+
+        self._remember(key, response, now, now)
+
+    def _remember(self, key: str, response: str, created_at: float, now: float) -> None:
+        """Keep a response in the memory tier until the time it expires on disk."""
+        self.memory.put(key, response, ttl=created_at + self.ttl - now if self.ttl else None)
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        """Check whether a response stored at created_at has outlived the TTL."""
+        return bool(self.ttl) and created_at + self.ttl <= now
+
+    def _evict(self, now: float) -> None:
+        """Delete expired responses, then the least recently used ones until the cache fits its cap."""
+        # Other processes sharing the database also add responses
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if self.ttl:
+            expired = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE created_at <= ?", (now - self.ttl,)
+            ).fetchone()
+            self._conn.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.ttl,))
+            self._size -= expired[1]
+            self.expirations += expired[0]
+        # Memory hits do not touch accessed_at, so responses held in memory count as recently used
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        rows.sort(key=lambda row: row[0] in self.memory)
+        for key, size in rows:
+            if self._size <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._size -= size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all responses."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._size = 0
+        self.memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the size of the cache and hit/miss counters for the memory and disk tiers."""
+        memory_stats = self.memory.stats()
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            size = self._size
+            disk_hits = self.disk_hits
+            misses = self.misses
+        hits = memory_stats["hits"] + disk_hits
+        lookups = hits + misses
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "memory_hits": memory_stats["hits"],
+            "disk_hits": disk_hits,
+            "misses": misses,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,288 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import faiss
+import numpy as np
+
+from backend.services.embeddings import EmbeddingProvider
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Nearest earlier prompts checked per lookup, so a stale or expired nearest one does not hide a usable one
+LOOKUP_CANDIDATES = 8
+
+class SemanticCache:
+    """Cache of pipeline results looked up by the meaning of the prompt.
+
+    Prompts are embedded and searched by cosine similarity in a FAISS index
+    of earlier prompts; a result is reused when the closest prompt is at
+    least as similar as the threshold. Entries are partitioned by scope, a
+    key of the request options that change the result (language, stage
+    flags, model), with one index per scope, so a prompt only matches
+    results produced with the same options. Each entry is also tagged with
+    the version of the knowledge base it was generated against, and is not
+    reused once the version moved on. Entries live in a SQLite
+    database that the indexes are rebuilt from at startup; entries of
+    another embedding model are dropped then, since their vectors are not
+    comparable. Entries expire after the TTL, and beyond the maximum number
+    of entries the least recently used ones are evicted.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        embedding_provider: EmbeddingProvider,
+        threshold: float = 0.95,
+        max_entries: int = 10000,
+        ttl: float = 86400
+    ):
+        """
+        Initialize the semantic cache.
+
+        Args:
+            path: Path to the SQLite database file
+            embedding_provider: Provider of the prompt embeddings
+            threshold: Minimum cosine similarity of a prompt to reuse its result
+            max_entries: Maximum number of cached results
+            ttl: Seconds a result stays valid after it is stored, 0 to keep it until evicted
+        """
+        self.path = path
+        self.embedding_provider = embedding_provider
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._indexes: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS prompts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                scope TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                result TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                version TEXT NOT NULL DEFAULT ''
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(prompts)")}
+        if "version" not in columns:
+            # Entries of earlier databases have no version and are never reused
+            self._conn.execute("ALTER TABLE prompts ADD COLUMN version TEXT NOT NULL DEFAULT ''")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS prompts_accessed_at ON prompts (accessed_at)")
+        self._load()
+
+        logger.info(f"Semantic prompt cache opened at {path} with {self._count()} entries")
+
+    def _load(self) -> None:
+        """Drop stale entries and build the index of each scope."""
+        self._conn.execute("DELETE FROM prompts WHERE model != ?", (self.embedding_provider.name,))
+        if self.ttl:
+            self._conn.execute("DELETE FROM prompts WHERE created_at <= ?", (time.time() - self.ttl,))
+        self._conn.commit()
+        for entry_id, scope, vector in self._conn.execute("SELECT id, scope, vector FROM prompts"):
+            self._index(scope).add_with_ids(
+                np.frombuffer(vector, dtype=np.float32).reshape(1, -1), np.array([entry_id], dtype=np.int64)
+            )
+
+    def _index(self, scope: str):
+        """Return the index of a scope, creating it if needed."""
+        index = self._indexes.get(scope)
+        if index is None:
+            index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.embedding_provider.dimension))
+            self._indexes[scope] = index
+        return index
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0]
+
+    def _remove(self, entry_ids: Dict[int, str]) -> None:
+        """Delete entries, given as a mapping of ID to scope, from the database and the indexes."""
+        if not entry_ids:
+            return
+        self._conn.executemany("DELETE FROM prompts WHERE id = ?", [(entry_id,) for entry_id in entry_ids])
+        by_scope: Dict[str, list] = {}
+        for entry_id, scope in entry_ids.items():
+            by_scope.setdefault(scope, []).append(entry_id)
+        for scope, ids in by_scope.items():
+            index = self._indexes.get(scope)
+            if index is not None:
+                index.remove_ids(np.array(ids, dtype=np.int64))
+
+    def embed(self, prompt: str) -> np.ndarray:
+        """Embed a prompt as a unit vector."""
+        vector = np.array(self.embedding_provider.embed([prompt.strip()]), dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def lookup(self, vector: np.ndarray, scope: str, version: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Find the result of the most similar earlier prompt that is still valid.
+
+        The nearest earlier prompts above the threshold are checked in order;
+        those that expired or were generated against another version of the
+        knowledge base are removed on the way.
+
+        Args:
+            vector: Prompt embedding from embed
+            scope: Key of the request options
+            version: Current version of the knowledge base
+
+        Returns:
+            The cached result, the earlier prompt and its similarity, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            index = self._indexes.get(scope)
+            if index is None or index.ntotal == 0:
+                self.misses += 1
+                return None
+            similarities, ids = index.search(vector, min(LOOKUP_CANDIDATES, index.ntotal))
+            stale: Dict[int, str] = {}
+            found = None
+            for similarity, entry_id in zip(similarities[0].tolist(), ids[0].tolist()):
+                if entry_id < 0 or similarity < self.threshold:
+                    break
+                row = self._conn.execute(
+                    "SELECT prompt, result, created_at, version FROM prompts WHERE id = ?", (entry_id,)
+                ).fetchone()
+                if row is None:
+                    stale[entry_id] = scope
+                elif self.ttl and row[2] + self.ttl <= now:
+                    stale[entry_id] = scope
+                    self.expirations += 1
+                elif row[3] != version:
+                    stale[entry_id] = scope
+                    self.invalidations += 1
+                else:
+                    found = (similarity, entry_id, row)
+                    break
+            self._remove(stale)
+            if found is None:
+                self._conn.commit()
+                self.misses += 1
+                return None
+            similarity, entry_id, row = found
+            self._conn.execute(
+                "UPDATE prompts SET accessed_at = ?, hits = hits + 1 WHERE id = ?", (now, entry_id)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return {"result": json.loads(row[1]), "prompt": row[0], "similarity": similarity}
+
+    def store(self, prompt: str, vector: np.ndarray, scope: str, result: Dict[str, Any], version: str = "") -> None:
+        """
+        Store the result of a prompt, evicting the least recently used results beyond the maximum.
+
+        Args:
+            prompt: Prompt
+            vector: Prompt embedding from embed
+            scope: Key of the request options
+            result: Pipeline result, serializable to JSON
+            version: Version of the knowledge base the result was generated against
+        """
+        now = time.time()
+        vector = np.ascontiguousarray(vector, dtype=np.float32).reshape(1, -1)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO prompts (scope, model, prompt, result, vector, created_at, accessed_at, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (scope, self.embedding_provider.name, prompt, json.dumps(result), vector.tobytes(), now, now, version)
+            )
+            self._index(scope).add_with_ids(vector, np.array([cursor.lastrowid], dtype=np.int64))
+            excess = self._count() - self.max_entries
+            if excess > 0:
+                evicted = dict(self._conn.execute(
+                    "SELECT id, scope FROM prompts ORDER BY accessed_at LIMIT ?", (excess,)
+                ).fetchall())
+                self._remove(evicted)
+                self.evictions += len(evicted)
+            self._conn.commit()
+
+    def invalidate(self, scope: Optional[str] = None) -> int:
+        """
+        Remove cached results.
+
+        Args:
+            scope: Scope to clear, or None to clear every scope
+
+        Returns:
+            Number of removed results
+        """
+        with self._lock:
+            if scope is None:
+                removed = self._count()
+                self._conn.execute("DELETE FROM prompts")
+                self._indexes.clear()
+            else:
+                removed = self._conn.execute("DELETE FROM prompts WHERE scope = ?", (scope,)).rowcount
+                self._indexes.pop(scope, None)
+            self._conn.commit()
+        logger.info(f"Invalidated {removed} cached prompt results")
+        return removed
+
+    def invalidate_stale(self, version: str) -> int:
+        """
+        Remove the results generated against another version of the knowledge base.
+
+        Args:
+            version: Current version of the knowledge base
+
+        Returns:
+            Number of removed results
+        """
+        with self._lock:
+            stale = dict(self._conn.execute(
+                "SELECT id, scope FROM prompts WHERE version != ?", (version,)
+            ).fetchall())
+            self._remove(stale)
+            self._conn.commit()
+            self.invalidations += len(stale)
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached prompt results of an earlier knowledge base")
+        return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of entries and the hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "entries": self._count(),
+                "scopes": len(self._indexes),
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
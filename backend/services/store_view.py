@@ -0,0 +1,74 @@
+from typing import Any, FrozenSet, Optional
+
+import numpy as np
+
+from backend.services.document_store import DocumentTable
+from backend.services.lexical_index import LexicalIndex
+from backend.services.metadata_index import MetadataIndex
+
+class StoreView:
+    """Consistent, read-only state of the RAG store at one point in time.
+
+    The writer thread of RAGService publishes a new view after every
+    mutation by replacing a single reference, so readers take the current
+    view without a lock and keep using it for the whole query, even while
+    documents are added or a compaction swaps in a new snapshot. Documents
+    appended after the view was published are beyond document_count and
+    are ignored, including later versions of updated documents; the
+    structures shared with the writer only ever grow.
+    """
+
+    __slots__ = (
+        "index", "delta", "documents", "document_count", "tombstones",
+        "lexical_index", "metadata_index", "base_vectors", "generation", "sequence",
+    )
+
+    def __init__(
+        self,
+        index: Any,
+        delta: np.ndarray,
+        documents: DocumentTable,
+        tombstones: FrozenSet[int],
+        lexical_index: LexicalIndex,
+        metadata_index: MetadataIndex,
+        base_vectors: Optional[np.ndarray],
+        generation: int,
+        sequence: int = 0
+    ):
+        """
+        Initialize the view.
+
+        Args:
+            index: Memory-mapped index of the current snapshot
+            delta: Vectors added since the snapshot, one row per position after the snapshot's
+            documents: Document table, read up to the positions covered by the index and delta
+            tombstones: Positions of deleted documents
+            lexical_index: BM25 index of the documents
+            metadata_index: Metadata partitions of the documents
+            base_vectors: Raw vectors of a compressed or graph snapshot index, if kept
+            generation: Number of mutations applied when the view was published
+            sequence: Log sequence number of the last applied mutation, which unlike the
+                generation is kept across restarts
+        """
+        self.index = index
+        self.delta = delta
+        self.documents = documents
+        self.document_count = index.ntotal + len(delta)
+        self.tombstones = tombstones
+        self.lexical_index = lexical_index
+        self.metadata_index = metadata_index
+        self.base_vectors = base_vectors
+        self.generation = generation
+        self.sequence = sequence
+
+    @property
+    def ntotal(self) -> int:
+        """Total number of vectors in the snapshot index and the delta."""
+        return self.document_count
+
+    def position_of(self, doc_id: int) -> Optional[int]:
+        """Return the position of a live document by ID, or None if it does not exist or was deleted."""
+        position = self.documents.position_of(doc_id, limit=self.document_count)
+        if position is None or position >= self.document_count or position in self.tombstones:
+            return None
+        return position
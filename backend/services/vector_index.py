@@ -0,0 +1,254 @@
+import logging
+import math
+from typing import Any, Tuple
+
+import faiss
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# How the snapshot index stores vectors: raw float32, float16 or int8 scalar quantization, or product quantization
+COMPRESSIONS = ("none", "fp16", "int8", "pq")
+
+# Factory suffix of each scalar quantization
+SCALAR_QUANTIZERS = {"fp16": "SQfp16", "int8": "SQ8"}
+
+# Training points per centroid below which faiss k-means gets unreliable
+MIN_POINTS_PER_CENTROID = 39
+
+# Rows added to an index per call while building it
+ADD_CHUNK_SIZE = 65536
+
+def select_index_type(num_vectors: int, settings: Any) -> str:
+    """
+    Pick the index type for a store of the given size.
+
+    Stores start out on an exact flat index and are promoted to the
+    configured ANN index once they reach the promotion threshold.
+
+    Args:
+        num_vectors: Number of vectors the index will hold
+        settings: Application settings
+
+    Returns:
+        One of INDEX_TYPES
+    """
+    index_type = settings.rag_index_type.lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{settings.rag_index_type}', expected one of {INDEX_TYPES}")
+    if num_vectors == 0 or num_vectors < settings.rag_index_promotion_threshold:
+        return "flat"
+    if index_type == "ivf_flat" and select_compression(index_type, num_vectors, settings) == "pq":
+        # Inverted lists of PQ codes are what ivf_pq is
+        return "ivf_pq"
+    return index_type
+
+def select_compression(index_type: str, num_vectors: int, settings: Any) -> str:
+    """
+    Pick how an index of the given type and size stores its vectors.
+
+    Product quantization falls back to int8 scalar quantization for stores
+    too small to train its codebooks, and empty stores are not compressed.
+
+    Args:
+        index_type: One of INDEX_TYPES
+        num_vectors: Number of vectors the index will hold
+        settings: Application settings
+
+    Returns:
+        One of COMPRESSIONS
+    """
+    if index_type == "ivf_pq":
+        return "pq"
+    compression = settings.rag_vector_compression.lower()
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown vector compression '{settings.rag_vector_compression}', "
+                         f"expected one of {COMPRESSIONS}")
+    if num_vectors == 0:
+        # Quantizers cannot be trained without vectors
+        return "none"
+    if compression == "pq" and num_vectors < 16 * MIN_POINTS_PER_CENTROID:
+        return "int8"
+    return compression
+
+def index_type_of(index: faiss.Index) -> str:
+    """Return the INDEX_TYPES name of an existing index."""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, (faiss.IndexIVFFlat, faiss.IndexIVFScalarQuantizer)):
+        return "ivf_flat"
+    if isinstance(index, (faiss.IndexFlat, faiss.IndexScalarQuantizer, faiss.IndexPQ)):
+        return "flat"
+    return type(index).__name__
+
+def compression_of(index: faiss.Index) -> str:
+    """Return the COMPRESSIONS name of the vector storage of an existing index."""
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        qtypes = {faiss.ScalarQuantizer.QT_fp16: "fp16", faiss.ScalarQuantizer.QT_8bit: "int8"}
+        return qtypes.get(index.sq.qtype, "sq")
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    return "none"
+
+def _pq_string(dimension: int, num_vectors: int, settings: Any) -> str:
+    """Build the product quantizer part of a factory string."""
+    # Use the largest sub-quantizer count not above the setting that divides the dimension
+    pq_m = next(m for m in range(min(settings.rag_pq_m, dimension), 0, -1) if dimension % m == 0)
+    nbits = 8 if num_vectors >= 256 * MIN_POINTS_PER_CENTROID else 4
+    return f"PQ{pq_m}x{nbits}"
+
+def factory_string(index_type: str, dimension: int, num_vectors: int, settings: Any) -> str:
+    """
+    Build the faiss.index_factory description for an index type.
+
+    Args:
+        index_type: One of INDEX_TYPES
+        dimension: Vector dimension
+        num_vectors: Number of vectors the index will be trained on
+        settings: Application settings
+
+    Returns:
+        Index factory string
+    """
+    compression = select_compression(index_type, num_vectors, settings)
+    if compression == "pq":
+        storage = _pq_string(dimension, num_vectors, settings)
+    else:
+        storage = SCALAR_QUANTIZERS.get(compression, "Flat")
+
+    if index_type == "flat":
+        return storage
+    if index_type == "hnsw":
+        return f"HNSW{settings.rag_hnsw_m}" + ("" if storage == "Flat" else f",{storage}")
+
+    # Aim for about 4 * sqrt(n) lists while keeping at least 39 training points per list
+    nlist = settings.rag_ivf_nlist or int(4 * math.sqrt(num_vectors))
+    nlist = max(1, min(nlist, num_vectors // MIN_POINTS_PER_CENTROID))
+    return f"IVF{nlist},{storage}"
+
+def configure_search(index: faiss.Index, settings: Any) -> None:
+    """Apply the configured search-time parameters to an index."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = settings.rag_ivf_nprobe
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = settings.rag_hnsw_ef_search
+
+def build_index(index_type: str, vectors: np.ndarray, settings: Any) -> faiss.Index:
+    """
+    Create, train and fill an index of the given type.
+
+    Args:
+        index_type: One of INDEX_TYPES
+        vectors: Matrix of vectors to add (may be memory-mapped)
+        settings: Application settings
+
+    Returns:
+        The populated index
+    """
+    num_vectors, dimension = vectors.shape
+    description = factory_string(index_type, dimension, num_vectors, settings)
+    index = faiss.index_factory(dimension, description, faiss.METRIC_L2)
+
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efConstruction = settings.rag_hnsw_ef_construction
+
+    if not index.is_trained:
+        train_size = min(num_vectors, settings.rag_index_train_size)
+        sample = np.sort(np.random.default_rng(0).choice(num_vectors, size=train_size, replace=False))
+        logger.info(f"Training {description} index on {train_size} vectors")
+        index.train(np.ascontiguousarray(vectors[sample], dtype=np.float32))
+
+    for start in range(0, num_vectors, ADD_CHUNK_SIZE):
+        index.add(np.ascontiguousarray(vectors[start:start + ADD_CHUNK_SIZE], dtype=np.float32))
+
+    configure_search(index, settings)
+    logger.info(f"Built {description} index with {index.ntotal} vectors")
+    return index
+
+def search_parameters(index: faiss.Index, selector: faiss.IDSelector, settings: Any) -> faiss.SearchParameters:
+    """
+    Build search parameters that restrict a search to the IDs of a selector.
+
+    The configured nprobe and efSearch are carried over, since parameters
+    passed to a search replace the ones set on the index.
+
+    Args:
+        index: Index to be searched
+        selector: Selector of the IDs to search
+        settings: Application settings
+
+    Returns:
+        Search parameters of the type the index expects
+    """
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=settings.rag_hnsw_ef_search)
+    if faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=settings.rag_ivf_nprobe)
+    return faiss.SearchParameters(sel=selector)
+
+class VectorBuffer:
+    """Append-only float32 matrix that can be read while it grows.
+
+    Rows are written past the end of the published rows, and a full buffer
+    is replaced by a larger copy rather than resized in place, so a view
+    returned by rows() never changes even while appends continue. This lets
+    readers search the vectors added since the last snapshot without a lock.
+    """
+
+    def __init__(self, dimension: int, capacity: int = 1024):
+        """
+        Initialize the buffer.
+
+        Args:
+            dimension: Vector dimension
+            capacity: Number of rows allocated up front
+        """
+        self.dimension = dimension
+        self._data = np.empty((capacity, dimension), dtype=np.float32)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, vectors: np.ndarray) -> None:
+        """Append rows; only one thread may append at a time."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        size = self._size + len(vectors)
+        if size > len(self._data):
+            data = np.empty((max(size, 2 * len(self._data)), self.dimension), dtype=np.float32)
+            data[:self._size] = self._data[:self._size]
+            self._data = data
+        self._data[self._size:size] = vectors
+        self._size = size
+
+    def rows(self) -> np.ndarray:
+        """Return a read-only view of the rows appended so far."""
+        view = self._data[:self._size]
+        view.flags.writeable = False
+        return view
+
+def search_vectors(vectors: np.ndarray, query_np: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the nearest rows of a matrix to a query by exact L2 search.
+
+    Args:
+        vectors: Matrix of vectors to search
+        query_np: Query matrix with a single row
+        k: Number of results to return
+
+    Returns:
+        Tuple of (squared distances, row numbers), nearest first
+    """
+    k = min(k, len(vectors))
+    if k <= 0:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+    distances, indices = faiss.knn(query_np, np.ascontiguousarray(vectors), k)
+    return distances[0], indices[0]
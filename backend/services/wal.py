@@ -0,0 +1,285 @@
+import logging
+import os
+import pickle
+import struct
+import threading
+import zlib
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Frame header: payload length, CRC32 of the payload, sequence number
+FRAME_HEADER = struct.Struct("<IIQ")
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".log"
+# Lock file held by the process writing to a store
+LOCK_FILE = "LOCK"
+
+def fsync_directory(path: str) -> None:
+    """Flush directory entries (renames, new files) to disk where supported."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def lock_store(path: str) -> Optional[IO]:
+    """
+    Take the exclusive write lock of a store directory.
+
+    Each store has a single writer: a second process (or a second service
+    in the same process) appending to the log would reuse sequence numbers
+    and document IDs, and its compactions would delete the snapshots the
+    other one has mapped. The lock is released when the returned file is
+    closed, including when the process dies.
+
+    Args:
+        path: Store directory
+
+    Returns:
+        The open lock file, or None where file locks are not supported
+
+    Raises:
+        RuntimeError: If another writer holds the lock
+    """
+    lock_path = os.path.join(path, LOCK_FILE)
+    lock_file = open(lock_path, "a+")
+    if fcntl is None:
+        logger.warning(f"File locks are not supported here, {path} is not protected against concurrent writers")
+        lock_file.close()
+        return None
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.seek(0)
+        owner = lock_file.read().strip()
+        lock_file.close()
+        raise RuntimeError(
+            f"Vector store at {path} is already open for writing"
+            + (f" by process {owner}" if owner else "")
+            + "; stop the other process or use another vector store directory"
+        )
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    return lock_file
+
+class WriteAheadLog:
+    """Append-only segmented log of vector store mutations.
+
+    Each record is pickled into a frame carrying its length, a CRC32 checksum
+    and a monotonically increasing sequence number. Segments are named after
+    the first sequence number they contain, so whole segments can be dropped
+    once a snapshot covers them. A torn or corrupt tail left by a crash is
+    detected on replay and truncated away.
+    """
+
+    def __init__(self, directory: str, fsync: bool = False):
+        """
+        Open the log.
+
+        Args:
+            directory: Directory holding the segment files
+            fsync: Whether to fsync after every append (survives power loss, not just process crashes)
+        """
+        self.directory = directory
+        self.fsync = fsync
+        self.last_seq = 0
+        self.records_since_rotation = 0
+        self._lock = threading.Lock()
+        self._file = None
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _segment_path(self, first_seq: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{first_seq:016d}{SEGMENT_SUFFIX}")
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        """List segment files as (first sequence number, path), oldest first."""
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                first_seq = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+                segments.append((first_seq, os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    def replay(self, after_seq: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Read back all intact records and open the log for appending.
+
+        Args:
+            after_seq: Skip records with a sequence number at or below this value
+
+        Yields:
+            (sequence number, record) pairs in log order
+        """
+        self.last_seq = after_seq
+        segments = self._segments()
+
+        for position, (_, path) in enumerate(segments):
+            is_last = position == len(segments) - 1
+            good_offset = 0
+            with open(path, "rb") as f:
+                while True:
+                    header = f.read(FRAME_HEADER.size)
+                    if not header:
+                        break
+                    if len(header) < FRAME_HEADER.size:
+                        logger.warning(f"Torn frame header in {path} at offset {good_offset}")
+                        break
+                    length, checksum, seq = FRAME_HEADER.unpack(header)
+                    payload = f.read(length)
+                    if len(payload) < length or zlib.crc32(payload) != checksum:
+                        logger.warning(f"Torn or corrupt frame in {path} at offset {good_offset}")
+                        break
+                    good_offset = f.tell()
+                    if seq <= after_seq:
+                        continue
+                    self.last_seq = seq
+                    yield seq, pickle.loads(payload)
+
+            if good_offset < os.path.getsize(path):
+                if not is_last:
+                    # Records after a corrupt frame in an older segment cannot be trusted
+                    logger.error(f"Corrupt frame in non-final segment {path}, stopping replay")
+                    for _, later_path in segments[position + 1:]:
+                        os.rename(later_path, later_path + ".corrupt")
+                with open(path, "r+b") as f:
+                    f.truncate(good_offset)
+                logger.warning(f"Truncated {path} to {good_offset} bytes")
+                break
+
+        self._open_active_segment()
+
+    def tail(
+        self,
+        after_seq: int,
+        position: Optional[Tuple[int, int]] = None
+    ) -> Tuple[List[Tuple[int, Dict[str, Any]]], Optional[Tuple[int, int]]]:
+        """
+        Read the intact records another process appended, without modifying the log.
+
+        Reading stops at the first incomplete frame, which the writer may
+        still be appending, and resumes there on the next call.
+
+        Args:
+            after_seq: Skip records with a sequence number at or below this value
+            position: (first sequence number of a segment, offset) returned by the previous call
+
+        Returns:
+            Tuple of ((sequence number, record) pairs in log order, position to resume from)
+        """
+        records = []
+        start_seq, start_offset = position or (0, 0)
+        for first_seq, path in self._segments():
+            if first_seq < start_seq:
+                continue
+            offset = start_offset if first_seq == start_seq else 0
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                # Dropped by a compaction, whose snapshot covers it
+                break
+            with f:
+                f.seek(offset)
+                while True:
+                    header = f.read(FRAME_HEADER.size)
+                    if len(header) < FRAME_HEADER.size:
+                        break
+                    length, checksum, seq = FRAME_HEADER.unpack(header)
+                    payload = f.read(length)
+                    if len(payload) < length or zlib.crc32(payload) != checksum:
+                        break
+                    offset = f.tell()
+                    if seq > after_seq:
+                        records.append((seq, pickle.loads(payload)))
+                        after_seq = seq
+                complete = offset == os.fstat(f.fileno()).st_size
+            position = (first_seq, offset)
+            if not complete:
+                break
+        self.last_seq = max(self.last_seq, after_seq)
+        return records, position
+
+    def _open_active_segment(self) -> None:
+        """Open the newest segment for appending, creating one if needed."""
+        if self._file is not None:
+            self._file.close()
+        segments = self._segments()
+        if segments:
+            path = segments[-1][1]
+        else:
+            path = self._segment_path(self.last_seq + 1)
+        self._file = open(path, "ab")
+        fsync_directory(self.directory)
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """
+        Append a record to the log.
+
+        Args:
+            record: Picklable mutation record
+
+        Returns:
+            Sequence number assigned to the record
+        """
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            seq = self.last_seq + 1
+            self._file.write(FRAME_HEADER.pack(len(payload), zlib.crc32(payload), seq))
+            self._file.write(payload)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.last_seq = seq
+            self.records_since_rotation += 1
+        return seq
+
+    def rotate(self) -> int:
+        """
+        Start a new segment so older segments can be dropped after a snapshot.
+
+        Returns:
+            Sequence number of the last record in the closed segments
+        """
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = open(self._segment_path(self.last_seq + 1), "ab")
+            self.records_since_rotation = 0
+            fsync_directory(self.directory)
+            return self.last_seq
+
+    def truncate(self, upto_seq: int) -> None:
+        """
+        Delete segments whose records are all at or below upto_seq.
+
+        Args:
+            upto_seq: Highest sequence number covered by a durable snapshot
+        """
+        with self._lock:
+            segments = self._segments()
+            for (_, path), (next_first_seq, _) in zip(segments, segments[1:]):
+                if next_first_seq - 1 <= upto_seq:
+                    os.remove(path)
+            fsync_directory(self.directory)
+
+    def close(self) -> None:
+        """Close the active segment."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,17 @@
+import pytest
+
+from backend.config import Settings
+from backend.services.embeddings import HashingEmbeddingProvider
+from backend.services.rag import RAGService
+
+@pytest.fixture
+def settings() -> Settings:
+    """Application settings with the caches that outlive a test turned off."""
+    return Settings().model_copy(update={"embedding_cache_enabled": False, "retrieval_cache_enabled": False})
+
+@pytest.fixture
+def rag_service(tmp_path, settings):
+    """RAG service on an empty store, embedding locally."""
+    service = RAGService(str(tmp_path / "store"), settings=settings, embedding_provider=HashingEmbeddingProvider())
+    yield service
+    service.close()
@@ -0,0 +1,23 @@
+import os
+
+from backend.services.ingestion import CodebaseIngestor
+
+def test_symlinks_leaving_the_root_are_not_ingested(tmp_path, rag_service):
+    root = tmp_path / "project"
+    (root / "pkg").mkdir(parents=True)
+    (root / "pkg" / "app.py").write_text("def handler():\n    return 'inside'\n")
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "secret.py").write_text("API_KEY = 'outside'\n")
+    os.symlink(outside / "secret.py", root / "pkg" / "secret.py")
+    os.symlink(outside, root / "linked")
+    # Links to files inside the root are still followed
+    os.symlink(root / "pkg" / "app.py", root / "alias.py")
+
+    ingestor = CodebaseIngestor(rag_service, manifest_path=str(tmp_path / "manifest.json"), workers=1)
+    stats = ingestor.ingest(str(root))
+
+    assert stats["files_changed"] == 2
+    contents = [rag_service.get_document(doc_id)["content"] for doc_id in range(rag_service.next_id)]
+    assert not any("outside" in content for content in contents)
+    assert any("inside" in content for content in contents)
@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+import pytest
+
+from backend.agents.review_agent import parse_review
+from backend.services.llm_gateway import LLMGateway
+
+class FakeCompletions:
+    """Chat completions answering with queued contents."""
+
+    def __init__(self, contents):
+        self.contents = list(contents)
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content=self.contents.pop(0))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+@pytest.fixture
+def gateway(tmp_path, settings):
+    settings = settings.model_copy(update={"llm_cache_path": str(tmp_path / "llm_cache.db"), "llm_http2": False,
+                                       "openai_api_key": "test"})
+    gateway = LLMGateway(settings)
+    yield gateway
+    gateway.close()
+
+def test_response_breaking_the_contract_is_not_cached(gateway):
+    completions = FakeCompletions(['{"code": ', '{"code": "print(1)"}'])
+    gateway.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    messages = [{"role": "user", "content": "review"}]
+    options = {"response_format": {"type": "json_object"}, "validate": parse_review}
+
+    with pytest.raises(ValueError):
+        gateway.chat(messages, **options)
+    # The truncated response was not cached, so the retry asks again
+    assert gateway.chat(messages, **options) == '{"code": "print(1)"}'
+    assert gateway.chat(messages, **options) == '{"code": "print(1)"}'
+    assert completions.calls == 2
@@ -0,0 +1,31 @@
+from backend.services.chunking import chunk_document
+from backend.services.metadata_filters import language_filter
+
+JS_SOURCE = """function reverseList(head) {
+  let previous = null;
+  while (head) {
+    const next = head.next;
+    head.next = previous;
+    previous = head;
+    head = next;
+  }
+  return previous;
+}
+"""
+
+def test_language_alias_is_normalized_when_chunking():
+    chunks = chunk_document(JS_SOURCE, language="JS")
+    assert [chunk["metadata"]["language"] for chunk in chunks] == ["javascript"]
+    # The brace-aware chunker finds the function
+    assert chunks[0]["metadata"]["symbol"] == "reverseList"
+
+def test_document_ingested_with_alias_matches_canonical_filter(rag_service):
+    doc_ids = rag_service.add_documents(chunk_document(JS_SOURCE, language="js"))
+    # Metadata given directly, bypassing the chunker, is matched through its alias too
+    doc_ids += rag_service.add_documents([{"content": "const x = /}/g;", "metadata": {"language": "ts"}}])
+
+    for language in ("javascript", "js", "node"):
+        found = rag_service.retrieve_context("reverse list head", filters=language_filter(language))
+        assert found["documents"] == doc_ids[:1]
+    found = rag_service.retrieve_context("const x", filters=language_filter("typescript"))
+    assert found["documents"] == doc_ids[1:]
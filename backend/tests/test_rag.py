@@ -0,0 +1,72 @@
+import pytest
+
+from backend.services.embeddings import HashingEmbeddingProvider
+from backend.services.rag import RAGService
+
+def test_stats_report_empty_retrieval_cache(tmp_path, settings):
+    settings = settings.model_copy(update={"retrieval_cache_enabled": True})
+    service = RAGService(str(tmp_path / "store"), settings=settings, embedding_provider=HashingEmbeddingProvider())
+    try:
+        # An empty cache is falsy, but it is still enabled
+        assert service.stats()["retrieval_cache"]["size"] == 0
+    finally:
+        service.close()
+
+def test_pinned_index_settings_survive_compaction(tmp_path, settings):
+    path = str(tmp_path / "store")
+    service = RAGService(path, settings=settings, embedding_provider=HashingEmbeddingProvider())
+    service.add_documents([{"content": f"def handler_{i}(): return {i}"} for i in range(20)])
+    service.pin_index_settings({"rag_index_type": "hnsw", "rag_index_promotion_threshold": 0,
+                                "rag_vector_compression": "fp16"})
+    service.compact(purge=True, rebuild=True)
+    assert (service.stats()["index_type"], service.stats()["compression"]) == ("hnsw", "fp16")
+
+    # Later compactions, here after a reopen, keep the pinned index instead of the configured flat one
+    service.close()
+    service = RAGService(path, settings=settings, embedding_provider=HashingEmbeddingProvider())
+    try:
+        service.add_document("def late_handler(): return 0")
+        service.compact()
+        stats = service.stats()
+        assert (stats["index_type"], stats["compression"]) == ("hnsw", "fp16")
+        assert stats["index_settings"]["rag_index_type"] == "hnsw"
+
+        service.pin_index_settings({})
+        service.compact(rebuild=True)
+        assert (service.stats()["index_type"], service.stats()["compression"]) == ("flat", "none")
+    finally:
+        service.close()
+
+def test_second_service_follows_the_writer_read_only(tmp_path, settings):
+    path = str(tmp_path / "store")
+    writer = RAGService(path, settings=settings, embedding_provider=HashingEmbeddingProvider())
+    first_ids = writer.add_documents(["def first(): pass", "def second(): pass"])
+    follower = RAGService(path, settings=settings, embedding_provider=HashingEmbeddingProvider())
+    try:
+        assert follower.read_only and not writer.read_only
+        assert follower.get_document(first_ids[1])["content"] == "def second(): pass"
+        with pytest.raises(RuntimeError):
+            follower.add_document("def rejected(): pass")
+
+        # Records appended to the log are replayed
+        late_id = writer.add_document("def late(): pass")
+        follower.refresh()
+        assert follower.get_document(late_id)["content"] == "def late(): pass"
+
+        # A compaction drops the log segments, so the new snapshot is loaded
+        writer.delete_document(first_ids[0])
+        writer.compact(purge=True)
+        after_id = writer.add_document("def after(): pass")
+        follower.refresh()
+        assert follower.get_document(first_ids[0]) is None
+        assert follower.get_document(after_id)["content"] == "def after(): pass"
+        assert follower.stats()["documents"] == writer.stats()["documents"]
+
+        # Once the writer is gone the follower takes the store over
+        writer.close()
+        follower.refresh()
+        assert not follower.read_only
+        assert follower.add_document("def takeover(): pass") == after_id + 1
+    finally:
+        writer.close()
+        follower.close()
@@ -0,0 +1,79 @@
+import functools
+import math
+from typing import Any, Optional
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character-based estimate
+    tiktoken = None
+
+# Encoding used by the OpenAI embedding and chat models this service calls
+DEFAULT_ENCODING = "cl100k_base"
+
+# Characters per token assumed when tiktoken is unavailable
+CHARS_PER_TOKEN = 4
+
+@functools.lru_cache(maxsize=8)
+def _get_encoding(name: str) -> Optional[Any]:
+    """Load a tiktoken encoding once, or return None if it cannot be loaded."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception:
+        # The encoding files are downloaded on first use and may be unavailable offline
+        return None
+
+def count_tokens(text: str, encoding: str = DEFAULT_ENCODING) -> int:
+    """
+    Count the tokens in a piece of text.
+
+    Uses tiktoken when it is installed and falls back to an estimate of
+    one token per four characters otherwise.
+
+    Args:
+        text: Text to measure
+        encoding: tiktoken encoding name
+
+    Returns:
+        Number of tokens
+    """
+    if not text:
+        return 0
+    tokenizer = _get_encoding(encoding)
+    if tokenizer is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(tokenizer.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, max_tokens: int, encoding: str = DEFAULT_ENCODING) -> str:
+    """
+    Cut text down to at most max_tokens tokens.
+
+    The cut is moved back to the last line break when one is available in
+    the second half of the kept text, so excerpts end on whole lines.
+
+    Args:
+        text: Text to truncate
+        max_tokens: Maximum number of tokens to keep
+        encoding: tiktoken encoding name
+
+    Returns:
+        The text itself if it fits, otherwise its truncated prefix
+    """
+    if max_tokens <= 0:
+        return ""
+    tokenizer = _get_encoding(encoding)
+    if tokenizer is None:
+        if len(text) <= max_tokens * CHARS_PER_TOKEN:
+            return text
+        kept = text[:max_tokens * CHARS_PER_TOKEN]
+    else:
+        tokens = tokenizer.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        kept = tokenizer.decode(tokens[:max_tokens])
+
+    line_break = kept.rfind("\n")
+    if line_break > len(kept) // 2:
+        kept = kept[:line_break]
+    return kept
@@ -1,6 +1,73 @@
 document.addEventListener("DOMContentLoaded", () => {
   const BASE_URL = "http://localhost:8011/api"; // Update with your backend URL
 
+  // Follow a task through its event stream instead of polling its status
+  const watchTask = (task_id, { onProgress, onCompleted, onFailed }) => {
+    const source = new EventSource(`${BASE_URL}/task/${task_id}/events`);
+    let stage = null;
+    let stages = {};
+
+    const finish = (status, result) => {
+      source.close();
+      if (status === "completed") {
+        onCompleted(result);
+      } else {
+        onFailed(result);
+      }
+    };
+
+    // Sent on every (re)connection with the full state, so it replaces what we hold
+    source.addEventListener("snapshot", (event) => {
+      const data = JSON.parse(event.data);
+      stage = data.stage;
+      stages = data.stages;
+      if (data.status === "completed" || data.status === "failed") {
+        finish(data.status, data.result);
+      } else if (onProgress && stage) {
+        onProgress(stage, stages[stage] || "");
+      }
+    });
+
+    source.addEventListener("stage", (event) => {
+      stage = JSON.parse(event.data).stage;
+      stages[stage] = "";
+      if (onProgress) onProgress(stage, "");
+    });
+
+    source.addEventListener("token", (event) => {
+      const data = JSON.parse(event.data);
+      stages[data.stage] = (stages[data.stage] || "") + data.text;
+      if (onProgress && data.stage === stage) onProgress(stage, stages[stage]);
+    });
+
+    source.addEventListener("status", (event) => {
+      const data = JSON.parse(event.data);
+      if (data.status === "completed" || data.status === "failed") {
+        finish(data.status, data.result);
+      }
+    });
+
+    // If the stream breaks, stop reconnecting and ask for the task's status once
+    source.onerror = async () => {
+      source.close();
+      try {
+        const response = await fetch(`${BASE_URL}/task/${task_id}`);
+        if (!response.ok) {
+          throw new Error(`HTTP ${response.status}`);
+        }
+        const data = await response.json();
+        if (data.status === "completed" || data.status === "failed") {
+          finish(data.status, data.result);
+        } else {
+          onFailed({ error: "Lost the connection to the task; it is still running" });
+        }
+      } catch (error) {
+        console.error("Error fetching task status:", error);
+        onFailed({ error: "Lost the connection to the task" });
+      }
+    };
+  };
+
   // Code Generator
   document
     .getElementById("generate-code-btn")
@@ -22,26 +89,27 @@ document.addEventListener("DOMContentLoaded", () => {
             debug: true,
             optimize: true,
             document: true,
+            stream: true,
           }),
         });
 
         const data = await response.json();
         const task_id = data.task_id;
 
-        // Poll for task completion
-        const interval = setInterval(async () => {
-          const statusResponse = await fetch(`${BASE_URL}/task/${task_id}`);
-          const statusData = await statusResponse.json();
-
-          if (statusData.status === "completed") {
-            clearInterval(interval);
+        // Follow the task until it completes
+        watchTask(task_id, {
+          // Show each stage's output as it is generated
+          onProgress: (stage, text) => {
             document.getElementById("generated-code").textContent =
-              statusData.result.code;
-          } else if (statusData.status === "failed") {
-            clearInterval(interval);
-            alert(`Task failed: ${statusData.result.error}`);
-          }
-        }, 2000);
+              `[${stage}]\n${text}`;
+          },
+          onCompleted: (result) => {
+            document.getElementById("generated-code").textContent = result.code;
+          },
+          onFailed: (result) => {
+            alert(`Task failed: ${result.error}`);
+          },
+        });
       } catch (error) {
         console.error("Error generating code:", error);
         alert("An error occurred while generating code.");
@@ -69,20 +137,15 @@ document.addEventListener("DOMContentLoaded", () => {
         const data = await response.json();
         const task_id = data.task_id;
 
-        // Poll for task completion
-        const interval = setInterval(async () => {
-          const statusResponse = await fetch(`${BASE_URL}/task/${task_id}`);
-          const statusData = await statusResponse.json();
-
-          if (statusData.status === "completed") {
-            clearInterval(interval);
-            document.getElementById("debugged-code").textContent =
-              statusData.result.code;
-          } else if (statusData.status === "failed") {
-            clearInterval(interval);
-            alert(`Task failed: ${statusData.result.error}`);
-          }
-        }, 2000);
+        // Follow the task until it completes
+        watchTask(task_id, {
+          onCompleted: (result) => {
+            document.getElementById("debugged-code").textContent = result.code;
+          },
+          onFailed: (result) => {
+            alert(`Task failed: ${result.error}`);
+          },
+        });
       } catch (error) {
         console.error("Error debugging code:", error);
         alert("An error occurred while debugging code.");
@@ -114,20 +177,15 @@ document.addEventListener("DOMContentLoaded", () => {
         const data = await response.json();
         const task_id = data.task_id;
 
-        // Poll for task completion
-        const interval = setInterval(async () => {
-          const statusResponse = await fetch(`${BASE_URL}/task/${task_id}`);
-          const statusData = await statusResponse.json();
-
-          if (statusData.status === "completed") {
-            clearInterval(interval);
-            document.getElementById("optimized-code").textContent =
-              statusData.result.code;
-          } else if (statusData.status === "failed") {
-            clearInterval(interval);
-            alert(`Task failed: ${statusData.result.error}`);
-          }
-        }, 2000);
+        // Follow the task until it completes
+        watchTask(task_id, {
+          onCompleted: (result) => {
+            document.getElementById("optimized-code").textContent = result.code;
+          },
+          onFailed: (result) => {
+            alert(`Task failed: ${result.error}`);
+          },
+        });
       } catch (error) {
         console.error("Error optimizing code:", error);
         alert("An error occurred while optimizing code.");